@@ -0,0 +1,167 @@
+"""Индекс названий ингредиентов для автодополнения (/api/ingredients/?name=).
+
+Каталог целиком держится в памяти процесса: отсортированный список
+нормализованных названий (без учета регистра, ё = е) ищется бинарным
+поиском, совпадения отдаются в порядке каталога, как из базы. Индекс
+перестраивается при смене состояния каталога
+(api.catalog.get_catalog_state); проверка читает только кэш, без запросов
+к базе.
+
+Нечеткий поиск (?fuzzy=1) сравнивает множества триграмм названий так же,
+как pg_trgm: на PostgreSQL - в базе по GIN-индексам триграмм, на других
+базах - по триграммам этого же индекса. Сначала идут названия, которые
+начинаются с запроса, затем остальные по убыванию сходства, не больше
+INGREDIENT_FUZZY_LIMIT.
+"""
+import re
+from bisect import bisect_left
+from collections import Counter, defaultdict
+from heapq import nsmallest
+
+from django.conf import settings
+from django.contrib.postgres.search import TrigramSimilarity
+from django.db import DatabaseError, connections
+from django.db.models import Case, IntegerField, Q, Value, When
+
+from ingredients.models import Ingredient
+
+from .catalog import get_catalog_state
+from .fast import IngredientCompiled
+
+# Больше любого символа, который встречается в названиях
+MAX_CHAR = '\U0010ffff'
+WORD = re.compile(r'\w+')
+
+
+def normalize(text):
+    return text.casefold().replace('ё', 'е')
+
+
+def trigrams(text):
+    """Триграммы как в pg_trgm: слова дополняются двумя пробелами слева
+    и одним справа.
+    """
+    grams = set()
+    for word in WORD.findall(normalize(text)):
+        word = f'  {word} '
+        grams.update(word[i:i + 3] for i in range(len(word) - 2))
+    return grams
+
+
+class IngredientIndex:
+    def __init__(self, rows, state=None):
+        self.state = state
+        self.rows = rows
+        self.names = [normalize(row['name']) for row in rows]
+        keys = sorted(
+            (name, position) for position, name in enumerate(self.names)
+        )
+        self.keys = [key for key, _ in keys]
+        self.positions = [position for _, position in keys]
+        self.grams = defaultdict(list)
+        self.gram_counts = []
+        for position, row in enumerate(rows):
+            grams = trigrams(row['name'])
+            self.gram_counts.append(len(grams))
+            for gram in grams:
+                self.grams[gram].append(position)
+
+    def search(self, prefix, limit=None):
+        """Ингредиенты, название которых начинается с prefix."""
+        prefix = normalize(prefix)
+        if not prefix:
+            positions = range(len(self.rows))
+        else:
+            start = bisect_left(self.keys, prefix)
+            end = bisect_left(self.keys, prefix + MAX_CHAR, start)
+            positions = self.positions[start:end]
+        if limit is None:
+            positions = sorted(positions)
+        else:
+            positions = nsmallest(limit, positions)
+        return [self.rows[position] for position in positions]
+
+    def fuzzy(self, text, limit, threshold):
+        """Нечеткий поиск: совпадения по началу названия, затем названия
+        со сходством триграмм не ниже threshold.
+        """
+        grams = trigrams(text)
+        prefix = normalize(text)
+        shared = Counter()
+        for gram in grams:
+            shared.update(self.grams.get(gram, ()))
+        ranked = []
+        for position, common in shared.items():
+            score = common / (len(grams) + self.gram_counts[position] - common)
+            starts = self.names[position].startswith(prefix)
+            if starts or score >= threshold:
+                ranked.append((not starts, -score, position))
+        return [self.rows[position] for _, _, position in nsmallest(
+            limit, ranked
+        )]
+
+
+def load_index(state):
+    rows = Ingredient.objects.values(*IngredientCompiled.values_fields)
+    return IngredientIndex(IngredientCompiled(rows=True).many(rows), state)
+
+
+# Индекс процесса: {'index': IngredientIndex}
+_current = {}
+
+
+def get_index(state=None):
+    """Индекс каталога в состоянии state (по умолчанию - текущем),
+    перестраивается при его смене.
+    """
+    state = state or get_catalog_state()
+    index = _current.get('index')
+    if index is not None and index.state == state:
+        return index
+    _current['index'] = load_index(state)
+    return _current['index']
+
+
+def warm_up():
+    """Строит индекс при старте процесса. Если база еще недоступна,
+    индекс построится при первом запросе.
+    """
+    try:
+        get_index()
+    except DatabaseError:
+        pass
+
+
+def fuzzy_search(queryset, text):
+    """Кверисет ингредиентов для нечеткого поиска text, уже упорядоченный
+    и ограниченный INGREDIENT_FUZZY_LIMIT.
+    """
+    limit = settings.INGREDIENT_FUZZY_LIMIT
+    threshold = settings.INGREDIENT_FUZZY_THRESHOLD
+    connection = connections[queryset.db]
+    if connection.vendor == 'postgresql':
+        # Оператор % сравнивает с pg_trgm.similarity_threshold (по умолчанию
+        # 0.3) и нужен только для индекса: порог задает similarity__gte
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT set_config('pg_trgm.similarity_threshold', %s, false)",
+                [str(threshold)],
+            )
+        return queryset.annotate(
+            similarity=TrigramSimilarity('name', text),
+            prefix=Case(
+                When(name__istartswith=text, then=Value(1)),
+                default=Value(0),
+                output_field=IntegerField(),
+            ),
+        ).filter(
+            Q(name__istartswith=text)
+            | Q(name__trigram_similar=text, similarity__gte=threshold)
+        ).order_by('-prefix', '-similarity', 'name')[:limit]
+    ids = [
+        row['id'] for row in get_index().fuzzy(text, limit, threshold)
+    ]
+    return queryset.filter(pk__in=ids).order_by(Case(
+        *(When(pk=pk, then=Value(order)) for order, pk in enumerate(ids)),
+        output_field=IntegerField(),
+    ))
@@ -0,0 +1,102 @@
+"""Кэш сериализованных рецептов и версии данных, из которых он собран.
+
+Версия - это метка времени в наносекундах, хранящаяся в кэше. При изменении
+данных ключ версии удаляется (после коммита транзакции), и следующий читатель
+создает новую, заведомо не встречавшуюся метку. Поэтому устаревшие фрагменты
+никогда не читаются повторно, даже если кэш вытеснил ключ версии.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+
+def version_key(name):
+    return f'version:{name}'
+
+
+def get_versions(names):
+    """Возвращает словарь {имя: версия} для списка имен версий."""
+    keys = {version_key(name): name for name in names}
+    found = cache.get_many(keys)
+    missing = [key for key in keys if key not in found]
+    for key in missing:
+        # add() не перезапишет версию, созданную параллельным запросом
+        cache.add(key, time.time_ns(), None)
+    if missing:
+        found.update(cache.get_many(missing))
+    return {name: found.get(key) for key, name in keys.items()}
+
+
+def get_version(name):
+    return get_versions([name])[name]
+
+
+def bump_version(*names):
+    """Сбрасывает версии после успешного коммита текущей транзакции."""
+    def delete():
+        cache.delete_many([version_key(name) for name in names])
+    transaction.on_commit(delete)
+
+
+def recipe_version_names(recipe):
+    return (f'recipe:{recipe.pk}', f'user:{recipe.author_id}', 'tags',
+            'ingredients')
+
+
+def get_recipe_fragments(recipes, build):
+    """Возвращает публичные фрагменты рецептов в порядке recipes.
+
+    Фрагмент ищется по id рецепта и версиям рецепта, автора, тегов и
+    ингредиентов. Промахи собирает build(list_of_recipes) -> list_of_dicts.
+    Промах по одному ключу пересчитывает только один запрос: остальные
+    ждут результат до RECIPE_CACHE_LOCK_WAIT секунд.
+    """
+    names = set()
+    for recipe in recipes:
+        names.update(recipe_version_names(recipe))
+    versions = get_versions(names)
+    keys = [
+        f'recipe-fragment:{recipe.pk}:' + ':'.join(
+            str(versions[name]) for name in recipe_version_names(recipe)
+        )
+        for recipe in recipes
+    ]
+    fragments = cache.get_many(keys)
+    missing = [
+        (key, recipe) for key, recipe in zip(keys, recipes)
+        if key not in fragments
+    ]
+    if missing:
+        fragments.update(build_missing(missing, build))
+    return [fragments[key] for key in keys]
+
+
+def build_missing(missing, build):
+    owned = [
+        (key, recipe) for key, recipe in missing
+        if cache.add(f'lock:{key}', 1, settings.RECIPE_CACHE_LOCK_TIMEOUT)
+    ]
+    built = {}
+    if owned:
+        built = store(owned, build)
+    waiting = [item for item in missing if item[0] not in built]
+    deadline = time.monotonic() + settings.RECIPE_CACHE_LOCK_WAIT
+    while waiting and time.monotonic() < deadline:
+        time.sleep(0.02)
+        built.update(cache.get_many([key for key, _ in waiting]))
+        waiting = [item for item in waiting if item[0] not in built]
+    if waiting:
+        # Владелец блокировки не успел - считаем сами
+        built.update(store(waiting, build))
+    return built
+
+
+def store(items, build):
+    fragments = dict(zip(
+        [key for key, _ in items], build([recipe for _, recipe in items])
+    ))
+    cache.set_many(fragments, settings.RECIPE_CACHE_TIMEOUT)
+    cache.delete_many([f'lock:{key}' for key, _ in items])
+    return fragments
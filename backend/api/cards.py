@@ -0,0 +1,77 @@
+"""Карточки рецептов (recipes.RecipeCard): публичная часть рецепта,
+собранная при записи. Лента читает их одним запросом вместе с рецептами
+(select_related('card')) вместо загрузки автора, тегов и ингредиентов.
+Устаревшие и недостающие карточки пересобираются при чтении.
+"""
+import orjson
+from django.db import IntegrityError, transaction
+
+from recipes.models import Recipe, RecipeCard
+
+from .fast import RecipeCompiled, build_recipe_fragments
+
+BATCH_SIZE = 500
+
+
+def save_cards(recipes, fragments):
+    cards = [
+        RecipeCard(
+            recipe_id=recipe.pk,
+            data=orjson.dumps(fragment).decode(),
+            recipe_updated_at=recipe.updated_at,
+        )
+        for recipe, fragment in zip(recipes, fragments)
+    ]
+    with transaction.atomic():
+        RecipeCard.objects.filter(
+            recipe_id__in=[card.recipe_id for card in cards]
+        ).delete()
+        RecipeCard.objects.bulk_create(cards)
+
+
+def refresh_recipe_cards(pks):
+    """Пересобирает карточки рецептов pks в текущей транзакции."""
+    pks = list(pks)
+    for start in range(0, len(pks), BATCH_SIZE):
+        recipes = list(Recipe.objects.filter(
+            pk__in=pks[start:start + BATCH_SIZE]
+        ))
+        save_cards(recipes, build_recipe_fragments(recipes))
+
+
+def load_cards(recipes):
+    if all(Recipe.card.is_cached(recipe) for recipe in recipes):
+        cards = (getattr(recipe, 'card', None) for recipe in recipes)
+        return {card.recipe_id: card for card in cards if card is not None}
+    return RecipeCard.objects.in_bulk([recipe.pk for recipe in recipes])
+
+
+def get_card_fragments(recipes):
+    """Публичные фрагменты рецептов из карточек."""
+    cards = load_cards(recipes)
+    stale = [
+        recipe for recipe in recipes
+        if recipe.pk not in cards
+        or cards[recipe.pk].recipe_updated_at != recipe.updated_at
+    ]
+    built = {}
+    if stale:
+        fragments = build_recipe_fragments(stale)
+        built = {
+            recipe.pk: fragment for recipe, fragment in zip(stale, fragments)
+        }
+        try:
+            save_cards(stale, fragments)
+        except IntegrityError:
+            # Карточку одновременно пересобрал другой запрос
+            pass
+    return [
+        built[recipe.pk] if recipe.pk in built
+        else orjson.loads(cards[recipe.pk].data)
+        for recipe in recipes
+    ]
+
+
+class RecipeCardCompiled(RecipeCompiled):
+    """RecipeCompiled, который собирает промахи кэша из карточек."""
+    build = staticmethod(get_card_fragments)
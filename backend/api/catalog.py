@@ -0,0 +1,167 @@
+"""Снимок каталога ингредиентов для /api/ingredients/ без параметров.
+
+JSON каталога рендерится один раз на состояние каталога (get_catalog_state)
+и хранится в памяти процесса сжатым gzip и, если установлен пакет brotli,
+brotli. Состояние читается из базы один раз на версию 'ingredients'
+(api.cache), которую сигналы ингредиентов сбрасывают в общем кэше, так что
+процесс видит и изменения, сделанные другими процессами. Записи в обход
+сигналов (например, queryset.update()) становятся видны через
+INGREDIENT_CATALOG_STATE_TTL секунд. ETag - хэш содержимого. Версия
+каталога (X-Catalog-Version) - время последнего изменения или удаления
+ингредиента в микросекундах: по ней /api/ingredients/delta/?since= отдает
+только изменения.
+"""
+import gzip
+from datetime import datetime, timezone
+from hashlib import sha256
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Max
+from django.http import HttpResponse
+from django.utils.cache import (get_conditional_response, patch_cache_control,
+                                patch_vary_headers)
+from django.utils.http import quote_etag
+
+from ingredients.models import Ingredient, IngredientTombstone
+
+from .cache import get_version
+from .fast import IngredientCompiled
+from .renderers import FastJSONRenderer
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+VERSION_HEADER = 'X-Catalog-Version'
+
+
+def to_version(moment):
+    return str(int(moment.timestamp() * 1_000_000)) if moment else '0'
+
+
+def from_version(version):
+    return datetime.fromtimestamp(int(version) / 1_000_000, timezone.utc)
+
+
+def read_catalog_state():
+    """(версия каталога, число ингредиентов, число удаленных ингредиентов).
+    Меняется при любом изменении, создании или удалении ингредиента.
+    """
+    current = Ingredient.objects.aggregate(
+        moment=Max('updated_at'), count=Count('pk')
+    )
+    deleted = IngredientTombstone.objects.aggregate(
+        moment=Max('deleted_at'), count=Count('pk')
+    )
+    moments = filter(None, (current['moment'], deleted['moment']))
+    return (
+        to_version(max(moments, default=None)),
+        current['count'],
+        deleted['count'],
+    )
+
+
+def get_catalog_state():
+    """Состояние каталога из кэша: база читается при смене версии
+    'ingredients' и не чаще раза в INGREDIENT_CATALOG_STATE_TTL секунд.
+    """
+    key = 'catalog-state:{}'.format(get_version('ingredients'))
+    state = cache.get(key)
+    if state is None:
+        state = read_catalog_state()
+        cache.set(key, state, settings.INGREDIENT_CATALOG_STATE_TTL)
+    return state
+
+
+def get_catalog_version():
+    return get_catalog_state()[0]
+
+
+def accepted_encodings(header):
+    """Кодировки из Accept-Encoding без q=0."""
+    encodings = set()
+    for item in header.split(','):
+        name, _, quality = item.partition(';')
+        quality = quality.strip()
+        if quality.startswith('q='):
+            try:
+                if float(quality[2:]) <= 0:
+                    continue
+            except ValueError:
+                continue
+        encodings.add(name.strip().lower())
+    return encodings
+
+
+class CatalogSnapshot:
+    def __init__(self, rows, state):
+        self.state = state
+        self.version = state[0]
+        self.body = FastJSONRenderer().render(rows)
+        self.etag = quote_etag(sha256(self.body).hexdigest()[:32])
+        self.encoded = {'gzip': gzip.compress(self.body, 9)}
+        if brotli is not None:
+            self.encoded['br'] = brotli.compress(self.body)
+
+    def response(self, request):
+        response = get_conditional_response(request, etag=self.etag)
+        if response is None:
+            encodings = accepted_encodings(
+                request.META.get('HTTP_ACCEPT_ENCODING', '')
+            )
+            encoding = next(
+                (name for name in ('br', 'gzip')
+                 if name in encodings and name in self.encoded),
+                None,
+            )
+            response = HttpResponse(
+                self.encoded[encoding] if encoding else self.body,
+                content_type='application/json',
+            )
+            if encoding:
+                response['Content-Encoding'] = encoding
+        response['ETag'] = self.etag
+        response[VERSION_HEADER] = self.version
+        patch_cache_control(
+            response, public=True,
+            max_age=settings.INGREDIENT_SNAPSHOT_MAX_AGE,
+        )
+        patch_vary_headers(response, ('Accept', 'Accept-Encoding'))
+        return response
+
+
+# Снимок процесса: {'snapshot': CatalogSnapshot}
+_current = {}
+
+
+def get_snapshot(state=None):
+    """Снимок каталога в состоянии state (по умолчанию - текущем)."""
+    # Состояние читается до строк: изменения между ними попадут в delta
+    # и в следующий снимок
+    state = state or get_catalog_state()
+    snapshot = _current.get('snapshot')
+    if snapshot is not None and snapshot.state == state:
+        return snapshot
+    rows = Ingredient.objects.values(*IngredientCompiled.values_fields)
+    _current['snapshot'] = CatalogSnapshot(
+        IngredientCompiled(rows=True).many(rows), state
+    )
+    return _current['snapshot']
+
+
+def get_delta(since):
+    """Изменения каталога после версии since."""
+    version = get_catalog_version()
+    moment = from_version(since)
+    changed = Ingredient.objects.filter(updated_at__gt=moment).values(
+        *IngredientCompiled.values_fields
+    )
+    return {
+        'version': version,
+        'changed': IngredientCompiled(rows=True).many(changed),
+        'deleted': list(IngredientTombstone.objects.filter(
+            deleted_at__gt=moment
+        ).values_list('ingredient_id', flat=True)),
+    }
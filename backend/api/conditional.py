@@ -0,0 +1,59 @@
+from hashlib import md5
+
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+
+from .cache import get_versions
+
+
+class ConditionalGetMixin:
+    """Ответ 304 на If-None-Match / If-Modified-Since для list и retrieve.
+
+    ETag и Last-Modified строятся из версий данных (api.cache) без
+    обращения к сериализаторам. Вьюсет перечисляет нужные версии
+    в get_version_names() и может добавить время изменения объекта
+    в get_last_modified().
+    """
+    def get_version_names(self):
+        return []
+
+    def get_last_modified(self):
+        return None
+
+    def get_viewer_version_name(self):
+        user = self.request.user
+        return f'viewer:{user.pk}' if user.is_authenticated else None
+
+    def get_validators(self):
+        versions = get_versions(self.get_version_names())
+        timestamps = [version / 1e9 for version in versions.values()]
+        last_modified = self.get_last_modified()
+        if last_modified is not None:
+            timestamps.append(last_modified.timestamp())
+        tag = md5('|'.join([
+            self.request.get_full_path(),
+            self.request.META.get('HTTP_ACCEPT', ''),
+            str(last_modified),
+            *(f'{name}={versions[name]}' for name in sorted(versions)),
+        ]).encode()).hexdigest()
+        return quote_etag(tag), int(max(timestamps, default=0)) or None
+
+    def conditional(self, handler, request, *args, **kwargs):
+        etag, last_modified = self.get_validators()
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified
+        )
+        if response is None:
+            response = handler(request, *args, **kwargs)
+        if response.status_code in (200, 304):
+            response['ETag'] = etag
+            if last_modified:
+                response['Last-Modified'] = http_date(last_modified)
+            patch_vary_headers(response, ('Accept', 'Authorization'))
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional(super().retrieve, request, *args, **kwargs)
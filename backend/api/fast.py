@@ -0,0 +1,240 @@
+"""Быстрая сериализация только для чтения.
+
+CompiledSerializer выдает тот же JSON, что и соответствующий ModelSerializer,
+но собирает аксессоры полей один раз на запрос, а не создает поля, валидаторы
+и обходы SlugRelatedField/SerializerMethodField для каждой строки. Строками
+могут быть объекты моделей (с prefetch_related) или словари из
+.values(*values_fields).
+"""
+from collections import OrderedDict
+from operator import attrgetter, itemgetter
+
+from django.core.files.storage import default_storage
+from django.db.models import prefetch_related_objects
+from rest_framework.response import Response
+
+from recipes.models import Recipe
+
+from .cache import get_recipe_fragments
+from .viewer import get_viewer
+
+
+class CompiledSerializer:
+    """Базовый класс: поле берется из метода get_<поле>, если он есть,
+    иначе из атрибута (ключа словаря) sources.get(поле, поле).
+    """
+    fields = ()
+    sources = {}
+    values_fields = ()
+
+    def __init__(self, context=None, rows=False, fields=None):
+        self.context = context or {}
+        self.request = self.context.get('request')
+        self.rows = rows
+        self.accessors = [
+            (name, self.compile_field(name)) for name in self.fields
+            if fields is None or name in fields
+        ]
+
+    def compile_field(self, name):
+        method = getattr(self, f'get_{name}', None)
+        if method is not None:
+            return method
+        source = self.sources.get(name, name)
+        if self.rows:
+            return itemgetter(source.replace('.', '__'))
+        return attrgetter(source)
+
+    def value(self, obj, source):
+        if self.rows:
+            return obj[source.replace('.', '__')]
+        return attrgetter(source)(obj)
+
+    def image_url(self, value):
+        """Как ImageField DRF: абсолютный URL при наличии request."""
+        name = value if isinstance(value, str) else getattr(
+            value, 'name', None
+        )
+        if not name:
+            return None
+        url = default_storage.url(name)
+        if self.request is not None:
+            return self.request.build_absolute_uri(url)
+        return url
+
+    def to_representation(self, obj):
+        return {name: get(obj) for name, get in self.accessors}
+
+    def many(self, items):
+        accessors = self.accessors
+        return [{name: get(obj) for name, get in accessors} for obj in items]
+
+
+class TagCompiled(CompiledSerializer):
+    fields = ('id', 'name', 'color', 'slug', )
+    values_fields = fields
+
+
+class IngredientCompiled(CompiledSerializer):
+    fields = ('id', 'name', 'measurement_unit', )
+    values_fields = fields
+
+
+class AbbreviatedRecipeCompiled(CompiledSerializer):
+    fields = ('id', 'name', 'image', 'cooking_time', )
+    values_fields = fields
+
+    def get_image(self, obj):
+        return self.image_url(self.value(obj, 'image'))
+
+
+class UserCompiled(CompiledSerializer):
+    fields = (
+        'email', 'id', 'username', 'first_name', 'last_name', 'is_subscribed',
+    )
+
+    def get_is_subscribed(self, obj):
+        if self.request is None:
+            return False
+        return get_viewer(self.request).is_subscribed(obj.pk)
+
+
+class RecipeIngredientCompiled(CompiledSerializer):
+    fields = ('id', 'name', 'measurement_unit', 'amount', )
+    sources = {
+        'id': 'ingredient.id',
+        'name': 'ingredient.name',
+        'measurement_unit': 'ingredient.measurement_unit',
+    }
+
+
+class RecipeFragmentCompiled(CompiledSerializer):
+    """Рецепт как RecipeSerializer. Без request в context - публичная часть
+    рецепта для кэша, с request - полный рецепт для пользователя.
+    """
+    fields = (
+        'id', 'author', 'ingredients', 'tags', 'name', 'image',
+        'text', 'cooking_time', 'is_favorited', 'is_in_shopping_cart',
+    )
+
+    def __init__(self, context=None, rows=False, fields=None):
+        super().__init__(context, rows, fields)
+        self.author = UserCompiled(self.context)
+        self.amounts = RecipeIngredientCompiled(self.context)
+        self.tags = TagCompiled(self.context)
+
+    def get_author(self, obj):
+        return self.author.to_representation(obj.author)
+
+    def get_ingredients(self, obj):
+        return self.amounts.many(obj.amounts.all())
+
+    def get_tags(self, obj):
+        return self.tags.many(obj.tags.all())
+
+    def get_image(self, obj):
+        return self.image_url(obj.image)
+
+    def get_is_favorited(self, obj):
+        if self.request is None:
+            return False
+        return recipe_flag(obj, 'is_favorited', get_viewer(self.request))
+
+    def get_is_in_shopping_cart(self, obj):
+        if self.request is None:
+            return False
+        return recipe_flag(
+            obj, 'is_in_shopping_cart', get_viewer(self.request)
+        )
+
+
+def build_recipe_fragments(recipes):
+    prefetch_related_objects(
+        recipes, *Recipe.objects.serialization_lookups()
+    )
+    return RecipeFragmentCompiled().many(recipes)
+
+
+def recipe_flag(recipe, name, viewer):
+    """Флаг из аннотации кверисета или из ViewerContext."""
+    if hasattr(recipe, name):
+        return getattr(recipe, name)
+    return getattr(viewer, name)(recipe.pk)
+
+
+def represent_recipes(recipes, request, build):
+    """Публичные фрагменты рецептов из кэша плюс поля пользователя."""
+    fragments = get_recipe_fragments(recipes, build)
+    viewer = get_viewer(request)
+    result = []
+    for recipe, fragment in zip(recipes, fragments):
+        data = OrderedDict(fragment)
+        data['author'] = OrderedDict(
+            fragment['author'],
+            is_subscribed=viewer.is_subscribed(recipe.author_id),
+        )
+        if data['image']:
+            data['image'] = request.build_absolute_uri(data['image'])
+        data['is_favorited'] = recipe_flag(recipe, 'is_favorited', viewer)
+        data['is_in_shopping_cart'] = recipe_flag(
+            recipe, 'is_in_shopping_cart', viewer
+        )
+        result.append(data)
+    return result
+
+
+class RecipeCompiled(CompiledSerializer):
+    """Рецепт для текущего пользователя, как RecipeSerializer.
+    Полный рецепт собирается из кэша фрагментов. Если в context передан
+    список fields (?fields=/?omit=), кэш не используется, а загружаются
+    и сериализуются только запрошенные поля.
+    """
+    fields = RecipeFragmentCompiled.fields
+    # Источник публичных фрагментов при промахе кэша
+    build = staticmethod(build_recipe_fragments)
+
+    def to_representation(self, obj):
+        return self.many([obj])[0]
+
+    def many(self, items):
+        items = list(items)
+        fields = self.context.get('fields')
+        if fields is None:
+            return represent_recipes(items, self.request, self.build)
+        prefetch_related_objects(
+            items, *Recipe.objects.serialization_lookups(fields)
+        )
+        return RecipeFragmentCompiled(self.context, fields=fields).many(items)
+
+
+class CompiledSerializerMixin:
+    """Выбор CompiledSerializer для действий list и retrieve вьюсета:
+    compiled_serializer_classes = {'list': ..., 'retrieve': ...}.
+    """
+    compiled_serializer_classes = {}
+
+    def get_compiled_serializer_class(self):
+        return self.compiled_serializer_classes.get(self.action)
+
+    def list(self, request, *args, **kwargs):
+        serializer_class = self.get_compiled_serializer_class()
+        if serializer_class is None:
+            return super().list(request, *args, **kwargs)
+        queryset = self.filter_queryset(self.get_queryset())
+        rows = bool(serializer_class.values_fields)
+        if rows:
+            queryset = queryset.values(*serializer_class.values_fields)
+        serializer = serializer_class(
+            self.get_serializer_context(), rows=rows
+        )
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(serializer.many(page))
+        return Response(serializer.many(queryset))
+
+    def retrieve(self, request, *args, **kwargs):
+        serializer_class = self.get_compiled_serializer_class()
+        if serializer_class is None:
+            return super().retrieve(request, *args, **kwargs)
+        serializer = serializer_class(self.get_serializer_context())
+        return Response(serializer.to_representation(self.get_object()))
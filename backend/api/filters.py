@@ -1,17 +1,33 @@
+from django.db.models import Exists, OuterRef
 from django_filters.rest_framework import FilterSet, filters
 
 from ingredients.models import Ingredient, Tag
-from recipes.models import Recipe
+from recipes.models import Favorite, Recipe, RecipeTag, ShoppingBasket
+
+from .autocomplete import fuzzy_search
 
 
 class RecipeFilter(FilterSet):
     """Кастомный фильтр для рецептов.
-    Для вкладок "Избранное, "Корзина" и тегов."""
+    Для вкладок "Избранное, "Корзина" и тегов.
+    Все фильтры сужают переданный кверисет подзапросами EXISTS, поэтому
+    сочетаются друг с другом и не дают повторяющихся строк.
+    """
     tags = filters.ModelMultipleChoiceFilter(
         field_name='tags__slug',
         to_field_name='slug',
         label='tags',
         queryset=Tag.objects.all(),
+        method='get_tags',
+    )
+    search = filters.CharFilter(
+        label='Search',
+        method='get_search',
+    )
+    ordering = filters.ChoiceFilter(
+        label='Ordering',
+        choices=(('popular', 'popular'), ),
+        method='get_ordering',
     )
     is_favorited = filters.BooleanFilter(
         label='Favorited',
@@ -24,25 +40,60 @@ class RecipeFilter(FilterSet):
 
     class Meta:
         model = Recipe
-        fields = ('author', 'is_favorited', 'tags', 'is_in_shopping_cart', )
+        fields = (
+            'author', 'is_favorited', 'tags', 'is_in_shopping_cart', 'search',
+            'ordering',
+        )
+
+    def get_tags(self, queryset, name, value):
+        if not value:
+            return queryset
+        return queryset.filter(Exists(RecipeTag.objects.filter(
+            recipe=OuterRef('pk'), tag__in=value
+        )))
+
+    def get_search(self, queryset, name, value):
+        if not value.strip():
+            return queryset
+        return queryset.search(value)
+
+    def get_ordering(self, queryset, name, value):
+        # Все поля по убыванию: порядок подходит и для keyset-пагинации
+        return queryset.order_by('-favorites_count', '-pub_date', '-id')
+
+    def filter_by_user(self, queryset, model, value):
+        if not value:
+            return queryset
+        user = self.request.user
+        if not user.is_authenticated:
+            return queryset.none()
+        return queryset.filter(Exists(model.objects.filter(
+            user=user, recipe=OuterRef('pk')
+        )))
 
     def get_is_favorited(self, queryset, name, value):
-        if value:
-            return Recipe.objects.filter(selected__user=self.request.user)
-        return Recipe.objects.all()
+        return self.filter_by_user(queryset, Favorite, value)
 
     def get_is_in_shopping_cart(self, queryset, name, value):
-        if value:
-            return Recipe.objects.filter(
-                shopping_basket__user=self.request.user
-            )
-        return Recipe.objects.all()
+        return self.filter_by_user(queryset, ShoppingBasket, value)
 
 
 class SearchIngredientFilter(FilterSet):
-    """Кастомный фильтр для ингридиентов."""
-    name = filters.CharFilter(lookup_expr='istartswith')
+    """Кастомный фильтр для ингридиентов.
+    С ?fuzzy=1 поиск по name нечеткий (api.autocomplete.fuzzy_search).
+    """
+    name = filters.CharFilter(method='get_name')
+    fuzzy = filters.BooleanFilter(label='Fuzzy', method='get_fuzzy')
 
     class Meta:
         model = Ingredient
-        fields = ('name', )
+        fields = ('name', 'fuzzy', )
+
+    def get_name(self, queryset, name, value):
+        if self.form.cleaned_data.get('fuzzy'):
+            return fuzzy_search(queryset, value)
+        return queryset.filter(name__istartswith=value)
+
+    def get_fuzzy(self, queryset, name, value):
+        # Только переключает режим фильтра name
+        return queryset
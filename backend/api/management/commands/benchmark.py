@@ -0,0 +1,200 @@
+import csv
+import os
+import random
+import timeit
+import tracemalloc
+from collections import OrderedDict
+from types import SimpleNamespace
+
+from django.apps import apps
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.http import QueryDict
+from rest_framework.renderers import JSONRenderer
+
+from api import autocomplete, filters, renderers, services
+from ingredients.models import Ingredient, Tag
+from recipes.models import Recipe
+from users.models import User
+
+
+def load_catalog():
+    path = os.path.join(
+        apps.get_app_config('ingredients').path, 'data', 'ingredients.csv'
+    )
+    with open(path, encoding='utf-8') as csv_file:
+        rows = list(csv.reader(csv_file))[1:]
+    return [
+        OrderedDict(id=index, name=name, measurement_unit=unit)
+        for index, (name, unit) in enumerate(rows, start=1)
+    ]
+
+
+def make_recipe_page(catalog, size, seed=0):
+    """Страница в формате RecipeSerializer с правдоподобными данными."""
+    rnd = random.Random(seed)
+    page = []
+    for index in range(size):
+        ingredients = [
+            OrderedDict(item, amount=rnd.randint(1, 500))
+            for item in rnd.sample(catalog, rnd.randint(3, 12))
+        ]
+        page.append(OrderedDict([
+            ('id', index + 1),
+            ('author', OrderedDict([
+                ('email', f'cook{index}@foodgram.ru'),
+                ('id', index % 50 + 1),
+                ('username', f'cook{index}'),
+                ('first_name', 'Анна'),
+                ('last_name', 'Кулинарова'),
+                ('is_subscribed', bool(index % 3)),
+            ])),
+            ('ingredients', ingredients),
+            ('tags', [
+                OrderedDict(id=1, name='Завтрак', color='#49b64e',
+                            slug='breakfast'),
+                OrderedDict(id=2, name='Обед', color='#e26c2d', slug='lunch'),
+            ][:rnd.randint(1, 2)]),
+            ('name', f'Рецепт №{index + 1}'),
+            ('image', f'https://foodgram.ru/media/recipes/image/{index}.jpg'),
+            ('text', 'Нарезать, смешать и запечь до готовности. ' * 12),
+            ('cooking_time', rnd.randint(5, 180)),
+            ('is_favorited', bool(index % 2)),
+            ('is_in_shopping_cart', False),
+        ]))
+    return OrderedDict(count=10000, next='https://foodgram.ru/api/recipes/'
+                       '?page=2', previous=None, results=page)
+
+
+class Command(BaseCommand):
+    help = 'runs performance benchmarks'
+    suites = {
+        'filters': 'bench_filters',
+        'ingredients': 'bench_ingredients',
+        'renderers': 'bench_renderers',
+        'shopping_list': 'bench_shopping_list',
+    }
+
+    def add_arguments(self, parser):
+        parser.add_argument('suite', choices=sorted(self.suites))
+        parser.add_argument('--repeat', type=int, default=200)
+
+    def handle(self, *args, **options):
+        getattr(self, self.suites[options['suite']])(options['repeat'])
+
+    def report(self, name, seconds, repeat, extra=''):
+        self.stdout.write(
+            f'{name:<40} {seconds / repeat * 1e6:>12.1f} us {extra}'
+        )
+
+    def bench_renderers(self, repeat):
+        """Время рендеринга и размер ответа для JSON и MessagePack."""
+        catalog = load_catalog()
+        payloads = {
+            'recipes page (6)': make_recipe_page(catalog, 6),
+            'recipes page (50)': make_recipe_page(catalog, 50),
+            f'ingredients catalog ({len(catalog)})': catalog,
+        }
+        candidates = {
+            'JSONRenderer': JSONRenderer(),
+            'FastJSONRenderer': renderers.FastJSONRenderer(),
+            'MessagePackRenderer': renderers.MessagePackRenderer(),
+        }
+        for title, data in payloads.items():
+            self.stdout.write(self.style.SUCCESS(title))
+            reference = candidates['JSONRenderer'].render(data)
+            if candidates['FastJSONRenderer'].render(data) != reference:
+                raise CommandError('FastJSONRenderer output differs')
+            for name, renderer in candidates.items():
+                size = len(renderer.render(data))
+                seconds = timeit.timeit(
+                    lambda: renderer.render(data), number=repeat
+                )
+                self.report(f'  {name}', seconds, repeat, f'{size} bytes')
+
+    def bench_filters(self, repeat):
+        """План и время страницы рецептов с фильтром по нескольким тегам
+        и избранному на текущей базе.
+        """
+        user = User.objects.filter(selecting__isnull=False).first()
+        if user is None:
+            raise CommandError('no favorites in db, nothing to benchmark')
+        data = QueryDict(mutable=True)
+        data.setlist('tags', Tag.objects.values_list('slug', flat=True)[:3])
+        data['is_favorited'] = '1'
+        filterset = filters.RecipeFilter(
+            data=data,
+            queryset=Recipe.objects.with_user_flags(user),
+            request=SimpleNamespace(user=user),
+        )
+        queryset = filterset.qs.order_by('-pub_date', '-id')
+        page = queryset[:6]
+        self.stdout.write(self.style.SUCCESS(f'{dict(data.lists())}'))
+        self.stdout.write(str(page.query))
+        self.stdout.write(page.explain())
+        seconds = timeit.timeit(lambda: list(page), number=repeat)
+        self.report('  page (6)', seconds, repeat)
+        seconds = timeit.timeit(queryset.count, number=repeat)
+        self.report('  count', seconds, repeat, f'{queryset.count()} rows')
+
+    def bench_ingredients(self, repeat):
+        """Поиск ингредиентов на текущей базе: фильтр istartswith,
+        индекс в памяти и нечеткий поиск (с опечатками в запросах).
+        """
+        if not Ingredient.objects.exists():
+            raise CommandError('no ingredients in db, nothing to benchmark')
+        index = autocomplete.get_index()
+        for text in ('мо', 'молоко', 'малако', 'памидор', 'сыр твердый'):
+            self.stdout.write(self.style.SUCCESS(text))
+            for fuzzy in (False, True):
+                def search():
+                    return list(filters.SearchIngredientFilter(
+                        data={'name': text, 'fuzzy': fuzzy},
+                        queryset=Ingredient.objects.all(),
+                    ).qs.values_list('name', flat=True))
+                seconds = timeit.timeit(search, number=repeat)
+                found = search()
+                self.report(
+                    f'  filter fuzzy={fuzzy}', seconds, repeat,
+                    f'{len(found)} rows: {", ".join(found[:3])}',
+                )
+            threshold = settings.INGREDIENT_FUZZY_THRESHOLD
+            limit = settings.INGREDIENT_FUZZY_LIMIT
+            candidates = {
+                'index prefix': lambda: index.search(text, limit),
+                'index fuzzy': lambda: index.fuzzy(text, limit, threshold),
+            }
+            for name, search in candidates.items():
+                seconds = timeit.timeit(search, number=repeat)
+                found = [row['name'] for row in search()]
+                self.report(
+                    f'  {name}', seconds, repeat,
+                    f'{len(found)} rows: {", ".join(found[:3])}',
+                )
+
+    def bench_shopping_list(self, repeat):
+        """Время и пик памяти (tracemalloc) PDF списка покупок из 10, 100
+        и 1000 ингредиентов, включая чтение всего ответа.
+        """
+        catalog = load_catalog()
+        rnd = random.Random(0)
+        repeat = max(1, repeat // 20)
+        for size in (10, 100, 1000):
+            rows = [
+                (item['name'], item['measurement_unit'], rnd.randint(1, 500))
+                for item in rnd.sample(catalog, size)
+            ]
+
+            def render():
+                response = services.creating_a_shopping_list(rows)
+                return sum(len(chunk) for chunk in response)
+            render()
+            seconds = timeit.timeit(render, number=repeat)
+            tracemalloc.start()
+            length = render()
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            self.report(
+                f'  pdf ({size} ingredients)', seconds, repeat,
+                f'{length} bytes, peak {peak / 1024:.0f} KiB',
+            )
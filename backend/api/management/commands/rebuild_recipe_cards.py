@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from api.cards import BATCH_SIZE, refresh_recipe_cards
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = 'rebuilds recipes_recipecard table'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        pks = list(Recipe.objects.order_by('pk').values_list('pk', flat=True))
+        for start in range(0, len(pks), batch_size):
+            with transaction.atomic():
+                refresh_recipe_cards(pks[start:start + batch_size])
+        self.stdout.write(self.style.SUCCESS(
+            f'{len(pks)} recipe cards are successfully rebuilt'
+        ))
@@ -1,5 +1,360 @@
-from rest_framework.pagination import PageNumberPagination
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from collections import OrderedDict
+from hashlib import md5
 
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.core.paginator import InvalidPage
+from django.core.paginator import Paginator as DjangoPaginator
+from django.db import connections
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import (BasePagination, LimitOffsetPagination,
+                                       PageNumberPagination)
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
 
-class CustomPagination(PageNumberPagination):
+from .cache import get_versions
+
+
+class KeysetPagination(BasePagination):
+    """Постраничный вывод по ключу сортировки (keyset/cursor).
+    Следующая страница выбирается условием по последней строке предыдущей,
+    например (pub_date, id) < (x, y), поэтому нет ни COUNT(*), ни OFFSET.
+    Все поля ordering сортируются по убыванию, последнее поле уникально.
+    Поля могут быть и аннотациями кверисета (например, search_rank).
+    """
+    ordering = ('-pub_date', '-id')
+    page_size = api_settings.PAGE_SIZE
     page_size_query_param = 'limit'
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Неверный курсор.'
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if page_size <= 0:
+            return self.page_size
+        return min(page_size, self.max_page_size)
+
+    def get_fields(self):
+        return [field.lstrip('-') for field in self.ordering]
+
+    def get_model_field(self, name):
+        try:
+            return self.model._meta.get_field(name)
+        except FieldDoesNotExist:
+            return None
+
+    def to_python(self, name, value):
+        field = self.get_model_field(name)
+        return value if field is None else field.to_python(value)
+
+    def value_to_string(self, obj, name):
+        field = self.get_model_field(name)
+        if field is None:
+            return getattr(obj, name)
+        return field.value_to_string(obj)
+
+    def decode_cursor(self, request):
+        """Возвращает (reverse, position) или (False, None) без курсора."""
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return False, None
+        try:
+            data = json.loads(urlsafe_b64decode(encoded.encode()))
+            position = [
+                self.to_python(field, value)
+                for field, value in zip(self.get_fields(), data['p'])
+            ]
+            if len(position) != len(self.ordering):
+                raise ValueError
+            return bool(data['r']), position
+        except (TypeError, ValueError, KeyError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, obj, reverse):
+        position = [
+            self.value_to_string(obj, field) for field in self.get_fields()
+        ]
+        encoded = urlsafe_b64encode(
+            json.dumps({'r': int(reverse), 'p': position}).encode()
+        ).decode()
+        return replace_query_param(
+            self.base_url, self.cursor_query_param, encoded
+        )
+
+    def position_filter(self, position, reverse, fields=None):
+        """Лексикографическое сравнение кортежа полей с позицией курсора."""
+        lookup = 'gt' if reverse else 'lt'
+        fields = fields or self.get_fields()
+        condition = Q()
+        for index, field in enumerate(fields):
+            equal = dict(zip(fields[:index], position[:index]))
+            condition |= Q(
+                **equal, **{f'{field}__{lookup}': position[index]}
+            )
+        return condition
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.model = queryset.model
+        self.page_size = self.get_page_size(request)
+        self.base_url = request.build_absolute_uri()
+        reverse, position = self.decode_cursor(request)
+        if position is not None:
+            queryset = queryset.filter(self.position_filter(position, reverse))
+        ordering = self.get_fields() if reverse else self.ordering
+        page = list(queryset.order_by(*ordering)[:self.page_size + 1])
+        has_more = len(page) > self.page_size
+        page = page[:self.page_size]
+        if reverse:
+            page.reverse()
+        self.page = page
+        self.has_next = has_more if not reverse else position is not None
+        self.has_previous = has_more if reverse else position is not None
+        return page
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
+
+class FeedPagination(KeysetPagination):
+    """KeysetPagination по нескольким источникам ключей сортировки.
+    Из каждого источника берется page_size + 1 ключ после курсора, ключи
+    сливаются без повторов, а объекты страницы загружаются одним запросом.
+    """
+
+    def paginate_sources(self, sources, queryset, request):
+        """sources - пары (кверисет, поля ключа в порядке ordering),
+        queryset - объекты, которые загружаются по последнему полю ключа.
+        """
+        self.model = queryset.model
+        self.page_size = self.get_page_size(request)
+        self.base_url = request.build_absolute_uri()
+        reverse, position = self.decode_cursor(request)
+        keys = set()
+        for source, fields in sources:
+            if position is not None:
+                source = source.filter(
+                    self.position_filter(position, reverse, fields)
+                )
+            ordering = fields if reverse else [f'-{field}' for field in fields]
+            keys.update(source.order_by(*ordering).values_list(
+                *fields
+            )[:self.page_size + 1])
+        keys = sorted(keys, reverse=not reverse)
+        has_more = len(keys) > self.page_size
+        keys = keys[:self.page_size]
+        if reverse:
+            keys.reverse()
+        objects = queryset.in_bulk([key[-1] for key in keys])
+        self.page = [objects[key[-1]] for key in keys if key[-1] in objects]
+        self.has_next = has_more if not reverse else position is not None
+        self.has_previous = has_more if reverse else position is not None
+        return self.page
+
+
+class KeysetModeMixin:
+    """Включает KeysetPagination по запросу клиента:
+    ?pagination=cursor для первой страницы или ?cursor=... для следующих.
+    Без этих параметров, а также для списков вместо кверисетов работает
+    обычная пагинация базового класса. Порядок берется из order_by
+    кверисета, только если его задал фильтр или экшен (сортировка поиска,
+    ?ordering=popular) и все поля в нем по убыванию. Порядок по умолчанию
+    из view.queryset заменяется на keyset_ordering, под который есть индекс.
+    """
+    keyset_class = KeysetPagination
+    keyset_ordering = ('-pub_date', '-id')
+    keyset = None
+
+    def get_keyset_ordering(self, queryset, view=None):
+        ordering = tuple(queryset.query.order_by)
+        default = getattr(view, 'queryset', None)
+        if default is not None and ordering == default.query.order_by:
+            return self.keyset_ordering
+        if ordering and all(
+            isinstance(field, str) and field.startswith('-')
+            for field in ordering
+        ):
+            return ordering
+        return self.keyset_ordering
+
+    def get_keyset_paginator(self, request, queryset, view=None):
+        if isinstance(queryset, list):
+            return None
+        params = request.query_params
+        if (params.get('pagination') == 'cursor'
+                or self.keyset_class.cursor_query_param in params):
+            paginator = self.keyset_class()
+            paginator.ordering = self.get_keyset_ordering(queryset, view)
+            return paginator
+        return None
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = self.get_keyset_paginator(request, queryset, view)
+        if self.keyset is not None:
+            return self.keyset.paginate_queryset(queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.keyset is not None:
+            return self.keyset.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+
+def get_table_estimate(queryset):
+    """Оценка числа строк таблицы по статистике планировщика PostgreSQL.
+    Возвращает None, если оценка недоступна.
+    """
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT reltuples FROM pg_class WHERE oid = %s::regclass',
+            [queryset.model._meta.db_table],
+        )
+        row = cursor.fetchone()
+    if row is None or row[0] < 0:
+        return None
+    return int(row[0])
+
+
+def get_cached_count(queryset, version_names=()):
+    """COUNT(*) по кверисету, закэшированный по тексту SQL-запроса
+    и версиям данных version_names (api.cache): запись, которая сбрасывает
+    одну из версий, сбрасывает и count.
+    """
+    sql, params = queryset.query.sql_with_params()
+    versions = get_versions(version_names)
+    stamp = ','.join(f'{name}={versions[name]}' for name in sorted(versions))
+    key = 'count:' + md5(f'{sql}|{params!r}|{stamp}'.encode()).hexdigest()
+    count = cache.get(key)
+    if count is None:
+        count = queryset.count()
+        cache.set(key, count, settings.PAGINATION_COUNT_CACHE_TIMEOUT)
+    return count
+
+
+class EstimatedCountPaginator(DjangoPaginator):
+    """Пагинатор Django с заранее посчитанным (возможно, приблизительным)
+    количеством объектов. При приблизительном count номер страницы не
+    ограничивается сверху, а последняя страница не обрезается по count.
+    """
+
+    def __init__(self, object_list, per_page, count, exact, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.count = count
+        self.exact = exact
+
+    def validate_number(self, number):
+        if self.exact:
+            return super().validate_number(number)
+        try:
+            number = int(number)
+        except (TypeError, ValueError):
+            raise InvalidPage('That page number is not an integer')
+        if number < 1:
+            raise InvalidPage('That page number is less than 1')
+        return number
+
+    def page(self, number):
+        if self.exact:
+            return super().page(number)
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        return self._get_page(
+            self.object_list[bottom:bottom + self.per_page], number, self
+        )
+
+
+class EstimatedCountMixin:
+    """Вместо точного COUNT(*) на каждый запрос отдает:
+    - оценку планировщика для больших таблиц без фильтров;
+    - закэшированный на PAGINATION_COUNT_CACHE_TIMEOUT секунд count
+      для отфильтрованных выборок.
+    Точный подсчет - по ?count=exact, для личных фильтров из
+    exact_count_params и для экшенов из view.exact_count_actions.
+    Ключ закэшированного count включает версии данных из
+    view.get_version_names(), в том числе версию текущего пользователя.
+    """
+    exact_count_params = ()
+    view = None
+
+    def use_exact_count(self, request):
+        params = request.query_params
+        if params.get('count') == 'exact':
+            return True
+        if any(
+            params.get(param) not in (None, '', '0', 'false', 'False')
+            for param in self.exact_count_params
+        ):
+            return True
+        return getattr(self.view, 'action', None) in getattr(
+            self.view, 'exact_count_actions', ()
+        )
+
+    def get_count_version_names(self):
+        get_version_names = getattr(self.view, 'get_version_names', None)
+        return get_version_names() if get_version_names else []
+
+    def estimate_count(self, queryset):
+        """Возвращает пару (count, exact)."""
+        if isinstance(queryset, list):
+            return len(queryset), True
+        if self.use_exact_count(self.request):
+            return queryset.count(), True
+        if not queryset.query.has_filters():
+            estimate = get_table_estimate(queryset)
+            if (estimate is not None
+                    and estimate >= settings.PAGINATION_ESTIMATE_THRESHOLD):
+                return estimate, False
+        return get_cached_count(
+            queryset, self.get_count_version_names()
+        ), False
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.view = view
+        self.request = request
+        return super().paginate_queryset(queryset, request, view)
+
+
+class CustomPagination(
+    KeysetModeMixin, EstimatedCountMixin, PageNumberPagination
+):
+    page_size_query_param = 'limit'
+    exact_count_params = ('is_favorited', 'is_in_shopping_cart', )
+
+    def django_paginator_class(self, object_list, per_page):
+        count, exact = self.estimate_count(object_list)
+        return EstimatedCountPaginator(object_list, per_page, count, exact)
+
+
+class CustomLimitOffsetPagination(
+    KeysetModeMixin, EstimatedCountMixin, LimitOffsetPagination
+):
+    keyset_ordering = ('-id', )
+
+    def get_count(self, queryset):
+        count, _ = self.estimate_count(queryset)
+        return count
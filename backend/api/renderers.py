@@ -0,0 +1,51 @@
+import msgpack
+import orjson
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+ENCODER = JSONEncoder()
+
+
+def encode_default(obj):
+    """Типы, которые не сериализуются напрямую, кодируем как DRF."""
+    return ENCODER.default(obj)
+
+
+class FastJSONRenderer(JSONRenderer):
+    """JSONRenderer на orjson.
+    Для отступов (?indent, браузерное API) и данных, которые orjson
+    не кодирует (целые больше 64 бит, ключи словарей не строки),
+    используется стандартный рендерер. Отличия от JSONRenderer:
+    - числа с плавающей точкой записываются короче, но с тем же значением:
+      1e-05 как 0.00001, 1e+16 как 1e16;
+    - NaN и бесконечности становятся null, а JSONRenderer их не принимает.
+    """
+    options = orjson.OPT_PASSTHROUGH_DATETIME
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if self.get_indent(accepted_media_type, renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(data, default=encode_default,
+                               option=self.options)
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        # Как и JSONRenderer, экранируем U+2028 и U+2029 для JavaScript
+        return ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(
+            b'\xe2\x80\xa9', b'\\u2029'
+        )
+
+
+class MessagePackRenderer(BaseRenderer):
+    """MessagePack для нативных клиентов: Accept: application/msgpack."""
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return msgpack.packb(data, default=encode_default, use_bin_type=True)
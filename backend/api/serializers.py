@@ -1,6 +1,9 @@
 import logging
+from collections import defaultdict
 from logging.handlers import RotatingFileHandler
 
+from django.db import models, transaction
+from django.db.models import prefetch_related_objects
 from djoser.serializers import UserCreateSerializer, UserSerializer
 from drf_extra_fields.fields import Base64ImageField
 from rest_framework import serializers
@@ -8,8 +11,12 @@ from rest_framework.validators import UniqueTogetherValidator
 
 from ingredients.models import Ingredient, Tag
 from recipes.models import Favorite, Recipe, RecipeIngredient, ShoppingBasket
+from recipes.signals import recipe_written
 from users.models import Subscription, User
 
+from .fast import AbbreviatedRecipeCompiled, represent_recipes
+from .viewer import get_viewer
+
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 handler = RotatingFileHandler(
@@ -18,6 +25,37 @@ handler = RotatingFileHandler(
 logger.addHandler(handler)
 
 
+def get_requested_fields(request, available):
+    """Поля ответа по параметрам ?fields=a,b и ?omit=c.
+    Возвращает None, если клиент не ограничивал набор полей.
+    """
+    if request is None:
+        return None
+    fields = request.query_params.get('fields')
+    omit = request.query_params.get('omit')
+    if not fields and not omit:
+        return None
+    selected = set(fields.split(',')) if fields else set(available)
+    if omit:
+        selected -= set(omit.split(','))
+    return tuple(field for field in available if field in selected)
+
+
+class SparseFieldsMixin:
+    """Убирает из сериализатора поля, не запрошенные через ?fields=/?omit=.
+    Методы убранных SerializerMethodField не вызываются и не делают запросов.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        fields = get_requested_fields(
+            self.context.get('request'), list(self.fields)
+        )
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+
 class AbbreviatedRecipeSerializer(serializers.ModelSerializer):
     """Сериализатор для чтения и рецептов в избранном и корзине"""
 
@@ -39,12 +77,10 @@ class CustomUserSerializer(UserSerializer):
         )
 
     def get_is_subscribed(self, obj):
-        user = self.context.get('request').user
-        if user.is_authenticated:
-            return Subscription.objects.filter(
-                user=user, following=obj
-            ).exists()
-        return False
+        request = self.context.get('request')
+        if request is None:
+            return False
+        return get_viewer(request).is_subscribed(obj.pk)
 
 
 class CustomCreateUserSerializer(UserCreateSerializer):
@@ -139,7 +175,18 @@ class SubscriptionSerializer(serializers.ModelSerializer):
         ]
 
 
-class SubscriptionListSerializer(CustomUserSerializer):
+class SubscriptionPageSerializer(serializers.ListSerializer):
+    """Загружает рецепты всех авторов страницы подписок одним запросом."""
+
+    def to_representation(self, data):
+        if isinstance(data, models.Manager):
+            data = data.all()
+        data = list(data)
+        self.child.load_recipes([obj.following_id for obj in data])
+        return super().to_representation(data)
+
+
+class SubscriptionListSerializer(SparseFieldsMixin, CustomUserSerializer):
     """
     Сериализатор для представления списка подписок.
     Отнаследован от  CustomUserSerializer.
@@ -156,6 +203,8 @@ class SubscriptionListSerializer(CustomUserSerializer):
     recipes_count = serializers.SerializerMethodField(
         method_name='get_recipes_count',
     )
+    # Рецепты авторов страницы: {id автора: [строки рецептов]}
+    author_recipes = None
 
     class Meta:
         model = Subscription
@@ -163,25 +212,37 @@ class SubscriptionListSerializer(CustomUserSerializer):
             'id', 'first_name', 'last_name', 'is_subscribed',
             'recipes', 'recipes_count',
         )
+        list_serializer_class = SubscriptionPageSerializer
+
+    def load_recipes(self, author_ids):
+        self.author_recipes = defaultdict(list)
+        if not {'recipes', 'recipes_count'} & set(self.fields):
+            return
+        rows = Recipe.objects.filter(author_id__in=author_ids).values(
+            'author_id', *AbbreviatedRecipeCompiled.values_fields
+        )
+        for row in rows:
+            self.author_recipes[row.pop('author_id')].append(row)
+
+    def get_author_recipes(self, obj):
+        if self.author_recipes is None:
+            self.load_recipes([obj.following_id])
+        return self.author_recipes[obj.following_id]
 
     def get_is_subscribed(self, obj):
-        user = self.context.get('request').user
-        if user.is_authenticated:
-            return Subscription.objects.filter(
-                user=user, following=obj.following
-            ).exists()
-        return False
+        request = self.context.get('request')
+        return get_viewer(request).is_subscribed(obj.following_id)
 
     def get_recipes(self, obj):
         request = self.context.get('request')
         limit = request.GET.get('recipes_limit')
-        paginate_qs = Recipe.objects.filter(author=obj.following)
+        rows = self.get_author_recipes(obj)
         if limit:
-            paginate_qs = paginate_qs[:int(limit)]
-        return AbbreviatedRecipeSerializer(paginate_qs, many=True).data
+            rows = rows[:int(limit)]
+        return AbbreviatedRecipeCompiled(rows=True).many(rows)
 
     def get_recipes_count(self, obj):
-        return Recipe.objects.filter(author=obj.following).count()
+        return len(self.get_author_recipes(obj))
 
 
 class ShoppingBasketSerializer(serializers.ModelSerializer):
@@ -228,26 +289,13 @@ class IngredientSerializer(serializers.ModelSerializer):
 
 
 class RecipeIngredientSerializer(serializers.ModelSerializer):
-    """Промежуточный сериализатор для связи ингридиентов-рецепта-количества."""
-    id = serializers.SlugRelatedField(
-        source='ingredient',
-        slug_field='id',
-        # Выгружаем все ингредиенты через поле ingridient в
-        # промежуточной таблице RecipeIngredient и берем все объекты
-        # ингридиентов связанные в промежуточной модели
-        queryset=Ingredient.objects.all()
-    )
-    name = serializers.SlugRelatedField(
-        # Ссылаемся на модель Ingredient и берем название
-        source='ingredient',
-        slug_field='name',
-        read_only=True
-    )
-    measurement_unit = serializers.SlugRelatedField(
-        # Ссылаемся на модель Ingredient и берем единицу измерения
-        source='ingredient',
-        slug_field='measurement_unit',
-        read_only=True
+    """Промежуточный сериализатор для связи ингридиентов-рецепта-количества.
+    Ингредиент должен быть загружен заранее через select_related.
+    """
+    id = serializers.ReadOnlyField(source='ingredient.id')
+    name = serializers.ReadOnlyField(source='ingredient.name')
+    measurement_unit = serializers.ReadOnlyField(
+        source='ingredient.measurement_unit'
     )
 
     class Meta:
@@ -256,13 +304,24 @@ class RecipeIngredientSerializer(serializers.ModelSerializer):
         fields = ('id', 'name', 'measurement_unit', 'amount', )
 
 
+class RecipeListSerializer(serializers.ListSerializer):
+    """Сериализует страницу рецептов одним обращением к кэшу фрагментов."""
+
+    def to_representation(self, data):
+        if isinstance(data, models.Manager):
+            data = data.all()
+        return self.child.represent(list(data))
+
+
 class RecipeSerializer(serializers.ModelSerializer):
-    """Сериализатор для чтения и изменения данных об ингридиентах."""
+    """Сериализатор для чтения и изменения данных об ингридиентах.
+    Общая для всех пользователей часть рецепта берется из кэша (api.cache),
+    поля конкретного пользователя добавляются поверх нее при ответе.
+    """
     # Вложенный сериализатор
     author = CustomUserSerializer(read_only=True)
-    # В get_ingredients создаем qs связанных ингредиентов с рецептом. Данные
-    # беруться из промежуточной таблицы RecipeIngredients, пполученный qs
-    # отдаем в сериализатор для "отображения" которое нужно нам
+    # В get_ingredients берем связанные с рецептом строки промежуточной
+    # таблицы RecipeIngredient из кэша prefetch_related (amounts)
     ingredients = serializers.SerializerMethodField()
     # Вложенный сериализатор, список
     tags = TagSerializer(many=True, read_only=True)
@@ -287,26 +346,66 @@ class RecipeSerializer(serializers.ModelSerializer):
             'id', 'author', 'ingredients', 'tags', 'name', 'image',
             'text', 'cooking_time', 'is_favorited', 'is_in_shopping_cart'
         )
+        list_serializer_class = RecipeListSerializer
+
+    def to_representation(self, instance):
+        if self.context.get('request') is None:
+            # Публичная часть рецепта без полей пользователя
+            return super().to_representation(instance)
+        return self.represent([instance])[0]
+
+    @staticmethod
+    def build_fragments(recipes):
+        prefetch_related_objects(
+            recipes, *Recipe.objects.serialization_lookups()
+        )
+        public = RecipeSerializer(context={})
+        return [public.to_representation(recipe) for recipe in recipes]
+
+    def represent(self, recipes):
+        """Фрагменты из кэша плюс поля текущего пользователя."""
+        return represent_recipes(
+            recipes, self.context['request'], self.build_fragments
+        )
 
     def get_ingredients(self, obj):
-        queryset = RecipeIngredient.objects.filter(recipe=obj)
-        return RecipeIngredientSerializer(queryset, many=True).data
+        return RecipeIngredientSerializer(obj.amounts.all(), many=True).data
 
     def get_is_favorited(self, obj):
-        user = self.context.get('request').user
-        if user.is_authenticated:
-            return Favorite.objects.filter(
-                user=user, recipe=obj
-            ).exists()
-        return False
+        request = self.context.get('request')
+        if request is None:
+            return False
+        # Флаг уже посчитан в RecipeViewSet.get_queryset
+        if hasattr(obj, 'is_favorited'):
+            return obj.is_favorited
+        return get_viewer(request).is_favorited(obj.pk)
 
     def get_is_in_shopping_cart(self, obj):
-        user = self.context.get('request').user
-        if user.is_authenticated:
-            return ShoppingBasket.objects.filter(
-                user=user, recipe=obj
-            ).exists()
-        return False
+        request = self.context.get('request')
+        if request is None:
+            return False
+        if hasattr(obj, 'is_in_shopping_cart'):
+            return obj.is_in_shopping_cart
+        return get_viewer(request).is_in_shopping_cart(obj.pk)
+
+
+class CookQuerySerializer(serializers.Serializer):
+    """Параметры подбора рецептов по имеющимся ингредиентам."""
+    ingredients = serializers.ListField(
+        child=serializers.IntegerField(min_value=1), allow_empty=False
+    )
+    max_missing = serializers.IntegerField(min_value=0, required=False)
+
+
+class IngredientQuerySerializer(serializers.Serializer):
+    """Параметры поиска ингредиентов по началу названия."""
+    name = serializers.CharField(required=False, allow_blank=True)
+    limit = serializers.IntegerField(min_value=1, required=False)
+
+
+class CatalogDeltaQuerySerializer(serializers.Serializer):
+    """Версия каталога ингредиентов, с которой нужны изменения."""
+    since = serializers.IntegerField(min_value=0)
 
 
 class CreateIngredientRecipeSerializer(serializers.ModelSerializer):
@@ -337,6 +436,9 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
     def to_representation(self, instance):
         request = self.context.get('request')
         context = {'request': request}
+        instance = Recipe.objects.for_serialization(request.user).get(
+            pk=instance.pk
+        )
         return RecipeSerializer(instance, context=context).data
 
     def validate(self, attrs):
@@ -389,6 +491,7 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
     def adding_tags(tags, obj):
         return obj.tags.set(tags)
 
+    @transaction.atomic
     def create(self, validated_data):
         author = self.context.get('request').user
         ingredients = validated_data.pop('ingredients')
@@ -396,13 +499,26 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
         recipe = Recipe.objects.create(author=author, **validated_data)
         self.adding_tags(tags=tags, obj=recipe)
         self.adding_ingredients(ingredients=ingredients, obj=recipe)
+        recipe_written.send(
+            sender=Recipe, instance=recipe, previous_ingredients=set()
+        )
         return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
+        previous_ingredients = set(
+            instance.amounts.values_list('ingredient_id', flat=True)
+        )
         instance.tags.clear()
         RecipeIngredient.objects.filter(recipe=instance).delete()
         ingredients = validated_data.pop('ingredients')
         tags = validated_data.pop('tags')
         self.adding_tags(tags=tags, obj=instance)
         self.adding_ingredients(ingredients=ingredients, obj=instance)
-        return super().update(instance, validated_data)
+        instance = super().update(instance, validated_data)
+        recipe_written.send(
+            sender=Recipe,
+            instance=instance,
+            previous_ingredients=previous_ingredients,
+        )
+        return instance
@@ -1,42 +1,146 @@
+import csv
+import json
+from functools import lru_cache
+from itertools import islice
+from tempfile import SpooledTemporaryFile
+
 import reportlab
 from django.conf import settings
-from django.http import HttpResponse
+from django.db.models import Sum
+from django.http import FileResponse, StreamingHttpResponse
 from reportlab.pdfbase import pdfmetrics
 from reportlab.pdfbase.ttfonts import TTFont
 from reportlab.pdfgen import canvas
 
+from recipes.models import RecipeIngredient, ShoppingBasket
+
 reportlab.rl_config.TTFSearchPath.append(
     str(settings.BASE_DIR) + '/ingredients/data'
 )
 
+# Строки списка на странице: от PAGE_TOP вниз до PAGE_BOTTOM
+PAGE_TOP = 720
+PAGE_BOTTOM = 40
+LINE_STEP = 30
+INDENT = 30
+PDF_SPOOL_SIZE = 1024 * 1024
+# Сколько строк списка покупок уходит клиенту одним куском
+STREAM_BATCH_SIZE = 100
 
-def creating_a_shopping_list(data):
-    """Функция для формирования списка покупок."""
-    shopping_list = {}
-    for i, (name, mu, amount) in enumerate(data):
-        if name in shopping_list:
-            shopping_list[name][0] += amount
-        else:
-            shopping_list[name] = [amount, mu]
+
+def get_shopping_list(user):
+    """Список покупок одним запросом: суммы количеств ингредиентов
+    рецептов из корзины, по названию и единице измерения, так что разные
+    единицы одного продукта не складываются.
+    """
+    return RecipeIngredient.objects.filter(
+        recipe__in=ShoppingBasket.objects.filter(user=user).values('recipe')
+    ).values_list(
+        'ingredient__name', 'ingredient__measurement_unit'
+    ).annotate(
+        total=Sum('amount'),
+    ).order_by('ingredient__name', 'ingredient__measurement_unit')
+
+
+@lru_cache(maxsize=None)
+def register_fonts():
+    """Шрифты регистрируются один раз на процесс."""
     pdfmetrics.registerFont(TTFont(
         'Poetsen', 'Poetsen-One.ttf', 'UTF-8'
     ))
-    response = HttpResponse(content_type='application/pdf')
-    response[
-        'Content-Disposition'
-    ] = 'attachment; filename="shopping_list.pdf"'
-    pdf = canvas.Canvas(response)
+
+
+def creating_a_shopping_list(data):
+    """Функция для формирования списка покупок из строк
+    (название, единица измерения, количество).
+    reportlab собирает PDF целиком при save(), поэтому документ пишется
+    во временный файл (в памяти до PDF_SPOOL_SIZE байт, дальше на диске),
+    который отдается клиенту потоком.
+    """
+    register_fonts()
+    output = SpooledTemporaryFile(max_size=PDF_SPOOL_SIZE)
+    pdf = canvas.Canvas(output)
     pdf.setFont('Poetsen', 14)
-    step = 720
-    indent = 30
-    count = 1
-    for key, value in shopping_list.items():
+    step = PAGE_TOP
+    for count, (name, measurement_unit, amount) in enumerate(data, 1):
+        if step < PAGE_BOTTOM:
+            pdf.showPage()
+            pdf.setFont('Poetsen', 14)
+            step = PAGE_TOP
         pdf.drawString(
-            indent, step,
-            f'{count}. {key} - {value[0]}, {value[1]}'
+            INDENT, step,
+            f'{count}. {name} - {amount}, {measurement_unit}'
         )
-        step -= 30
-        count += 1
+        step -= LINE_STEP
     pdf.showPage()
     pdf.save()
+    size = output.tell()
+    output.seek(0)
+    response = FileResponse(
+        output, as_attachment=True, filename='shopping_list.pdf'
+    )
+    response['Content-Length'] = size
+    return response
+
+
+class Echo:
+    """Файл для csv.writer, который возвращает записанную строку."""
+
+    def write(self, value):
+        return value
+
+
+def csv_lines(data):
+    writer = csv.writer(Echo())
+    yield writer.writerow(('name', 'measurement_unit', 'amount'))
+    for row in data:
+        yield writer.writerow(row)
+
+
+def txt_lines(data):
+    for count, (name, measurement_unit, amount) in enumerate(data, 1):
+        yield f'{count}. {name} - {amount}, {measurement_unit}\n'
+
+
+def json_lines(data):
+    separator = ''
+    yield '['
+    for name, measurement_unit, amount in data:
+        yield separator + json.dumps({
+            'name': name,
+            'measurement_unit': measurement_unit,
+            'amount': amount,
+        }, ensure_ascii=False)
+        separator = ','
+    yield ']'
+
+
+# Форматы списка покупок кроме PDF: генератор строк и Content-Type
+SHOPPING_LIST_FORMATS = {
+    'csv': (csv_lines, 'text/csv; charset=utf-8'),
+    'txt': (txt_lines, 'text/plain; charset=utf-8'),
+    'json': (json_lines, 'application/json'),
+}
+
+
+def batches(lines):
+    lines = iter(lines)
+    while True:
+        batch = ''.join(islice(lines, STREAM_BATCH_SIZE))
+        if not batch:
+            return
+        yield batch.encode()
+
+
+def streaming_shopping_list(data, file_format):
+    """Список покупок в текстовом формате, который пишется клиенту
+    по мере чтения строк data (курсора запроса).
+    """
+    lines, content_type = SHOPPING_LIST_FORMATS[file_format]
+    response = StreamingHttpResponse(
+        batches(lines(data)), content_type=content_type
+    )
+    response['Content-Disposition'] = (
+        f'attachment; filename="shopping_list.{file_format}"'
+    )
     return response
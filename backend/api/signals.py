@@ -0,0 +1,212 @@
+from django.db.models import F
+from django.db.models.signals import (m2m_changed, post_delete, post_save,
+                                      pre_delete, pre_save)
+from django.dispatch import receiver
+from django.utils import timezone
+
+from ingredients.models import Ingredient, IngredientTombstone, Tag
+from recipes import feed, ingredient_index, minhash
+from recipes.models import (Favorite, Recipe, RecipeIngredient, RecipeTag,
+                            SavedRecipeRemoval, ShoppingBasket)
+from recipes.signals import recipe_written
+from users.models import Subscription, User
+
+from .cache import bump_version
+from .cards import refresh_recipe_cards
+
+# Поля пользователя в ответах API и в карточках рецептов
+CARD_USER_FIELDS = {'email', 'username', 'first_name', 'last_name'}
+# Поля тегов и ингредиентов в карточках рецептов
+CARD_FIELDS = {
+    Tag: ('name', 'color', 'slug'),
+    Ingredient: ('name', 'measurement_unit'),
+}
+# Счетчики рецепта для связей пользователь-рецепт
+RECIPE_COUNTERS = {
+    Favorite: 'favorites_count',
+    ShoppingBasket: 'in_carts_count',
+}
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+def recipe_changed(sender, instance, **kwargs):
+    bump_version(f'recipe:{instance.pk}', 'recipes')
+
+
+def touch_recipes(*pks):
+    """Обновляет updated_at рецептов при изменении их тегов и ингредиентов."""
+    Recipe.objects.filter(pk__in=pks).update(updated_at=timezone.now())
+    bump_version(*(f'recipe:{pk}' for pk in pks), 'recipes')
+
+
+@receiver(post_save, sender=RecipeTag)
+@receiver(post_delete, sender=RecipeTag)
+@receiver(post_save, sender=RecipeIngredient)
+@receiver(post_delete, sender=RecipeIngredient)
+def recipe_relation_changed(sender, instance, **kwargs):
+    touch_recipes(instance.recipe_id)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def recipe_tags_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if not action.startswith('post_'):
+        return
+    if not reverse:
+        touch_recipes(instance.pk)
+    elif pk_set:
+        touch_recipes(*pk_set)
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_created(sender, instance, created, **kwargs):
+    if created:
+        feed.fan_out(instance)
+
+
+@receiver(post_save, sender=Subscription)
+def subscription_created(sender, instance, created, **kwargs):
+    if created:
+        feed.subscribed(instance.user_id, instance.following_id)
+
+
+@receiver(post_delete, sender=Subscription)
+def subscription_deleted(sender, instance, **kwargs):
+    feed.unsubscribed(instance.user_id, instance.following_id)
+
+
+@receiver(pre_delete, sender=Recipe)
+def recipe_deleting(sender, instance, **kwargs):
+    ingredient_index.remove_recipe(
+        instance.pk,
+        instance.amounts.values_list('ingredient_id', flat=True),
+    )
+
+
+@receiver(recipe_written, sender=Recipe)
+def recipe_written_handler(sender, instance, previous_ingredients=(),
+                           **kwargs):
+    refresh_recipe_cards([instance.pk])
+    ingredient_index.update_recipe(instance.pk, previous_ingredients)
+    minhash.save_signatures([instance.pk])
+
+
+@receiver(post_save, sender=User)
+def user_changed(sender, instance, update_fields=None, **kwargs):
+    # Вход пользователя сохраняет только last_login: фрагменты, списки
+    # и карточки рецептов от него не зависят
+    if update_fields is not None and not CARD_USER_FIELDS & set(
+        update_fields
+    ):
+        return
+    bump_version(f'user:{instance.pk}', 'users')
+    refresh_recipe_cards(instance.recipes.values_list('pk', flat=True))
+
+
+@receiver(post_save, sender=Favorite)
+@receiver(post_delete, sender=Favorite)
+@receiver(post_save, sender=ShoppingBasket)
+@receiver(post_delete, sender=ShoppingBasket)
+@receiver(post_save, sender=Subscription)
+@receiver(post_delete, sender=Subscription)
+def viewer_changed(sender, instance, **kwargs):
+    bump_version(f'viewer:{instance.user_id}')
+
+
+def change_counter(model, recipe_id, delta):
+    field = RECIPE_COUNTERS[model]
+    recipes = Recipe.objects.filter(pk=recipe_id)
+    if delta < 0:
+        recipes = recipes.filter(**{f'{field}__gt': 0})
+    recipes.update(**{field: F(field) + delta})
+    bump_version('popularity')
+
+
+@receiver(post_save, sender=Favorite)
+@receiver(post_save, sender=ShoppingBasket)
+def recipe_counter_added(sender, instance, created, **kwargs):
+    if created:
+        change_counter(sender, instance.recipe_id, 1)
+
+
+@receiver(post_delete, sender=Favorite)
+@receiver(post_delete, sender=ShoppingBasket)
+def recipe_counter_removed(sender, instance, **kwargs):
+    change_counter(sender, instance.recipe_id, -1)
+
+
+@receiver(post_delete, sender=Favorite)
+@receiver(post_delete, sender=ShoppingBasket)
+def saved_recipe_removed(sender, instance, **kwargs):
+    # Похожие рецепты считаются по паре пользователь-рецепт в избранном
+    # или корзине: пока рецепт остается во второй связи, пара не меняется
+    other = ShoppingBasket if sender is Favorite else Favorite
+    if other.objects.filter(
+        user_id=instance.user_id, recipe_id=instance.recipe_id
+    ).exists():
+        return
+    SavedRecipeRemoval.objects.create(
+        user_id=instance.user_id, recipe_id=instance.recipe_id
+    )
+
+
+@receiver(post_delete, sender=Recipe)
+def saved_recipe_deleted(sender, instance, **kwargs):
+    # Связи удаленного рецепта удаляются каскадом раньше него, а его строки
+    # похожих рецептов удаляются вместе с ним: события не нужны
+    SavedRecipeRemoval.objects.filter(recipe_id=instance.pk).delete()
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def tag_changed(sender, **kwargs):
+    bump_version('tags')
+
+
+@receiver(pre_save, sender=Tag)
+@receiver(pre_save, sender=Ingredient)
+def card_source_saving(sender, instance, update_fields=None, **kwargs):
+    """Запоминает, меняются ли поля карточек рецептов: только тогда
+    карточки пересобираются после сохранения.
+    """
+    fields = CARD_FIELDS[sender]
+    if update_fields is not None:
+        fields = [field for field in fields if field in update_fields]
+    instance._card_changed = False
+    if instance.pk is None or not fields:
+        return
+    previous = sender.objects.filter(pk=instance.pk).values(*fields).first()
+    instance._card_changed = previous is not None and any(
+        previous[field] != getattr(instance, field) for field in fields
+    )
+
+
+@receiver(post_save, sender=Tag)
+def tag_saved(sender, instance, created, **kwargs):
+    if created or not getattr(instance, '_card_changed', False):
+        return
+    refresh_recipe_cards(
+        instance.recipe_tags.values_list('recipe_id', flat=True)
+    )
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def ingredient_changed(sender, **kwargs):
+    bump_version('ingredients')
+
+
+@receiver(post_delete, sender=Ingredient)
+def ingredient_deleted(sender, instance, **kwargs):
+    IngredientTombstone.objects.update_or_create(
+        ingredient_id=instance.pk, defaults={'deleted_at': timezone.now()}
+    )
+
+
+@receiver(post_save, sender=Ingredient)
+def ingredient_saved(sender, instance, created, **kwargs):
+    if created or not getattr(instance, '_card_changed', False):
+        return
+    refresh_recipe_cards(
+        instance.amounts.values_list('recipe_id', flat=True)
+    )
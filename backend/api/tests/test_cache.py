@@ -0,0 +1,94 @@
+"""Кэш публичных фрагментов рецептов и версии данных."""
+from django.contrib.auth.signals import user_logged_in
+from django.core.cache import cache
+
+from ..cache import (bump_version, get_recipe_fragments, get_version,
+                     version_key)
+from .utils import APICacheTestCase, create_catalog
+
+
+class RecipeFragmentTests(APICacheTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.users, cls.tags, _, cls.recipes = create_catalog(recipes=4)
+
+    def setUp(self):
+        super().setUp()
+        self.built = []
+
+    def build(self, recipes):
+        self.built.extend(recipe.pk for recipe in recipes)
+        return [{'id': recipe.pk, 'name': recipe.name} for recipe in recipes]
+
+    def fragments(self):
+        self.built.clear()
+        return get_recipe_fragments(self.recipes, self.build)
+
+    def test_fragments_are_cached(self):
+        first = self.fragments()
+        self.assertEqual(self.built, [recipe.pk for recipe in self.recipes])
+        self.assertEqual(
+            [fragment['id'] for fragment in first],
+            [recipe.pk for recipe in self.recipes],
+        )
+        self.assertEqual(self.fragments(), first)
+        self.assertEqual(self.built, [])
+
+    def test_equal_stamps_do_not_mix_recipes(self):
+        # Одинаковые метки версий (грубые часы, несколько хостов)
+        cache.set_many({
+            version_key(f'recipe:{recipe.pk}'): 1 for recipe in self.recipes
+        }, None)
+        self.assertEqual(
+            [fragment['id'] for fragment in self.fragments()],
+            [recipe.pk for recipe in self.recipes],
+        )
+
+    def test_version_is_reset_after_commit(self):
+        version = get_version('tags')
+        bump_version('tags')
+        self.assertEqual(get_version('tags'), version)
+        with self.captureOnCommitCallbacks(execute=True):
+            bump_version('tags')
+        self.assertNotEqual(get_version('tags'), version)
+
+    def test_recipe_change_rebuilds_only_its_fragment(self):
+        self.fragments()
+        recipe = self.recipes[1]
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe.name = 'Новое название'
+            recipe.save()
+        fragments = self.fragments()
+        self.assertEqual(self.built, [recipe.pk])
+        self.assertEqual(fragments[1]['name'], 'Новое название')
+
+    def test_author_change_rebuilds_author_recipes(self):
+        self.fragments()
+        author = self.users[0]
+        with self.captureOnCommitCallbacks(execute=True):
+            author.first_name = 'Другое'
+            author.save()
+        self.fragments()
+        self.assertEqual(self.built, [
+            recipe.pk for recipe in self.recipes
+            if recipe.author_id == author.pk
+        ])
+
+    def test_login_keeps_fragments(self):
+        self.fragments()
+        author = self.users[0]
+        versions = get_version('users')
+        with self.captureOnCommitCallbacks(execute=True):
+            user_logged_in.send(
+                sender=type(author), request=None, user=author
+            )
+        self.fragments()
+        self.assertEqual(self.built, [])
+        self.assertEqual(get_version('users'), versions)
+
+    def test_tag_change_rebuilds_all(self):
+        self.fragments()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.tags[0].save()
+        self.fragments()
+        self.assertEqual(len(self.built), len(self.recipes))
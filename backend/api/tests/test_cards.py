@@ -0,0 +1,86 @@
+"""Карточки рецептов: сборка при записи и при чтении устаревших."""
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+import orjson
+from django.core.management import call_command
+from django.utils import timezone
+
+from ingredients.models import Ingredient, Tag
+from recipes.models import Recipe, RecipeCard
+
+from ..cards import get_card_fragments
+from ..fast import build_recipe_fragments
+from .utils import APICacheTestCase, create_catalog
+
+
+class RecipeCardTests(APICacheTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.users, cls.tags, cls.ingredients, _ = create_catalog(recipes=4)
+        call_command('rebuild_recipe_cards', stdout=StringIO())
+
+    def card(self, recipe):
+        return orjson.loads(RecipeCard.objects.get(recipe=recipe).data)
+
+    def recipes(self):
+        return list(Recipe.objects.order_by('pk'))
+
+    def test_rebuild(self):
+        recipes = self.recipes()
+        self.assertEqual(
+            [self.card(recipe) for recipe in recipes],
+            orjson.loads(orjson.dumps(build_recipe_fragments(recipes))),
+        )
+
+    def test_fresh_cards_need_no_queries(self):
+        recipes = list(Recipe.objects.select_related('card').order_by('pk'))
+        with self.assertNumQueries(0):
+            fragments = get_card_fragments(recipes)
+        self.assertEqual(fragments[0], self.card(recipes[0]))
+
+    def test_stale_and_missing_cards_are_rebuilt(self):
+        stale, missing = self.recipes()[:2]
+        Recipe.objects.filter(pk=stale.pk).update(
+            name='Переименован', updated_at=timezone.now() + timedelta(1)
+        )
+        RecipeCard.objects.filter(recipe=missing).delete()
+        fragments = get_card_fragments(self.recipes())
+        self.assertEqual(fragments[0]['name'], 'Переименован')
+        self.assertEqual(self.card(stale)['name'], 'Переименован')
+        self.assertEqual(fragments[1], self.card(missing))
+
+    def test_related_changes_refresh_cards(self):
+        recipe = self.recipes()[0]
+        author = recipe.author
+        author.first_name = 'Новое имя'
+        author.save()
+        self.assertEqual(
+            self.card(recipe)['author']['first_name'], 'Новое имя'
+        )
+        tag = recipe.tags.first()
+        tag.name = 'Новый тег'
+        tag.save()
+        self.assertIn(
+            'Новый тег', [row['name'] for row in self.card(recipe)['tags']]
+        )
+        ingredient = recipe.ingredients.first()
+        ingredient.measurement_unit = 'кг'
+        ingredient.save()
+        self.assertIn('кг', [
+            row['measurement_unit'] for row in self.card(recipe)['ingredients']
+        ])
+
+    def test_saves_without_card_changes_keep_cards(self):
+        recipe = self.recipes()[0]
+        tag = recipe.tags.first()
+        ingredient = recipe.ingredients.first()
+        with mock.patch('api.signals.refresh_recipe_cards') as refresh:
+            Tag.objects.create(name='Новый', color='#000000', slug='new')
+            Ingredient.objects.create(name='шафран', measurement_unit='г')
+            tag.save()
+            ingredient.save()
+            ingredient.name = 'переименован'
+            ingredient.save(update_fields=['measurement_unit'])
+        refresh.assert_not_called()
@@ -0,0 +1,82 @@
+"""Условные GET: ETag и Last-Modified рецептов, тегов и ингредиентов."""
+from recipes.models import Favorite
+
+from .utils import APICacheTestCase, create_catalog
+
+
+class ConditionalGetTests(APICacheTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.users, cls.tags, _, cls.recipes = create_catalog(recipes=4)
+        cls.viewer = cls.users[0]
+
+    def revalidate(self, client, url, response, queries):
+        with self.assertNumQueries(queries):
+            return client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+
+    def test_recipe_list(self):
+        client = self.client_for(self.viewer)
+        first = client.get('/api/recipes/')
+        self.assertEqual(first.status_code, 200)
+        self.assertIn('Authorization', first['Vary'])
+        # Версии читаются из кэша, база не нужна
+        not_modified = self.revalidate(client, '/api/recipes/', first, 0)
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual(not_modified['ETag'], first['ETag'])
+        with self.captureOnCommitCallbacks(execute=True):
+            Favorite.objects.create(user=self.viewer, recipe=self.recipes[0])
+        changed = client.get(
+            '/api/recipes/', HTTP_IF_NONE_MATCH=first['ETag']
+        )
+        self.assertEqual(changed.status_code, 200)
+        # Избранное одного пользователя не меняет ответ другим
+        other = self.client_for(self.users[1])
+        response = other.get('/api/recipes/')
+        self.assertEqual(
+            self.revalidate(other, '/api/recipes/', response, 0).status_code,
+            304,
+        )
+
+    def test_etag_depends_on_query(self):
+        client = self.client_for()
+        first = client.get('/api/recipes/')
+        filtered = client.get(
+            '/api/recipes/', {'tags': self.tags[0].slug},
+            HTTP_IF_NONE_MATCH=first['ETag'],
+        )
+        self.assertEqual(filtered.status_code, 200)
+        self.assertNotEqual(filtered['ETag'], first['ETag'])
+
+    def test_recipe_detail(self):
+        client = self.client_for()
+        recipe = self.recipes[0]
+        url = f'/api/recipes/{recipe.pk}/'
+        first = client.get(url)
+        self.assertIn('Last-Modified', first)
+        # Только updated_at и автор рецепта
+        not_modified = self.revalidate(client, url, first, 1)
+        self.assertEqual(not_modified.status_code, 304)
+        with self.assertNumQueries(1):
+            response = client.get(
+                url, HTTP_IF_MODIFIED_SINCE=first['Last-Modified']
+            )
+        self.assertEqual(response.status_code, 304)
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe.cooking_time += 5
+            recipe.save()
+        changed = client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(changed.status_code, 200)
+        self.assertEqual(changed.data['cooking_time'], recipe.cooking_time)
+
+    def test_tags(self):
+        client = self.client_for()
+        first = client.get('/api/tags/')
+        self.assertEqual(
+            self.revalidate(client, '/api/tags/', first, 0).status_code, 304
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            self.tags[0].name = 'Завтрак'
+            self.tags[0].save()
+        changed = client.get('/api/tags/', HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(changed.status_code, 200)
+        self.assertIn('Завтрак', [row['name'] for row in changed.data])
@@ -0,0 +1,73 @@
+"""Фильтры рецептов: теги, избранное, корзина и их сочетания."""
+from recipes.models import Favorite, ShoppingBasket
+
+from .utils import APICacheTestCase, create_catalog
+
+
+class RecipeFilterTests(APICacheTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.users, cls.tags, _, cls.recipes = create_catalog(recipes=9)
+        cls.viewer = cls.users[0]
+        for recipe in cls.recipes[:6]:
+            Favorite.objects.create(user=cls.viewer, recipe=recipe)
+        for recipe in cls.recipes[3:]:
+            ShoppingBasket.objects.create(user=cls.viewer, recipe=recipe)
+        # Чужое избранное не влияет на выборку
+        Favorite.objects.create(user=cls.users[1], recipe=cls.recipes[8])
+
+    def ids(self, params, user=None):
+        response = self.client_for(user).get(
+            '/api/recipes/', {**params, 'limit': 100}
+        )
+        self.assertEqual(response.status_code, 200)
+        ids = [row['id'] for row in response.data['results']]
+        self.assertEqual(response.data['count'], len(ids))
+        return ids
+
+    def expected(self, recipes):
+        return sorted((recipe.pk for recipe in recipes), reverse=True)
+
+    def test_tags_without_duplicates(self):
+        # У рецепта может быть несколько тегов из фильтра
+        self.assertEqual(
+            self.ids({'tags': [tag.slug for tag in self.tags]}),
+            self.expected(self.recipes),
+        )
+        self.assertEqual(
+            self.ids({'tags': self.tags[2].slug}),
+            self.expected(self.recipes[2::3]),
+        )
+
+    def test_user_filters(self):
+        self.assertEqual(
+            self.ids({'is_favorited': 1}, self.viewer),
+            self.expected(self.recipes[:6]),
+        )
+        self.assertEqual(
+            self.ids({'is_favorited': 1, 'is_in_shopping_cart': 1},
+                     self.viewer),
+            self.expected(self.recipes[3:6]),
+        )
+        self.assertEqual(
+            self.ids({'is_favorited': 0}, self.viewer),
+            self.expected(self.recipes),
+        )
+        self.assertEqual(self.ids({'is_favorited': 1}), [])
+
+    def test_combined_filters(self):
+        author = self.users[1]
+        self.assertEqual(
+            self.ids({
+                'author': author.pk,
+                'tags': [self.tags[1].slug, self.tags[2].slug],
+                'is_in_shopping_cart': 1,
+            }, self.viewer),
+            self.expected(
+                recipe for recipe in self.recipes[3:]
+                if recipe.author_id == author.pk
+                and recipe.tags.filter(pk__in=[
+                    self.tags[1].pk, self.tags[2].pk
+                ]).exists()
+            ),
+        )
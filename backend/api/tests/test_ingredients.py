@@ -0,0 +1,222 @@
+"""Каталог ингредиентов: снимок, изменения и поиск из индекса в памяти.
+
+Снимок и индекс в памяти процесса узнают об изменениях только по версии
+'ingredients' в общем кэше и по состоянию каталога в базе.
+"""
+import gzip
+import time
+from unittest import mock
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import SimpleTestCase, override_settings
+from django.utils import timezone
+
+from ingredients.models import Ingredient
+
+from .. import autocomplete, catalog
+from ..cache import version_key
+from .utils import APICacheTestCase
+
+NAMES = ('молоко', 'мука', 'Мёд', 'масло сливочное', 'соль')
+
+
+def lookups(node):
+    """Условия WHERE кверисета: (lookup, значение)."""
+    for child in node.children:
+        if hasattr(child, 'children'):
+            yield from lookups(child)
+        else:
+            yield child.lookup_name, child.rhs
+
+
+class IngredientCatalogTests(APICacheTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.ingredients = [
+            Ingredient.objects.create(name=name, measurement_unit='г')
+            for name in NAMES
+        ]
+
+    def setUp(self):
+        super().setUp()
+        catalog._current.clear()
+        autocomplete._current.clear()
+        self.client = self.client_for()
+
+    def change_elsewhere(self, bump=True, **fields):
+        """Изменение в другом процессе: его сигналы сбрасывают версию
+        'ingredients' в общем кэше (bump=False - запись в обход сигналов).
+        """
+        time.sleep(0.001)
+        Ingredient.objects.filter(pk=self.ingredients[0].pk).update(
+            updated_at=timezone.now(), **fields
+        )
+        if bump:
+            cache.delete(version_key('ingredients'))
+
+    def names(self, response):
+        return [row['name'] for row in response.json()]
+
+    def test_snapshot(self):
+        response = self.client.get('/api/ingredients/')
+        self.assertEqual(sorted(self.names(response)), sorted(NAMES))
+        compressed = self.client.get(
+            '/api/ingredients/', HTTP_ACCEPT_ENCODING='gzip'
+        )
+        self.assertEqual(compressed['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(compressed.content), response.content)
+        not_modified = self.client.get(
+            '/api/ingredients/', HTTP_IF_NONE_MATCH=response['ETag']
+        )
+        self.assertEqual(not_modified.status_code, 304)
+
+    def test_snapshot_sees_changes_from_other_processes(self):
+        first = self.client.get('/api/ingredients/')
+        self.change_elsewhere(name='кефир')
+        second = self.client.get('/api/ingredients/')
+        self.assertIn('кефир', self.names(second))
+        self.assertNotEqual(second['ETag'], first['ETag'])
+        self.assertGreater(
+            int(second[catalog.VERSION_HEADER]),
+            int(first[catalog.VERSION_HEADER]),
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            Ingredient.objects.filter(pk=self.ingredients[1].pk).delete()
+        third = self.client.get('/api/ingredients/')
+        self.assertNotIn('мука', self.names(third))
+
+    def test_unchanged_catalog_needs_no_queries(self):
+        first = self.client.get('/api/ingredients/')
+        with self.assertNumQueries(0):
+            second = self.client.get(
+                '/api/ingredients/', HTTP_IF_NONE_MATCH=first['ETag']
+            )
+        self.assertEqual(second.status_code, 304)
+
+    @override_settings(INGREDIENT_CATALOG_STATE_TTL=0)
+    def test_writes_without_signals(self):
+        # Состояние в кэше устарело: перечитывается из базы
+        self.client.get('/api/ingredients/')
+        self.change_elsewhere(bump=False, name='кефир')
+        self.assertIn(
+            'кефир', self.names(self.client.get('/api/ingredients/'))
+        )
+
+    def test_delta(self):
+        version = self.client.get('/api/ingredients/')[
+            catalog.VERSION_HEADER
+        ]
+        self.change_elsewhere(measurement_unit='мл')
+        deleted = self.ingredients[1].pk
+        with self.captureOnCommitCallbacks(execute=True):
+            self.ingredients[1].delete()
+        delta = self.client.get(
+            '/api/ingredients/delta/', {'since': version}
+        ).json()
+        self.assertEqual(
+            [row['id'] for row in delta['changed']], [self.ingredients[0].pk]
+        )
+        self.assertEqual(delta['deleted'], [deleted])
+        empty = self.client.get(
+            '/api/ingredients/delta/', {'since': delta['version']}
+        ).json()
+        self.assertEqual((empty['changed'], empty['deleted']), ([], []))
+
+    def test_prefix_search(self):
+        response = self.client.get('/api/ingredients/', {'name': 'МЕ'})
+        self.assertEqual(self.names(response), ['Мёд'])
+        # Порядок каталога, как из базы
+        expected = [
+            name for name in Ingredient.objects.values_list('name', flat=True)
+            if name.lower().startswith('м')
+        ]
+        response = self.client.get('/api/ingredients/', {'name': 'м'})
+        self.assertEqual(self.names(response), expected)
+        response = self.client.get(
+            '/api/ingredients/', {'name': 'М', 'limit': 2}
+        )
+        self.assertEqual(self.names(response), expected[:2])
+
+    def test_index_search_needs_no_queries(self):
+        self.client.get('/api/ingredients/', {'name': 'м'})
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/ingredients/', {'name': 'мо'})
+        self.assertEqual(self.names(response), ['молоко'])
+
+    def test_index_sees_changes_from_other_processes(self):
+        first = self.client.get('/api/ingredients/', {'name': 'ке'})
+        self.assertEqual(self.names(first), [])
+        self.change_elsewhere(name='кефир')
+        second = self.client.get(
+            '/api/ingredients/', {'name': 'ке'},
+            HTTP_IF_NONE_MATCH=first['ETag'],
+        )
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(self.names(second), ['кефир'])
+        with self.captureOnCommitCallbacks(execute=True):
+            Ingredient.objects.create(name='кетчуп', measurement_unit='г')
+        third = self.client.get('/api/ingredients/', {'name': 'ке'})
+        self.assertEqual(self.names(third), ['кетчуп', 'кефир'])
+
+    def test_fuzzy_search(self):
+        response = self.client.get(
+            '/api/ingredients/', {'name': 'малоко', 'fuzzy': 'true'}
+        )
+        self.assertEqual(self.names(response)[0], 'молоко')
+
+    def test_fuzzy_threshold_below_default(self):
+        # Сходство 'малако' и 'молоко' ниже 0.3 - порога pg_trgm
+        params = {'name': 'малако', 'fuzzy': 'true'}
+        response = self.client.get('/api/ingredients/', params)
+        self.assertNotIn('молоко', self.names(response))
+        with override_settings(INGREDIENT_FUZZY_THRESHOLD=0.1):
+            response = self.client.get('/api/ingredients/', params)
+        self.assertEqual(self.names(response)[0], 'молоко')
+
+    @override_settings(INGREDIENT_FUZZY_THRESHOLD=0.1)
+    def test_postgresql_threshold(self):
+        with mock.patch.object(connection, 'vendor', 'postgresql'):
+            with mock.patch.object(connection, 'cursor') as cursor:
+                queryset = autocomplete.fuzzy_search(
+                    Ingredient.objects.all(), 'малако'
+                )
+        cursor.return_value.__enter__.return_value.execute.assert_called_with(
+            "SELECT set_config('pg_trgm.similarity_threshold', %s, false)",
+            ['0.1'],
+        )
+        self.assertIn(('gte', 0.1), lookups(queryset.query.where))
+
+
+class FuzzyIndexTests(SimpleTestCase):
+    def setUp(self):
+        self.index = autocomplete.IngredientIndex([
+            {'id': number, 'name': name}
+            for number, name in enumerate(NAMES + ('молочная сыворотка',))
+        ])
+
+    def names(self, rows):
+        return [row['name'] for row in rows]
+
+    def test_trigrams(self):
+        # Как show_trgm('Мёд!') в pg_trgm
+        self.assertEqual(
+            autocomplete.trigrams('Мёд!'), {'  м', ' ме', 'мед', 'ед '}
+        )
+        self.assertEqual(
+            autocomplete.trigrams('соль, перец'),
+            autocomplete.trigrams('соль') | autocomplete.trigrams('перец'),
+        )
+
+    def test_prefix_matches_come_first(self):
+        self.assertEqual(
+            self.names(self.index.fuzzy('мол', 10, 0.3)),
+            ['молоко', 'молочная сыворотка'],
+        )
+        self.assertEqual(
+            self.names(self.index.fuzzy('малоко', 10, 0.3)), ['молоко']
+        )
+
+    def test_threshold_and_limit(self):
+        self.assertEqual(self.index.fuzzy('малоко', 10, 0.9), [])
+        self.assertEqual(len(self.index.fuzzy('м', 2, 0.3)), 2)
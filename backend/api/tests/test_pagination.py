@@ -0,0 +1,168 @@
+"""Пагинация списков: закэшированный count и курсоры."""
+import json
+from base64 import urlsafe_b64decode
+from datetime import timedelta
+from urllib.parse import parse_qs, urlparse
+
+from django.utils import timezone
+
+from recipes.models import Recipe
+from users.models import Subscription
+
+from .utils import APICacheTestCase, create_catalog, create_recipe, create_user
+
+
+class CachedCountTests(APICacheTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.users, cls.tags, _, cls.recipes = create_catalog(recipes=6)
+        cls.author = cls.users[1]
+
+    def count(self, client, params):
+        response = client.get('/api/recipes/', params)
+        self.assertEqual(response.status_code, 200)
+        return response.data['count']
+
+    def test_new_recipe_resets_filtered_count(self):
+        client = self.client_for(self.users[0])
+        params = {'author': self.author.pk}
+        before = self.count(client, params)
+        self.assertEqual(self.count(client, params), before)
+        with self.captureOnCommitCallbacks(execute=True):
+            create_recipe(self.author, 'Новый рецепт', tags=self.tags[:1])
+        self.assertEqual(self.count(client, params), before + 1)
+        self.assertEqual(
+            self.count(self.client_for(), params), before + 1
+        )
+
+    def test_deleted_recipe_resets_tag_count(self):
+        client = self.client_for()
+        params = {'tags': self.tags[0].slug}
+        before = self.count(client, params)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.recipes[0].delete()
+        self.assertEqual(self.count(client, params), before - 1)
+
+    def test_new_user_resets_user_count(self):
+        client = self.client_for(self.users[0])
+        before = client.get('/api/users/').data['count']
+        with self.captureOnCommitCallbacks(execute=True):
+            create_user('newcomer')
+        self.assertEqual(client.get('/api/users/').data['count'], before + 1)
+
+
+def decode_cursor(link):
+    """Позиция из курсора ссылки next/previous."""
+    cursor = parse_qs(urlparse(link).query)['cursor'][0]
+    return json.loads(urlsafe_b64decode(cursor.encode()))
+
+
+class CursorTests(APICacheTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.users, _, _, cls.recipes = create_catalog(recipes=7)
+        start = timezone.now() - timedelta(days=1)
+        # Старые рецепты с большими id и одинаковые даты публикации
+        for number, recipe in enumerate(cls.recipes):
+            Recipe.objects.filter(pk=recipe.pk).update(
+                pub_date=start - timedelta(hours=number // 2 * 2),
+                favorites_count=number % 3,
+            )
+            recipe.refresh_from_db()
+
+    def walk(self, params):
+        """id рецептов всех страниц и позиции курсоров next."""
+        client = self.client_for()
+        response = client.get(
+            '/api/recipes/', {**params, 'pagination': 'cursor', 'limit': 2}
+        )
+        ids, positions = [], []
+        while True:
+            self.assertEqual(response.status_code, 200)
+            ids.extend(row['id'] for row in response.data['results'])
+            link = response.data['next']
+            if link is None:
+                return ids, positions
+            positions.append(decode_cursor(link)['p'])
+            response = client.get(link)
+
+    def test_default_ordering_uses_pub_date_and_id(self):
+        ids, positions = self.walk({})
+        expected = sorted(
+            self.recipes, key=lambda recipe: (recipe.pub_date, recipe.pk),
+            reverse=True,
+        )
+        self.assertEqual(ids, [recipe.pk for recipe in expected])
+        last = expected[1]
+        self.assertEqual(
+            positions[0],
+            [Recipe._meta.get_field('pub_date').value_to_string(last),
+             str(last.pk)],
+        )
+
+    def test_filter_keeps_default_ordering(self):
+        author = self.users[0]
+        ids, positions = self.walk({'author': author.pk})
+        self.assertEqual(ids, [
+            recipe.pk for recipe in sorted(
+                (recipe for recipe in self.recipes
+                 if recipe.author_id == author.pk),
+                key=lambda recipe: (recipe.pub_date, recipe.pk),
+                reverse=True,
+            )
+        ])
+        self.assertTrue(all(len(position) == 2 for position in positions))
+
+    def test_popular_ordering(self):
+        ids, positions = self.walk({'ordering': 'popular'})
+        expected = sorted(
+            self.recipes,
+            key=lambda recipe: (
+                recipe.favorites_count, recipe.pub_date, recipe.pk
+            ),
+            reverse=True,
+        )
+        self.assertEqual(ids, [recipe.pk for recipe in expected])
+        self.assertEqual(positions[0][0], str(expected[1].favorites_count))
+        self.assertEqual(len(positions[0]), 3)
+
+    def test_previous_page(self):
+        client = self.client_for()
+        first = client.get('/api/recipes/?pagination=cursor&limit=3')
+        second = client.get(first.data['next'])
+        self.assertEqual(decode_cursor(second.data['previous'])['r'], 1)
+        back = client.get(second.data['previous'])
+        self.assertEqual(back.data['results'], first.data['results'])
+
+    def test_search_ordering(self):
+        ids, positions = self.walk({'search': 'рецепт'})
+        self.assertCountEqual(ids, [recipe.pk for recipe in self.recipes])
+        self.assertEqual(len(positions[0]), 3)
+
+    def test_invalid_cursor(self):
+        response = self.client_for().get('/api/recipes/', {'cursor': 'x'})
+        self.assertEqual(response.status_code, 404)
+
+    def test_subscriptions(self):
+        viewer = create_user('reader')
+        authors = [create_user(f'author{number}') for number in range(5)]
+        subscriptions = [
+            Subscription.objects.create(user=viewer, following=author)
+            for author in authors
+        ]
+        client = self.client_for(viewer)
+        response = client.get(
+            '/api/users/subscriptions/', {'pagination': 'cursor', 'limit': 2}
+        )
+        self.assertNotIn('count', response.data)
+        ids = []
+        while True:
+            ids.extend(row['id'] for row in response.data['results'])
+            if response.data['next'] is None:
+                break
+            self.assertEqual(len(decode_cursor(response.data['next'])['p']), 1)
+            response = client.get(response.data['next'])
+        self.assertEqual(ids, [
+            subscription.following_id
+            for subscription in reversed(subscriptions)
+        ])
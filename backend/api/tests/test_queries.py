@@ -0,0 +1,135 @@
+"""Число SQL-запросов списков не зависит от размера страницы."""
+from django.core.cache import cache
+from django.core.management import call_command
+
+from api.serializers import RecipeSerializer
+from recipes.models import Favorite, Recipe
+from users.models import Subscription
+
+from .utils import APICacheTestCase, create_catalog
+
+PAGE_SIZES = (2, 6)
+
+
+class CatalogQueryTestCase(APICacheTestCase):
+    """Каталог с избранным и подписками пользователя viewer."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.users, _, _, cls.recipes = create_catalog(recipes=16, users=8)
+        cls.viewer = cls.users[0]
+        for recipe in cls.recipes[::2]:
+            Favorite.objects.create(user=cls.viewer, recipe=recipe)
+        for author in cls.users[1:]:
+            Subscription.objects.create(user=cls.viewer, following=author)
+        call_command('rebuild_recipe_cards', verbosity=0)
+
+
+class ListQueryCountTests(CatalogQueryTestCase):
+    def assert_page_queries(self, client, url, queries):
+        """Одинаковое число запросов для каждого размера страницы,
+        с холодным кэшем фрагментов и версий.
+        """
+        for limit in PAGE_SIZES:
+            cache.clear()
+            with self.subTest(url=url, limit=limit):
+                with self.assertNumQueries(queries):
+                    response = client.get(url, {'limit': limit})
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(len(response.data['results']), limit)
+
+    def test_recipe_list(self):
+        # COUNT, страница с флагами пользователя, подписки пользователя
+        self.assert_page_queries(
+            self.client_for(self.viewer), '/api/recipes/', 3
+        )
+
+    def test_recipe_list_anonymous(self):
+        self.assert_page_queries(self.client_for(), '/api/recipes/', 2)
+
+    def test_recipe_list_cursor(self):
+        self.assert_page_queries(
+            self.client_for(self.viewer),
+            '/api/recipes/?pagination=cursor', 3,
+        )
+
+    def test_favorites(self):
+        self.assert_page_queries(
+            self.client_for(self.viewer), '/api/recipes/?is_favorited=1', 3
+        )
+
+    def test_subscriptions(self):
+        # EXISTS, COUNT, страница, подписки пользователя, рецепты авторов
+        self.assert_page_queries(
+            self.client_for(self.viewer), '/api/users/subscriptions/', 5
+        )
+
+    def test_subscriptions_recipes_limit(self):
+        self.assert_page_queries(
+            self.client_for(self.viewer),
+            '/api/users/subscriptions/?recipes_limit=1', 5,
+        )
+
+
+class SerializationQueryCountTests(APICacheTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.users, _, _, _ = create_catalog(recipes=8, users=4)
+
+    def test_for_serialization(self):
+        # Рецепты, авторы, теги, ингредиенты с количеством: публичная
+        # часть рецепта, как при сборке фрагментов кэша
+        for count in PAGE_SIZES:
+            with self.subTest(count=count):
+                with self.assertNumQueries(4):
+                    recipes = list(Recipe.objects.for_serialization(
+                        self.users[0]
+                    )[:count])
+                    public = RecipeSerializer(context={})
+                    data = [
+                        public.to_representation(recipe)
+                        for recipe in recipes
+                    ]
+                self.assertEqual(len(data), count)
+                self.assertEqual(len(data[0]['ingredients']), 3)
+                self.assertTrue(data[0]['author']['username'])
+
+
+class SparseFieldsQueryTests(CatalogQueryTestCase):
+    """?fields=/?omit=: в ответе и в запросах только нужные поля."""
+
+    def assert_fields(self, client, url, params, fields, queries):
+        cache.clear()
+        with self.assertNumQueries(queries):
+            response = client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        rows = response.data.get('results', [response.data])
+        self.assertTrue(rows)
+        for row in rows:
+            self.assertEqual(list(row), fields)
+
+    def test_recipes(self):
+        client = self.client_for(self.viewer)
+        # COUNT и страница: без связей и флагов пользователя
+        self.assert_fields(
+            client, '/api/recipes/', {'fields': 'id,name'}, ['id', 'name'], 2
+        )
+        self.assert_fields(
+            client, '/api/recipes/', {'fields': 'name,tags,is_favorited'},
+            ['tags', 'name', 'is_favorited'], 3,
+        )
+        self.assert_fields(
+            client, f'/api/recipes/{self.recipes[0].pk}/',
+            {'omit': 'author,ingredients,tags,text'},
+            ['id', 'name', 'image', 'cooking_time', 'is_favorited',
+             'is_in_shopping_cart'],
+            2,
+        )
+
+    def test_subscriptions(self):
+        # EXISTS, COUNT, страница: рецепты авторов не загружаются
+        self.assert_fields(
+            self.client_for(self.viewer), '/api/users/subscriptions/',
+            {'omit': 'recipes,recipes_count,is_subscribed'},
+            ['id', 'first_name', 'last_name'], 3,
+        )
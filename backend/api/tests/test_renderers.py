@@ -0,0 +1,84 @@
+"""Рендереры ответов: orjson и MessagePack."""
+import json
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timezone
+from decimal import Decimal
+
+import msgpack
+from django.test import SimpleTestCase
+from rest_framework.renderers import JSONRenderer
+
+from ..renderers import FastJSONRenderer, MessagePackRenderer
+from .utils import APICacheTestCase, create_catalog
+
+DATA = [
+    OrderedDict([
+        ('id', 1),
+        ('name', 'Борщ с пампушками'),
+        ('pub_date', datetime(2022, 8, 1, 12, 30, 5, 123456, timezone.utc)),
+        ('amount', Decimal('1.50')),
+        ('uuid', uuid.UUID(int=7)),
+        ('tags', [{'slug': 'lunch', 'color': None}, True, 0.5]),
+    ]),
+]
+
+
+class FastJSONRendererTests(SimpleTestCase):
+    def assert_same(self, data, media_type=None, context=None):
+        self.assertEqual(
+            FastJSONRenderer().render(data, media_type, context),
+            JSONRenderer().render(data, media_type, context),
+        )
+
+    def test_bytes_match_drf(self):
+        self.assert_same(DATA)
+        self.assert_same({'detail': 'Страница не найдена.'})
+
+    def test_fallbacks(self):
+        self.assert_same({'big': 1 << 70})
+        self.assert_same(DATA, 'application/json; indent=4')
+        self.assertEqual(FastJSONRenderer().render(None), b'')
+        self.assert_same({1: 'ключ не строка'})
+
+    def test_float_differences(self):
+        data = {'small': 1e-05, 'big': 1e16}
+        self.assertEqual(
+            FastJSONRenderer().render(data), b'{"small":0.00001,"big":1e16}'
+        )
+        self.assertEqual(
+            json.loads(FastJSONRenderer().render(data)),
+            json.loads(JSONRenderer().render(data)),
+        )
+        self.assertEqual(
+            FastJSONRenderer().render({'nan': float('nan')}), b'{"nan":null}'
+        )
+        with self.assertRaises(ValueError):
+            JSONRenderer().render({'nan': float('nan')})
+
+
+class MessagePackTests(APICacheTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        create_catalog(recipes=2)
+
+    def test_render(self):
+        # Типы, которые msgpack не кодирует, приводятся так же, как в JSON
+        self.assertEqual(
+            msgpack.unpackb(MessagePackRenderer().render(DATA)),
+            json.loads(JSONRenderer().render(DATA)),
+        )
+        self.assertEqual(MessagePackRenderer().render(None), b'')
+
+    def test_accept_header(self):
+        client = self.client_for()
+        for url in ('/api/tags/', '/api/recipes/'):
+            with self.subTest(url=url):
+                response = client.get(url, HTTP_ACCEPT='application/msgpack')
+                self.assertEqual(
+                    response['Content-Type'], 'application/msgpack'
+                )
+                self.assertEqual(
+                    msgpack.unpackb(response.content),
+                    client.get(url).json(),
+                )
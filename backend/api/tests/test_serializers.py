@@ -0,0 +1,170 @@
+"""Компилированные сериализаторы (api.fast) выдают тот же JSON, что и
+сериализаторы DRF, которые они заменяют.
+"""
+import json
+
+from django.contrib.auth.models import AnonymousUser
+from rest_framework import serializers as drf_serializers
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from ingredients.models import Ingredient, Tag
+from recipes.models import Favorite, Recipe, RecipeIngredient, ShoppingBasket
+from users.models import Subscription
+
+from .. import serializers
+from ..cards import RecipeCardCompiled
+from ..fast import (AbbreviatedRecipeCompiled, IngredientCompiled,
+                    RecipeCompiled, RecipeIngredientCompiled, TagCompiled,
+                    UserCompiled)
+from .utils import APICacheTestCase, create_catalog
+
+SPARSE_PARAMS = (
+    {'fields': 'id,name'},
+    {'fields': 'author,is_favorited,is_in_shopping_cart'},
+    {'omit': 'text,ingredients'},
+    {'fields': 'tags,image', 'omit': 'image'},
+)
+
+
+def plain(data):
+    """Данные после рендеринга в JSON, без различий dict/OrderedDict."""
+    return json.loads(JSONRenderer().render(data))
+
+
+def make_request(user=None, params=None):
+    request = Request(APIRequestFactory().get('/api/recipes/', params))
+    request.user = user or AnonymousUser()
+    return request
+
+
+def drf_recipe(recipe, request, fields=None):
+    """Рецепт через поля RecipeSerializer, минуя кэш фрагментов."""
+    serializer = serializers.RecipeSerializer(
+        recipe, context={'request': request}
+    )
+    data = drf_serializers.Serializer.to_representation(serializer, recipe)
+    if fields is not None:
+        data = {name: value for name, value in data.items()
+                if name in fields}
+    return plain(data)
+
+
+class CompiledSerializerTests(APICacheTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.users, _, _, cls.recipes = create_catalog(recipes=6)
+        cls.viewer = cls.users[0]
+        Favorite.objects.create(user=cls.viewer, recipe=cls.recipes[1])
+        ShoppingBasket.objects.create(user=cls.viewer, recipe=cls.recipes[2])
+        Subscription.objects.create(user=cls.viewer, following=cls.users[1])
+
+    def viewers(self):
+        return (('viewer', self.viewer), ('anonymous', None))
+
+    def test_tags_and_ingredients(self):
+        request = make_request()
+        cases = (
+            (TagCompiled, serializers.TagSerializer, Tag),
+            (IngredientCompiled, serializers.IngredientSerializer,
+             Ingredient),
+        )
+        for compiled, reference, model in cases:
+            with self.subTest(serializer=compiled.__name__):
+                context = {'request': request}
+                rows = model.objects.values(*compiled.values_fields)
+                self.assertEqual(
+                    plain(compiled(context, rows=True).many(rows)),
+                    plain(reference(
+                        model.objects.all(), many=True, context=context
+                    ).data),
+                )
+
+    def test_users(self):
+        for name, user in self.viewers():
+            with self.subTest(viewer=name):
+                context = {'request': make_request(user)}
+                self.assertEqual(
+                    plain(UserCompiled(context).many(self.users)),
+                    plain(serializers.CustomUserSerializer(
+                        self.users, many=True, context=context
+                    ).data),
+                )
+
+    def test_abbreviated_recipes(self):
+        context = {'request': make_request()}
+        rows = Recipe.objects.values(*AbbreviatedRecipeCompiled.values_fields)
+        self.assertEqual(
+            plain(AbbreviatedRecipeCompiled(context, rows=True).many(rows)),
+            plain(serializers.AbbreviatedRecipeSerializer(
+                Recipe.objects.all(), many=True, context=context
+            ).data),
+        )
+
+    def test_recipe_ingredients(self):
+        amounts = RecipeIngredient.objects.select_related('ingredient')
+        self.assertEqual(
+            plain(RecipeIngredientCompiled().many(amounts)),
+            plain(serializers.RecipeIngredientSerializer(
+                amounts, many=True
+            ).data),
+        )
+
+    def test_recipes(self):
+        for name, user in self.viewers():
+            request = make_request(user)
+            expected = [
+                drf_recipe(recipe, request) for recipe in Recipe.objects.all()
+            ]
+            for compiled in (RecipeCompiled, RecipeCardCompiled):
+                with self.subTest(viewer=name, serializer=compiled.__name__):
+                    recipes = Recipe.objects.select_related('card')
+                    self.assertEqual(
+                        plain(compiled({'request': request}).many(recipes)),
+                        expected,
+                    )
+                    annotated = recipes.with_user_flags(request.user)
+                    self.assertEqual(
+                        plain(compiled({'request': request}).many(annotated)),
+                        expected,
+                    )
+
+    def test_sparse_recipes(self):
+        for name, user in self.viewers():
+            for params in SPARSE_PARAMS:
+                request = make_request(user, params)
+                fields = serializers.get_requested_fields(
+                    request, RecipeCompiled.fields
+                )
+                context = {'request': request, 'fields': fields}
+                with self.subTest(viewer=name, params=params):
+                    self.assertEqual(
+                        plain(RecipeCardCompiled(context).many(
+                            Recipe.objects.with_user_flags(user)
+                            if user else Recipe.objects.all()
+                        )),
+                        [drf_recipe(recipe, request, fields)
+                         for recipe in Recipe.objects.all()],
+                    )
+
+    def test_recipe_list_endpoint(self):
+        """Страница списка совпадает с RecipeSerializer для тех же рецептов."""
+        for name, user in self.viewers():
+            for params in ({}, {'fields': 'id,name'}, {'omit': 'text'}):
+                with self.subTest(viewer=name, params=params):
+                    response = self.client_for(user).get(
+                        '/api/recipes/', {**params, 'limit': 6}
+                    )
+                    request = make_request(user, params)
+                    fields = serializers.get_requested_fields(
+                        request, RecipeCompiled.fields
+                    )
+                    results = plain(response.data['results'])
+                    self.assertEqual(len(results), len(self.recipes))
+                    self.assertEqual(results, [
+                        drf_recipe(
+                            Recipe.objects.get(pk=row['id']), request, fields
+                        )
+                        for row in results
+                    ])
@@ -0,0 +1,147 @@
+"""Список покупок: суммы ингредиентов из корзины, PDF и выгрузки."""
+import csv
+import json
+import re
+
+from django.test import SimpleTestCase
+
+from ingredients.models import Ingredient
+from recipes.models import ShoppingBasket
+
+from .. import services
+from .utils import APICacheTestCase, create_recipe, create_user
+
+PDF_PAGE = re.compile(rb'/Type /Page\b(?!s)')
+# Строк списка на странице PDF
+PAGE_LINES = (
+    (services.PAGE_TOP - services.PAGE_BOTTOM) // services.LINE_STEP + 1
+)
+
+
+class ShoppingListTests(APICacheTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user('buyer')
+        cls.other = create_user('other')
+        flour = Ingredient.objects.create(name='мука', measurement_unit='г')
+        milk = Ingredient.objects.create(name='молоко', measurement_unit='мл')
+        # То же название в других единицах не складывается с граммами
+        spoons = Ingredient.objects.create(
+            name='мука', measurement_unit='ст. л.'
+        )
+        salt = Ingredient.objects.create(name='соль', measurement_unit='г')
+        recipes = [
+            create_recipe(cls.user, 'Блины', [(flour, 200), (milk, 500)]),
+            create_recipe(cls.user, 'Оладьи', [(flour, 150), (spoons, 2)]),
+            create_recipe(cls.other, 'Пирог', [(flour, 300), (milk, 100)]),
+            create_recipe(cls.other, 'Рассол', [(salt, 30)]),
+        ]
+        ShoppingBasket.objects.bulk_create(
+            ShoppingBasket(user=cls.user, recipe=recipe)
+            for recipe in recipes[:3]
+        )
+        # Чужая корзина не попадает в список
+        ShoppingBasket.objects.create(user=cls.other, recipe=recipes[3])
+
+    def test_totals(self):
+        with self.assertNumQueries(1):
+            rows = list(services.get_shopping_list(self.user))
+        self.assertEqual(rows, [
+            ('молоко', 'мл', 600),
+            ('мука', 'г', 650),
+            ('мука', 'ст. л.', 2),
+        ])
+
+    def test_empty_basket(self):
+        self.assertEqual(
+            list(services.get_shopping_list(create_user('empty'))), []
+        )
+
+    def download(self, file_format=None, user=None):
+        params = {'format': file_format} if file_format else {}
+        return self.client_for(user or self.user).get(
+            '/api/recipes/download_shopping_cart/', params
+        )
+
+    def content(self, response):
+        return b''.join(response.streaming_content).decode()
+
+    def test_exports(self):
+        response = self.download('csv')
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        self.assertIn('shopping_list.csv', response['Content-Disposition'])
+        self.assertEqual(
+            list(csv.reader(self.content(response).splitlines())), [
+                ['name', 'measurement_unit', 'amount'],
+                ['молоко', 'мл', '600'],
+                ['мука', 'г', '650'],
+                ['мука', 'ст. л.', '2'],
+            ],
+        )
+        self.assertEqual(self.content(self.download('txt')), (
+            '1. молоко - 600, мл\n'
+            '2. мука - 650, г\n'
+            '3. мука - 2, ст. л.\n'
+        ))
+        self.assertEqual(json.loads(self.content(self.download('json'))), [
+            {'name': 'молоко', 'measurement_unit': 'мл', 'amount': 600},
+            {'name': 'мука', 'measurement_unit': 'г', 'amount': 650},
+            {'name': 'мука', 'measurement_unit': 'ст. л.', 'amount': 2},
+        ])
+
+    def test_pdf_is_default(self):
+        response = self.download()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+
+    def test_errors(self):
+        self.assertEqual(self.download('xml').status_code, 400)
+        self.assertEqual(
+            self.download('csv', create_user('empty')).data, 'Корзина путса!'
+        )
+        response = self.client_for().get(
+            '/api/recipes/download_shopping_cart/'
+        )
+        self.assertEqual(response.status_code, 401)
+
+    def test_errors_are_json(self):
+        response = self.client_for(self.user).get(
+            '/api/recipes/download_shopping_cart/', {'format': 'msgpack'},
+            HTTP_ACCEPT='application/msgpack',
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertEqual(
+            json.loads(response.content),
+            'Формат списка: pdf, csv, txt или json.',
+        )
+
+
+class ShoppingListPDFTests(SimpleTestCase):
+    def rows(self, count):
+        return [('мука', 'г', number) for number in range(count)]
+
+    def pages(self, response):
+        body = b''.join(response.streaming_content)
+        self.assertEqual(len(body), int(response['Content-Length']))
+        return len(PDF_PAGE.findall(body))
+
+    def test_pages(self):
+        cases = (
+            (0, 1), (PAGE_LINES, 1), (PAGE_LINES + 1, 2), (3 * PAGE_LINES, 3)
+        )
+        for count, pages in cases:
+            with self.subTest(count=count):
+                response = services.creating_a_shopping_list(
+                    self.rows(count)
+                )
+                self.assertEqual(response['Content-Type'], 'application/pdf')
+                self.assertEqual(self.pages(response), pages)
+
+    def test_font_is_registered_once(self):
+        services.creating_a_shopping_list(self.rows(1))
+        before = services.register_fonts.cache_info()
+        services.creating_a_shopping_list(self.rows(1))
+        after = services.register_fonts.cache_info()
+        self.assertEqual(after.misses, before.misses)
+        self.assertEqual(after.hits, before.hits + 1)
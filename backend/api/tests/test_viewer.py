@@ -0,0 +1,70 @@
+"""Флаги текущего пользователя: подписки, избранное и корзина."""
+from django.contrib.auth.models import AnonymousUser
+from rest_framework.test import APIRequestFactory
+
+from recipes.models import Favorite, ShoppingBasket
+from users.models import Subscription
+
+from ..viewer import ViewerContext, get_viewer
+from .utils import APICacheTestCase, create_catalog
+
+
+class ViewerContextTests(APICacheTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.users, _, _, cls.recipes = create_catalog(recipes=6)
+        cls.viewer = cls.users[0]
+        Subscription.objects.create(user=cls.viewer, following=cls.users[1])
+        Favorite.objects.create(user=cls.viewer, recipe=cls.recipes[1])
+        ShoppingBasket.objects.create(user=cls.viewer, recipe=cls.recipes[2])
+
+    def test_each_set_is_loaded_once(self):
+        viewer = ViewerContext(self.viewer)
+        with self.assertNumQueries(1):
+            flags = [viewer.is_favorited(recipe.pk) for recipe in self.recipes]
+            viewer.is_favorited(self.recipes[0].pk)
+        self.assertEqual(flags, [False, True, False, False, False, False])
+        with self.assertNumQueries(2):
+            self.assertTrue(viewer.is_in_shopping_cart(self.recipes[2].pk))
+            self.assertTrue(viewer.is_subscribed(self.users[1].pk))
+            self.assertFalse(viewer.is_subscribed(self.users[2].pk))
+
+    def test_anonymous(self):
+        viewer = ViewerContext(AnonymousUser())
+        with self.assertNumQueries(0):
+            self.assertFalse(viewer.is_favorited(self.recipes[1].pk))
+            self.assertFalse(viewer.is_subscribed(self.users[1].pk))
+
+    def test_context_is_bound_to_request(self):
+        request = APIRequestFactory().get('/')
+        request.user = self.viewer
+        viewer = get_viewer(request)
+        self.assertIs(get_viewer(request), viewer)
+        request.user = self.users[1]
+        self.assertIsNot(get_viewer(request), viewer)
+
+    def test_flags_in_responses(self):
+        client = self.client_for(self.viewer)
+        recipes = {
+            row['id']: row for row in client.get(
+                '/api/recipes/', {'limit': 10}
+            ).data['results']
+        }
+        for recipe in self.recipes:
+            with self.subTest(recipe=recipe.pk):
+                row = recipes[recipe.pk]
+                self.assertEqual(
+                    row['is_favorited'], recipe == self.recipes[1]
+                )
+                self.assertEqual(
+                    row['is_in_shopping_cart'], recipe == self.recipes[2]
+                )
+                self.assertEqual(
+                    row['author']['is_subscribed'],
+                    recipe.author_id == self.users[1].pk,
+                )
+        users = client.get('/api/users/').data['results']
+        self.assertEqual(
+            [row['id'] for row in users if row['is_subscribed']],
+            [self.users[1].pk],
+        )
@@ -0,0 +1,75 @@
+"""Общие данные и клиенты для тестов API."""
+from django.core.cache import cache
+from rest_framework.test import APIClient, APITestCase
+
+from ingredients.models import Ingredient, Tag
+from recipes.models import Recipe, RecipeIngredient
+from users.models import User
+
+
+def create_user(username, **kwargs):
+    kwargs.setdefault('email', f'{username}@example.com')
+    kwargs.setdefault('first_name', username.title())
+    kwargs.setdefault('last_name', 'Тестов')
+    return User.objects.create(username=username, **kwargs)
+
+
+def create_recipe(author, name, ingredients=(), tags=(), **kwargs):
+    """Рецепт с ингредиентами - парами (ингредиент, количество)."""
+    kwargs.setdefault('text', f'Как готовить {name}')
+    kwargs.setdefault('image', 'recipes/image/test.png')
+    kwargs.setdefault('cooking_time', 10)
+    recipe = Recipe.objects.create(author=author, name=name, **kwargs)
+    recipe.tags.set(tags)
+    RecipeIngredient.objects.bulk_create(
+        RecipeIngredient(recipe=recipe, ingredient=ingredient, amount=amount)
+        for ingredient, amount in ingredients
+    )
+    return recipe
+
+
+def create_catalog(recipes=8, users=3):
+    """Пользователи, теги, ингредиенты и рецепты для тестов списков."""
+    authors = [create_user(f'user{number}') for number in range(users)]
+    tags = [
+        Tag.objects.create(
+            name=f'Тег {number}', color='#49B64E', slug=f'tag{number}'
+        )
+        for number in range(3)
+    ]
+    ingredients = [
+        Ingredient.objects.create(
+            name=f'ингредиент {number}', measurement_unit='г'
+        )
+        for number in range(8)
+    ]
+    created = [
+        create_recipe(
+            authors[number % users],
+            f'Рецепт {number}',
+            ingredients=[
+                (ingredients[(number + shift) % len(ingredients)], shift + 1)
+                for shift in range(3)
+            ],
+            tags=tags[:1 + number % len(tags)],
+        )
+        for number in range(recipes)
+    ]
+    return authors, tags, ingredients, created
+
+
+class APICacheTestCase(APITestCase):
+    """Каждый тест начинается с пустым кэшем: версии и фрагменты
+    предыдущих тестов не влияют на число запросов.
+    """
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    def client_for(self, user=None):
+        client = APIClient()
+        if user is not None:
+            client.force_authenticate(user)
+        return client
@@ -0,0 +1,51 @@
+from django.utils.functional import cached_property
+
+from recipes.models import Favorite, ShoppingBasket
+from users.models import Subscription
+
+
+class ViewerContext:
+    """Подписки, избранное и корзина текущего пользователя.
+    Каждое множество id загружается одним запросом при первом обращении
+    и дальше используется всеми сериализаторами в рамках запроса.
+    """
+
+    def __init__(self, user):
+        self.user = user
+
+    def load_ids(self, queryset, field):
+        if not self.user.is_authenticated:
+            return frozenset()
+        return frozenset(
+            queryset.filter(user=self.user).values_list(field, flat=True)
+        )
+
+    @cached_property
+    def following(self):
+        return self.load_ids(Subscription.objects, 'following_id')
+
+    @cached_property
+    def favorites(self):
+        return self.load_ids(Favorite.objects, 'recipe_id')
+
+    @cached_property
+    def cart(self):
+        return self.load_ids(ShoppingBasket.objects, 'recipe_id')
+
+    def is_subscribed(self, author_id):
+        return author_id in self.following
+
+    def is_favorited(self, recipe_id):
+        return recipe_id in self.favorites
+
+    def is_in_shopping_cart(self, recipe_id):
+        return recipe_id in self.cart
+
+
+def get_viewer(request):
+    """Возвращает ViewerContext, привязанный к запросу."""
+    viewer = getattr(request, '_viewer', None)
+    if viewer is None or viewer.user != request.user:
+        viewer = ViewerContext(request.user)
+        request._viewer = viewer
+    return viewer
@@ -1,4 +1,5 @@
 import rest_framework.permissions as rest_permissions
+from django.db.models import F, Q, Sum
 from django.shortcuts import get_object_or_404
 from django_filters.rest_framework import DjangoFilterBackend
 from djoser.views import UserViewSet as DjUserViewSet
@@ -8,10 +9,28 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 
 from ingredients.models import Ingredient, Tag
+from recipes import feed, ingredient_index
 from recipes.models import Favorite, Recipe, ShoppingBasket
 from users.models import Subscription, User
 
-from . import filters, pagination, permissions, serializers, services
+from . import (autocomplete, catalog, filters, pagination, permissions,
+               serializers, services)
+from .cards import RecipeCardCompiled
+from .conditional import ConditionalGetMixin
+from .fast import (CompiledSerializerMixin, IngredientCompiled, RecipeCompiled,
+                   TagCompiled)
+from .renderers import FastJSONRenderer
+
+
+def recipe_page_response(view, queryset):
+    """Страница рецептов для экшенов вьюсетов в формате RecipeSerializer:
+    публичная часть из карточек и кэша, поля пользователя поверх нее.
+    """
+    page = view.paginate_queryset(
+        queryset.select_related('card').with_user_flags(view.request.user)
+    )
+    data = RecipeCardCompiled(view.get_serializer_context()).many(page)
+    return view.get_paginated_response(data)
 
 
 class CustomUserViewSet(DjUserViewSet):
@@ -24,6 +43,15 @@ class CustomUserViewSet(DjUserViewSet):
     serializer_class = serializers.CustomUserSerializer
     queryset = User.objects.all()
     permission_classes = (IsAuthenticated, )
+    pagination_class = pagination.CustomLimitOffsetPagination
+    exact_count_actions = ('subscriptions', )
+
+    def get_version_names(self):
+        """Версии данных для ключа закэшированного count (api.pagination)."""
+        names = ['users', 'recipes']
+        if self.request.user.is_authenticated:
+            names.append(f'viewer:{self.request.user.pk}')
+        return names
 
     @action(
         detail=True,
@@ -69,6 +97,29 @@ class CustomUserViewSet(DjUserViewSet):
             )
         return Response('Ошибка', status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+    @action(
+        detail=False,
+        methods=['GET'],
+        url_path='me/recommended',
+        url_name='recommended',
+        permission_classes=(IsAuthenticated, )
+    )
+    def recommended(self, request):
+        """Эндпоинт рекомендаций: рецепты, похожие на избранное и корзину
+        пользователя, кроме уже сохраненных.
+        """
+        saved = [
+            model.objects.filter(user=request.user).values('recipe')
+            for model in (Favorite, ShoppingBasket)
+        ]
+        queryset = Recipe.objects.filter(
+            Q(similar_to__recipe__in=saved[0])
+            | Q(similar_to__recipe__in=saved[1])
+        ).exclude(pk__in=saved[0]).exclude(pk__in=saved[1]).annotate(
+            recommendation=Sum('similar_to__score'),
+        ).order_by('-recommendation', '-id')
+        return recipe_page_response(self, queryset)
+
     @action(
         detail=False,
         methods=['GET'],
@@ -79,8 +130,8 @@ class CustomUserViewSet(DjUserViewSet):
     def subscriptions(self, request):
         """Эндпоинт для фильтрации 'Подписок'."""
         user = request.user
-        qs = Subscription.objects.filter(user=user)
-        if qs:
+        qs = Subscription.objects.filter(user=user).select_related('following')
+        if qs.exists():
             pages = self.paginate_queryset(qs)
             serializer = serializers.SubscriptionListSerializer(
                 pages,
@@ -94,11 +145,14 @@ class CustomUserViewSet(DjUserViewSet):
         )
 
 
-class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
+class IngredientViewSet(
+    ConditionalGetMixin, CompiledSerializerMixin, viewsets.ReadOnlyModelViewSet
+):
     """Вьюсет Ингридиенты.
     Реализованы методы чтения списка объектов и отдельного объекта.
     """
     serializer_class = serializers.IngredientSerializer
+    compiled_serializer_classes = {'list': IngredientCompiled}
     queryset = Ingredient.objects.all()
     pagination_class = None
     permission_classes = (rest_permissions.AllowAny, )
@@ -106,18 +160,86 @@ class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
     filterset_class = filters.SearchIngredientFilter
     search_fields = ('^name', )
 
+    def get_version_names(self):
+        return ['ingredients']
+
+    def get_catalog_state(self):
+        if not hasattr(self, '_catalog_state'):
+            self._catalog_state = catalog.get_catalog_state()
+        return self._catalog_state
+
+    def get_last_modified(self):
+        # Версия каталога из базы: ETag меняется и после изменений,
+        # сделанных другими процессами
+        return catalog.from_version(self.get_catalog_state()[0])
+
+    def list(self, request, *args, **kwargs):
+        if not request.query_params and self.accepts_snapshot(request):
+            return catalog.get_snapshot(
+                self.get_catalog_state()
+            ).response(request)
+        if 'fuzzy' in request.query_params:
+            return super().list(request, *args, **kwargs)
+        return self.conditional(self.list_from_index, request, *args, **kwargs)
+
+    def accepts_snapshot(self, request):
+        """Снимок каталога (api.catalog) - это компактный JSON."""
+        renderer = request.accepted_renderer
+        return isinstance(renderer, FastJSONRenderer) and not (
+            renderer.get_indent(request.accepted_media_type, {})
+        )
 
-class TagViewSet(viewsets.ReadOnlyModelViewSet):
+    @action(
+        detail=False,
+        methods=['GET'],
+        url_name='delta',
+        url_path='delta',
+    )
+    def delta(self, request):
+        """Эндпоинт изменений каталога с версии клиента (?since=):
+        измененные и удаленные ингредиенты и текущая версия.
+        """
+        query = serializers.CatalogDeltaQuerySerializer(
+            data=request.query_params
+        )
+        query.is_valid(raise_exception=True)
+        return Response(catalog.get_delta(query.validated_data['since']))
+
+    def list_from_index(self, request, *args, **kwargs):
+        """Список и поиск по началу названия (?name=) из индекса в памяти
+        (api.autocomplete); ?limit= ограничивает число ингредиентов.
+        """
+        query = serializers.IngredientQuerySerializer(
+            data=request.query_params
+        )
+        query.is_valid(raise_exception=True)
+        return Response(autocomplete.get_index(
+            self.get_catalog_state()
+        ).search(
+            query.validated_data.get('name', ''),
+            query.validated_data.get('limit'),
+        ))
+
+
+class TagViewSet(
+    ConditionalGetMixin, CompiledSerializerMixin, viewsets.ReadOnlyModelViewSet
+):
     """Вьюсет Теги.
     Реализованы методы чтения списка объектов и отдельного объекта.
     """
     serializer_class = serializers.TagSerializer
+    compiled_serializer_classes = {'list': TagCompiled}
     queryset = Tag.objects.all()
     pagination_class = None
     permission_classes = (rest_permissions.AllowAny, )
 
+    def get_version_names(self):
+        return ['tags']
+
 
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(
+    ConditionalGetMixin, CompiledSerializerMixin, viewsets.ModelViewSet
+):
     """Вьюсет Рецептов.
     Реализованы методы чтения списка объектов и создания нового рецепта.
     Чтение, изменение и удаление отдельного объекта.
@@ -130,6 +252,62 @@ class RecipeViewSet(viewsets.ModelViewSet):
     filter_backends = (DjangoFilterBackend, )
     filterset_class = filters.RecipeFilter
     pagination_class = pagination.CustomPagination
+    compiled_serializer_classes = {
+        'list': RecipeCardCompiled,
+        'retrieve': RecipeCardCompiled,
+    }
+
+    def get_requested_fields(self):
+        return serializers.get_requested_fields(
+            self.request, RecipeCompiled.fields
+        )
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        if self.action in ('list', 'retrieve'):
+            context['fields'] = self.get_requested_fields()
+        return context
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action not in ('list', 'retrieve'):
+            return queryset
+        # Публичная часть рецепта читается из кэша или карточки рецепта,
+        # при ?fields=/?omit= догружаются только запрошенные связи
+        fields = self.get_requested_fields()
+        if fields is None:
+            return queryset.select_related('card').with_user_flags(
+                self.request.user
+            )
+        if 'text' not in fields:
+            queryset = queryset.defer('text')
+        if not {'is_favorited', 'is_in_shopping_cart'} & set(fields):
+            return queryset
+        return queryset.with_user_flags(self.request.user)
+
+    def get_version_names(self):
+        names = ['tags', 'ingredients', self.get_viewer_version_name()]
+        if self.action == 'retrieve':
+            names.append(f'user:{self.get_recipe_state()["author"]}')
+        else:
+            names.extend(['recipes', 'users'])
+            if self.request.query_params.get('ordering') == 'popular':
+                names.append('popularity')
+        return [name for name in names if name]
+
+    def get_recipe_state(self):
+        if not hasattr(self, '_recipe_state'):
+            self._recipe_state = Recipe.objects.filter(
+                pk=self.kwargs['pk']
+            ).values('author', 'updated_at').first() or {
+                'author': None, 'updated_at': None,
+            }
+        return self._recipe_state
+
+    def get_last_modified(self):
+        if self.action == 'retrieve':
+            return self.get_recipe_state()['updated_at']
+        return None
 
     def get_serializer_class(self):
         if self.action == 'list' or self.action == 'retrieve':
@@ -194,6 +372,92 @@ class RecipeViewSet(viewsets.ModelViewSet):
             return Response('Рецепт удален', status=status.HTTP_204_NO_CONTENT)
         return Response('Ошибка', status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+    @action(
+        detail=False,
+        methods=['GET'],
+        url_name='trending',
+        url_path='trending',
+    )
+    def trending(self, request):
+        """Эндпоинт популярного: рецепты по недавней активности
+        (recipes.trending) с фильтрами RecipeFilter, например по тегам.
+        """
+        queryset = self.filter_queryset(
+            Recipe.objects.filter(trending__isnull=False)
+        ).annotate(
+            trending_score=F('trending__score'),
+        ).order_by('-trending_score', '-id')
+        return recipe_page_response(self, queryset)
+
+    @action(
+        detail=True,
+        methods=['GET'],
+        url_name='similar',
+        url_path='similar',
+    )
+    def similar(self, request, pk):
+        """Эндпоинт похожих рецептов: их сохраняли те же пользователи
+        (recipes.similarity).
+        """
+        queryset = Recipe.objects.filter(similar_to__recipe_id=pk).annotate(
+            similarity=F('similar_to__score'),
+        ).order_by('-similarity', '-id')
+        return recipe_page_response(self, queryset)
+
+    @action(
+        detail=False,
+        methods=['GET'],
+        permission_classes=(IsAuthenticated,),
+        url_name='feed',
+        url_path='feed',
+    )
+    def feed(self, request):
+        """Эндпоинт ленты: новые рецепты авторов из подписок
+        (recipes.feed), постранично по курсору (?cursor=, ?limit=).
+        """
+        paginator = pagination.FeedPagination()
+        page = paginator.paginate_sources(
+            feed.get_sources(request.user),
+            Recipe.objects.select_related('card').with_user_flags(
+                request.user
+            ),
+            request,
+        )
+        data = RecipeCardCompiled(self.get_serializer_context()).many(page)
+        return paginator.get_paginated_response(data)
+
+    @action(
+        detail=False,
+        methods=['GET'],
+        url_name='cook',
+        url_path='cook',
+    )
+    def cook(self, request):
+        """Эндпоинт подбора рецептов по имеющимся ингредиентам:
+        ?ingredients=1&ingredients=2[&max_missing=N]. Рецепты упорядочены
+        по доле имеющихся ингредиентов (coverage), missing - сколько
+        ингредиентов рецепта недостает.
+        """
+        query = serializers.CookQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        matches = ingredient_index.find_recipes(
+            query.validated_data['ingredients'],
+            query.validated_data.get('max_missing'),
+        )
+        page = self.paginate_queryset(matches)
+        recipes = Recipe.objects.select_related('card').with_user_flags(
+            request.user
+        ).in_bulk([recipe_id for recipe_id, _, _ in page])
+        # Рецепт мог быть удален после построения индекса
+        page = [match for match in page if match[0] in recipes]
+        data = RecipeCardCompiled(self.get_serializer_context()).many(
+            recipes[recipe_id] for recipe_id, _, _ in page
+        )
+        for item, (_, have, total) in zip(data, page):
+            item['coverage'] = round(have / total, 4)
+            item['missing'] = total - have
+        return self.get_paginated_response(data)
+
     @action(
         detail=False,
         methods=['GET'],
@@ -202,14 +466,28 @@ class RecipeViewSet(viewsets.ModelViewSet):
         url_path='download_shopping_cart',
     )
     def download_shopping_cart(self, request):
-        """Эндпоинт для скачивания списка покупок из корзины."""
+        """Эндпоинт для скачивания списка покупок из корзины:
+        ?format=pdf (по умолчанию), csv, txt или json.
+        """
         user = request.user
-        basket = serializers.ShoppingBasket.objects.filter(user=user)
-        if not basket:
+        file_format = request.query_params.get('format', 'pdf')
+        if (file_format != 'pdf'
+                and file_format not in services.SHOPPING_LIST_FORMATS):
+            return Response(
+                'Формат списка: pdf, csv, txt или json.',
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if not ShoppingBasket.objects.filter(user=user).exists():
             return Response('Корзина путса!')
-        data = basket.values_list(
-            'recipe__ingredients__name',
-            'recipe__ingredients__measurement_unit',
-            'recipe__amounts__amount',
-        )
-        return services.creating_a_shopping_list(data)
+        data = services.get_shopping_list(user)
+        if file_format == 'pdf':
+            return services.creating_a_shopping_list(data)
+        return services.streaming_shopping_list(data.iterator(), file_format)
+
+    def perform_content_negotiation(self, request, force=False):
+        # ?format= списка покупок - это формат файла, а не рендерер DRF:
+        # файлы отдаются готовыми ответами, а ошибки всегда в JSON
+        if self.action == 'download_shopping_cart':
+            renderer = FastJSONRenderer()
+            return renderer, renderer.media_type
+        return super().perform_content_negotiation(request, force)
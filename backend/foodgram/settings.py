@@ -25,6 +25,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
 
     'rest_framework',
     'rest_framework.authtoken',
@@ -89,6 +90,16 @@ DATABASES = {
     }
 }
 
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND',
+            default='django.core.cache.backends.locmem.LocMemCache',
+        ),
+        'LOCATION': os.getenv('CACHE_LOCATION', default='foodgram'),
+    }
+}
+
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
 
@@ -146,13 +157,74 @@ REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
         'rest_framework.authentication.TokenAuthentication',
     ],
-    'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.LimitOffsetPagination',
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+        'api.renderers.MessagePackRenderer',
+    ],
+    'DEFAULT_PAGINATION_CLASS': 'api.pagination.CustomLimitOffsetPagination',
     'PAGE_SIZE': 6,
     'DEFAULT_FILTER_BACKENDS': (
         'django_filters.rest_framework.DjangoFilterBackend',
     ),
 }
 
+# Пагинация: COUNT(*) для отфильтрованных выборок кэшируется на указанное
+# число секунд, для таблиц без фильтров больше порога берется оценка
+# планировщика PostgreSQL.
+PAGINATION_COUNT_CACHE_TIMEOUT = 60
+
+PAGINATION_ESTIMATE_THRESHOLD = 10000
+
+# Кэш сериализованных рецептов (api.cache): время жизни фрагмента и
+# блокировки на его пересчет, ожидание чужого пересчета (в секундах).
+RECIPE_CACHE_TIMEOUT = 60 * 60
+
+RECIPE_CACHE_LOCK_TIMEOUT = 10
+
+RECIPE_CACHE_LOCK_WAIT = 0.5
+
+# Периодические задачи по избранному и корзине учитывают события старше
+# указанного числа секунд.
+EVENTS_LAG = 60
+
+# Популярное (recipes.trending): период полураспада веса события в секундах
+# и вес, ниже которого рецепт выпадает из таблицы.
+TRENDING_HALF_LIFE = 48 * 60 * 60
+
+TRENDING_MIN_WEIGHT = 0.01
+
+# Похожие рецепты (recipes.similarity): сколько соседей хранить для рецепта
+# и сколько строк матрицы сходства считать за раз.
+SIMILAR_RECIPES_TOP_K = 20
+
+SIMILAR_RECIPES_CHUNK_SIZE = 1000
+
+# Вероятные дубликаты (recipes.minhash): минимальная оценка сходства
+# Жаккара множеств ингредиентов и тегов.
+DUPLICATE_RECIPES_THRESHOLD = 0.8
+
+# Лента подписок (recipes.feed): новые рецепты авторов, у которых больше
+# FEED_FANOUT_LIMIT подписчиков, не раскладываются по лентам, а читаются
+# при запросе ленты. Записи ленты вставляются пачками по FEED_BATCH_SIZE.
+FEED_FANOUT_LIMIT = 1000
+
+FEED_BATCH_SIZE = 1000
+
+# Нечеткий поиск ингредиентов (api.autocomplete): минимальное сходство
+# триграмм и наибольшее число результатов.
+INGREDIENT_FUZZY_THRESHOLD = 0.3
+
+INGREDIENT_FUZZY_LIMIT = 20
+
+# Снимок каталога ингредиентов (api.catalog): сколько секунд клиенты
+# и прокси могут не перепроверять его ETag.
+INGREDIENT_SNAPSHOT_MAX_AGE = 60 * 60
+
+# Состояние каталога ингредиентов (api.catalog) в кэше: через сколько секунд
+# перечитывать его из базы, даже если версия 'ingredients' не менялась.
+INGREDIENT_CATALOG_STATE_TTL = 60
+
 DJOSER = {
     'HIDE_USERS': False,
     'LOGIN_FIELD': 'email',
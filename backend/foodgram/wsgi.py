@@ -5,3 +5,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'foodgram.settings')
 
 application = get_wsgi_application()
+
+# Индекс автодополнения ингредиентов строится при старте процесса
+from api.autocomplete import warm_up  # noqa: E402
+
+warm_up()
@@ -0,0 +1,42 @@
+from django.db import migrations
+
+# Нечеткий поиск (api.autocomplete): сходство триграмм по name и
+# istartswith, который в PostgreSQL сравнивает UPPER(name)
+POSTGRESQL_INSTALL = [
+    'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+    """
+    CREATE INDEX IF NOT EXISTS ingredient_name_trgm_idx
+    ON ingredients_ingredient USING gin (name gin_trgm_ops)
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS ingredient_name_upper_trgm_idx
+    ON ingredients_ingredient USING gin ((UPPER(name::text)) gin_trgm_ops)
+    """,
+]
+
+POSTGRESQL_UNINSTALL = [
+    'DROP INDEX IF EXISTS ingredient_name_upper_trgm_idx',
+    'DROP INDEX IF EXISTS ingredient_name_trgm_idx',
+]
+
+
+def run(statements):
+    def forwards(apps, schema_editor):
+        if schema_editor.connection.vendor != 'postgresql':
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+    return forwards
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ingredients', '0007_alter_ingredient_options'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            run(POSTGRESQL_INSTALL), run(POSTGRESQL_UNINSTALL)
+        ),
+    ]
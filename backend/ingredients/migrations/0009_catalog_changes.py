@@ -0,0 +1,29 @@
+# Generated by Django 3.2.25 on 2026-10-18 20:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ingredients', '0008_ingredient_name_trgm'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IngredientTombstone',
+            fields=[
+                ('ingredient_id', models.BigIntegerField(primary_key=True, serialize=False, verbose_name='id ингредиента')),
+                ('deleted_at', models.DateTimeField(db_index=True, verbose_name='дата удаления')),
+            ],
+            options={
+                'verbose_name': 'удаленный ингредиент',
+                'verbose_name_plural': 'удаленные ингредиенты',
+            },
+        ),
+        migrations.AddField(
+            model_name='ingredient',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True, verbose_name='дата изменения'),
+        ),
+    ]
@@ -12,6 +12,11 @@ class Ingredient(models.Model):
         max_length=128,
         verbose_name='единица измерения',
     )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        db_index=True,
+        verbose_name='дата изменения',
+    )
 
     def __str__(self):
         return self.name
@@ -22,6 +27,25 @@ class Ingredient(models.Model):
         ordering = ['name']
 
 
+class IngredientTombstone(models.Model):
+    """Удаленный ингредиент: для изменений каталога с версии клиента."""
+    ingredient_id = models.BigIntegerField(
+        primary_key=True,
+        verbose_name='id ингредиента',
+    )
+    deleted_at = models.DateTimeField(
+        db_index=True,
+        verbose_name='дата удаления',
+    )
+
+    class Meta:
+        verbose_name = 'удаленный ингредиент'
+        verbose_name_plural = 'удаленные ингредиенты'
+
+    def __str__(self):
+        return f'{self.ingredient_id}'
+
+
 class Tag(models.Model):
     """Модель описывающая тег."""
     COLOR_PALETTE = [
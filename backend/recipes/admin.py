@@ -1,8 +1,11 @@
 from django import forms
+from django.conf import settings
 from django.contrib import admin
 
+from . import minhash
 from .models import (Favorite, Recipe, RecipeIngredient, RecipeTag,
                      ShoppingBasket)
+from .signals import recipe_written
 
 
 class IngredientsInlineFormset(forms.models.BaseInlineFormSet):
@@ -43,6 +46,23 @@ class RecipeTagInline(admin.TabularInline):
     extra = 3
 
 
+class DuplicateFilter(admin.SimpleListFilter):
+    """Рецепты с вероятным дубликатом по составу (recipes.minhash)."""
+    title = 'вероятные дубликаты'
+    parameter_name = 'duplicates'
+
+    def lookups(self, request, model_admin):
+        return (('yes', 'Есть'), )
+
+    def queryset(self, request, queryset):
+        if self.value() != 'yes':
+            return queryset
+        duplicates = minhash.find_duplicates(
+            settings.DUPLICATE_RECIPES_THRESHOLD
+        )
+        return queryset.filter(pk__in=duplicates)
+
+
 class RecipeAdmin(admin.ModelAdmin):
     model = Recipe
     list_display = [
@@ -52,18 +72,51 @@ class RecipeAdmin(admin.ModelAdmin):
         'pub_date',
         'counts_favorite',
         'counts_shopping_basket',
+        'probable_duplicates',
     ]
     inlines = [RecipeIngredientInline, RecipeTagInline]
     search_fields = ('name', 'author__username', 'tags__name', )
-    list_filter = ('author', 'name', 'tags')
+    list_filter = ('author', 'name', 'tags', DuplicateFilter)
     readonly_fields = ['counts_favorite', 'counts_shopping_basket']
     empty_value_display = '-пусто-'
 
+    def save_related(self, request, form, formsets, change):
+        previous_ingredients = set(
+            form.instance.amounts.values_list('ingredient_id', flat=True)
+        )
+        super().save_related(request, form, formsets, change)
+        recipe_written.send(
+            sender=Recipe,
+            instance=form.instance,
+            previous_ingredients=previous_ingredients,
+        )
+
+    def get_changelist_instance(self, request):
+        # Дубликаты считаются сразу для всей страницы списка
+        changelist = super().get_changelist_instance(request)
+        recipes = list(changelist.result_list)
+        duplicates = minhash.find_similar(
+            [recipe.pk for recipe in recipes],
+            settings.DUPLICATE_RECIPES_THRESHOLD,
+        )
+        for recipe in recipes:
+            recipe.duplicates = duplicates.get(recipe.pk, [])
+        return changelist
+
+    @admin.display(description='вероятные дубликаты')
+    def probable_duplicates(self, obj):
+        return ', '.join(
+            f'{recipe_id} ({score:.0%})'
+            for recipe_id, score in getattr(obj, 'duplicates', [])
+        ) or None
+
+    @admin.display(ordering='favorites_count')
     def counts_favorite(self, obj):
-        return obj.selected.count()
+        return obj.favorites_count
 
+    @admin.display(ordering='in_carts_count')
     def counts_shopping_basket(self, obj):
-        return obj.shopping_basket.count()
+        return obj.in_carts_count
 
 
 class FavoriteAdmin(admin.ModelAdmin):
@@ -0,0 +1,36 @@
+"""Контрольные точки периодических задач, которые обрабатывают события
+избранного и корзины (Favorite.created, ShoppingBasket.created).
+"""
+from datetime import timedelta
+
+from django.conf import settings
+
+from .models import EventCheckpoint
+
+
+def events_until(now):
+    """Граница обработки событий. События моложе EVENTS_LAG ждут следующего
+    запуска: так не теряются строки из еще не завершенных транзакций.
+    """
+    return now - timedelta(seconds=settings.EVENTS_LAG)
+
+
+def get_checkpoints(sources):
+    """{источник: processed_until} с блокировкой строк до конца транзакции,
+    чтобы параллельные запуски задачи не обработали события дважды.
+    """
+    checkpoints = EventCheckpoint.objects.select_for_update().in_bulk(
+        list(sources)
+    )
+    return {
+        source: checkpoint.processed_until
+        for source, checkpoint in checkpoints.items()
+    }
+
+
+def save_checkpoints(sources, until):
+    EventCheckpoint.objects.filter(source__in=sources).delete()
+    EventCheckpoint.objects.bulk_create([
+        EventCheckpoint(source=source, processed_until=until)
+        for source in sources
+    ])
@@ -0,0 +1,102 @@
+"""Лента подписок: новые рецепты авторов, на которых подписан пользователь.
+
+Рецепт автора, у которого не больше FEED_FANOUT_LIMIT подписчиков,
+при публикации раскладывается по лентам подписчиков (FeedEntry) пачками
+по FEED_BATCH_SIZE. Рецепты авторов с большим числом подписчиков
+по лентам не раскладываются, а читаются при запросе ленты и сливаются
+с записями FeedEntry по ключу (pub_date, id рецепта).
+"""
+from itertools import islice
+
+from django.conf import settings
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from users.models import Subscription
+
+from .models import FeedEntry, Recipe
+
+
+def followers_count(author_id):
+    return Subscription.objects.filter(following_id=author_id).count()
+
+
+def add_entries(entries):
+    """Сохраняет записи ленты из итератора пачками."""
+    entries = iter(entries)
+    while True:
+        batch = list(islice(entries, settings.FEED_BATCH_SIZE))
+        if not batch:
+            return
+        FeedEntry.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def fill(user_ids, author_id):
+    """Добавляет все рецепты автора в ленты пользователей user_ids."""
+    recipes = list(
+        Recipe.objects.filter(author_id=author_id).values_list(
+            'pk', 'pub_date'
+        ).order_by()
+    )
+    add_entries(
+        FeedEntry(user_id=user_id, recipe_id=recipe_id, pub_date=pub_date)
+        for user_id in user_ids
+        for recipe_id, pub_date in recipes
+    )
+
+
+def fan_out(recipe):
+    """Раскладывает новый рецепт по лентам подписчиков автора."""
+    if followers_count(recipe.author_id) > settings.FEED_FANOUT_LIMIT:
+        return
+    followers = Subscription.objects.filter(
+        following_id=recipe.author_id
+    ).values_list('user_id', flat=True).order_by()
+    add_entries(
+        FeedEntry(user_id=user_id, recipe_id=recipe.pk,
+                  pub_date=recipe.pub_date)
+        for user_id in followers.iterator()
+    )
+
+
+def subscribed(user_id, author_id):
+    """Заполняет ленту нового подписчика рецептами автора."""
+    if followers_count(author_id) <= settings.FEED_FANOUT_LIMIT:
+        fill([user_id], author_id)
+
+
+def unsubscribed(user_id, author_id):
+    """Убирает рецепты автора из ленты. Если подписчиков у автора
+    стало ровно FEED_FANOUT_LIMIT, его рецепты больше не читаются
+    при запросе ленты и раскладываются по лентам всех подписчиков.
+    """
+    FeedEntry.objects.filter(
+        user_id=user_id, recipe__author_id=author_id
+    ).delete()
+    if followers_count(author_id) == settings.FEED_FANOUT_LIMIT:
+        fill(
+            Subscription.objects.filter(
+                following_id=author_id
+            ).values_list('user_id', flat=True),
+            author_id,
+        )
+
+
+def get_sources(user):
+    """Источники ленты для FeedPagination: кверисеты и поля ключа
+    (pub_date, id рецепта).
+    """
+    followers = Subscription.objects.filter(
+        following=OuterRef('following')
+    ).order_by().values('following').annotate(
+        count=Count('pk')
+    ).values('count')
+    popular = Subscription.objects.filter(user=user).annotate(
+        followers=Coalesce(Subquery(followers), 0)
+    ).filter(
+        followers__gt=settings.FEED_FANOUT_LIMIT
+    ).values('following')
+    return [
+        (FeedEntry.objects.filter(user=user), ('pub_date', 'recipe_id')),
+        (Recipe.objects.filter(author__in=popular), ('pub_date', 'id')),
+    ]
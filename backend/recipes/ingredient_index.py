@@ -0,0 +1,154 @@
+"""Инвертированный индекс "ингредиент -> рецепты" для подбора рецептов
+по имеющимся ингредиентам.
+
+Рецепты ингредиента хранятся в IngredientPostings частями: строка
+(ингредиент, chunk) - отсортированный массив uint64 (little-endian),
+id рецепта в старших битах и число ингредиентов рецепта в младших
+TOTAL_BITS. Поэтому доля имеющихся ингредиентов считается только
+по массивам запрошенных ингредиентов, без обращения к RecipeIngredient.
+
+Часть определяется id рецепта (chunk_of): диапазон из 2 ** CHUNK_BITS id
+делится на 2 ** SHARD_BITS частей по младшим битам id. Массив части
+не больше 2 ** (CHUNK_BITS - SHARD_BITS) записей, запись рецепта
+блокирует только свою часть, а рецепты с соседними id (например,
+создаваемые одновременно) попадают в разные части.
+"""
+import sys
+from array import array
+from bisect import bisect_left, insort
+from collections import Counter, defaultdict
+
+from django.db import transaction
+from django.db.models import Count
+
+from .models import IngredientPostings, RecipeIngredient
+
+TOTAL_BITS = 16
+TOTAL_MASK = (1 << TOTAL_BITS) - 1
+CHUNK_BITS = 12
+SHARD_BITS = 3
+SHARD_MASK = (1 << SHARD_BITS) - 1
+BATCH_SIZE = 1000
+
+
+def make_entry(recipe_id, total):
+    return (recipe_id << TOTAL_BITS) | min(total, TOTAL_MASK)
+
+
+def chunk_of(recipe_id):
+    return ((recipe_id >> CHUNK_BITS) << SHARD_BITS) | (recipe_id & SHARD_MASK)
+
+
+def unpack(data):
+    entries = array('Q')
+    entries.frombytes(data)
+    if sys.byteorder == 'big':
+        entries.byteswap()
+    return entries
+
+
+def pack(entries):
+    if sys.byteorder == 'big':
+        entries = array('Q', entries)
+        entries.byteswap()
+    return entries.tobytes()
+
+
+def discard(entries, recipe_id):
+    start = bisect_left(entries, recipe_id << TOTAL_BITS)
+    end = bisect_left(entries, (recipe_id + 1) << TOTAL_BITS)
+    del entries[start:end]
+
+
+def update_recipe(recipe_id, previous_ingredients=()):
+    """Переносит рецепт в индексе с прежних ингредиентов на текущие."""
+    current = set(RecipeIngredient.objects.filter(
+        recipe_id=recipe_id
+    ).values_list('ingredient_id', flat=True))
+    apply(recipe_id, set(previous_ingredients) | current, current)
+
+
+def remove_recipe(recipe_id, ingredients):
+    apply(recipe_id, set(ingredients), set())
+
+
+def apply(recipe_id, touched, current):
+    entry = make_entry(recipe_id, len(current))
+    chunk = chunk_of(recipe_id)
+    with transaction.atomic():
+        # Недостающие части создаются заранее: при одновременном первом
+        # использовании ингредиента вторая вставка ничего не делает,
+        # а блокировка ниже дождется коммита первой
+        IngredientPostings.objects.bulk_create(
+            [
+                IngredientPostings(ingredient_id=ingredient_id, chunk=chunk)
+                for ingredient_id in sorted(current)
+            ],
+            ignore_conflicts=True,
+        )
+        postings = IngredientPostings.objects.select_for_update().filter(
+            ingredient_id__in=touched, chunk=chunk
+        ).order_by('ingredient_id')
+        changed = []
+        for posting in postings:
+            entries = unpack(posting.recipes)
+            discard(entries, recipe_id)
+            if posting.ingredient_id in current:
+                insort(entries, entry)
+            posting.recipes = pack(entries)
+            changed.append(posting)
+        IngredientPostings.objects.bulk_update(changed, ['recipes'])
+
+
+def rebuild():
+    """Строит индекс заново по таблице RecipeIngredient.
+    Возвращает число ингредиентов в индексе.
+    """
+    totals = dict(RecipeIngredient.objects.values_list('recipe').annotate(
+        total=Count('id')
+    ).order_by())
+    grouped = defaultdict(list)
+    rows = RecipeIngredient.objects.values_list(
+        'ingredient_id', 'recipe_id'
+    ).order_by().iterator(chunk_size=10000)
+    for ingredient_id, recipe_id in rows:
+        grouped[ingredient_id, chunk_of(recipe_id)].append(
+            make_entry(recipe_id, totals[recipe_id])
+        )
+    with transaction.atomic():
+        IngredientPostings.objects.all().delete()
+        IngredientPostings.objects.bulk_create(
+            (
+                IngredientPostings(
+                    ingredient_id=ingredient_id,
+                    chunk=chunk,
+                    recipes=pack(array('Q', sorted(entries))),
+                )
+                for (ingredient_id, chunk), entries in grouped.items()
+            ),
+            batch_size=BATCH_SIZE,
+        )
+    return len({ingredient_id for ingredient_id, _ in grouped})
+
+
+def find_recipes(ingredients, max_missing=None):
+    """Рецепты, в которых есть хотя бы один из ингредиентов, списком
+    (recipe_id, have, total): по убыванию доли имеющихся ингредиентов,
+    затем по числу недостающих и от новых к старым. max_missing
+    отбрасывает рецепты, где недостает больше ингредиентов.
+    """
+    counter = Counter()
+    for data in IngredientPostings.objects.filter(
+        ingredient_id__in=ingredients
+    ).values_list('recipes', flat=True):
+        counter.update(unpack(data))
+    matches = []
+    for entry, have in counter.items():
+        total = entry & TOTAL_MASK
+        if max_missing is not None and total - have > max_missing:
+            continue
+        matches.append((entry >> TOTAL_BITS, have, total))
+    matches.sort(key=lambda match: (
+        -match[1] / match[2], match[2] - match[1], -match[0]
+    ))
+    return matches
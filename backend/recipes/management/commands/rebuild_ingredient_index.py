@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from recipes import ingredient_index
+
+
+class Command(BaseCommand):
+    help = 'rebuilds recipes_ingredientpostings table'
+
+    def handle(self, *args, **options):
+        count = ingredient_index.rebuild()
+        self.stdout.write(self.style.SUCCESS(
+            f'index is successfully rebuilt for {count} ingredients'
+        ))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from recipes import minhash
+
+
+class Command(BaseCommand):
+    help = 'rebuilds MinHash signatures and LSH buckets of recipes'
+
+    def handle(self, *args, **options):
+        count = minhash.rebuild()
+        self.stdout.write(self.style.SUCCESS(
+            f'signatures are successfully rebuilt for {count} recipes'
+        ))
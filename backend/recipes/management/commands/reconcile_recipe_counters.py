@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from django.db.models import F, Q
+
+from recipes.models import Favorite, Recipe, ShoppingBasket, count_subquery
+
+
+class Command(BaseCommand):
+    help = 'reconciles favorites_count and in_carts_count of recipes'
+
+    def handle(self, *args, **options):
+        drifted = Recipe.objects.with_actual_counters().filter(
+            ~Q(favorites_count=F('actual_favorites_count'))
+            | ~Q(in_carts_count=F('actual_in_carts_count'))
+        ).values_list('pk', flat=True)
+        pks = list(drifted)
+        for start in range(0, len(pks), 1000):
+            Recipe.objects.filter(pk__in=pks[start:start + 1000]).update(
+                favorites_count=count_subquery(Favorite),
+                in_carts_count=count_subquery(ShoppingBasket),
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'counters are successfully reconciled for {len(pks)} recipes'
+        ))
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from recipes.similarity import update_similar_recipes
+
+
+class Command(BaseCommand):
+    help = (
+        'updates recipes_recipesimilarity with events since the last run '
+        'and purges the processed recipes_savedreciperemoval rows; '
+        'run it periodically (e.g. every 5 minutes by cron)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--full',
+            action='store_true',
+            help='recompute all recipes from the whole matrix',
+        )
+
+    def handle(self, *args, **options):
+        count = update_similar_recipes(full=options['full'])
+        self.stdout.write(self.style.SUCCESS(
+            f'similar recipes are successfully updated for {count} recipes'
+        ))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from recipes.trending import update_trending
+
+
+class Command(BaseCommand):
+    help = 'updates recipes_trendingscore with events since the last run'
+
+    def handle(self, *args, **options):
+        count = update_trending()
+        self.stdout.write(self.style.SUCCESS(
+            f'trending scores are successfully updated for {count} recipes'
+        ))
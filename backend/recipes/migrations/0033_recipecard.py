@@ -0,0 +1,26 @@
+# Generated by Django 3.2.25 on 2026-10-18 20:22
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0032_recipe_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipeCard',
+            fields=[
+                ('recipe', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='card', serialize=False, to='recipes.recipe', verbose_name='рецепт')),
+                ('data', models.TextField(verbose_name='карточка рецепта (JSON)')),
+                ('recipe_updated_at', models.DateTimeField(verbose_name='версия рецепта в карточке')),
+            ],
+            options={
+                'verbose_name': 'карточка рецепта',
+                'verbose_name_plural': 'карточки рецептов',
+            },
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 3.2.25 on 2026-10-18 20:25
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+import recipes.search
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0034_recipetag_recipe_tag_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True, verbose_name='поисковый вектор'),
+        ),
+        migrations.RunPython(
+            recipes.search.install_search_index,
+            recipes.search.uninstall_search_index,
+        ),
+    ]
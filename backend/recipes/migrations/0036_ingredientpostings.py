@@ -0,0 +1,75 @@
+# Generated by Django 3.2.25 on 2026-10-18 20:27
+
+import sys
+from array import array
+from collections import defaultdict
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+# Формат индекса из recipes.ingredient_index на момент миграции
+TOTAL_BITS = 16
+TOTAL_MASK = (1 << TOTAL_BITS) - 1
+CHUNK_BITS = 12
+SHARD_BITS = 3
+SHARD_MASK = (1 << SHARD_BITS) - 1
+
+
+def fill_postings(apps, schema_editor):
+    """Строит индекс по RecipeIngredient, как ingredient_index.rebuild()."""
+    IngredientPostings = apps.get_model('recipes', 'IngredientPostings')
+    RecipeIngredient = apps.get_model('recipes', 'RecipeIngredient')
+    totals = dict(RecipeIngredient.objects.values_list('recipe').annotate(
+        total=models.Count('id')
+    ).order_by())
+    rows = RecipeIngredient.objects.values_list(
+        'ingredient_id', 'recipe_id'
+    ).order_by().iterator(chunk_size=10000)
+    grouped = defaultdict(list)
+    for ingredient_id, recipe_id in rows:
+        chunk = ((recipe_id >> CHUNK_BITS) << SHARD_BITS) | (
+            recipe_id & SHARD_MASK
+        )
+        grouped[ingredient_id, chunk].append(
+            (recipe_id << TOTAL_BITS) | min(totals[recipe_id], TOTAL_MASK)
+        )
+    postings = []
+    for (ingredient_id, chunk), entries in grouped.items():
+        entries = array('Q', sorted(entries))
+        if sys.byteorder == 'big':
+            entries.byteswap()
+        postings.append(IngredientPostings(
+            ingredient_id=ingredient_id,
+            chunk=chunk,
+            recipes=entries.tobytes(),
+        ))
+    IngredientPostings.objects.bulk_create(postings, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ingredients', '0007_alter_ingredient_options'),
+        ('recipes', '0035_recipe_search_vector'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IngredientPostings',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('chunk', models.PositiveIntegerField(verbose_name='часть индекса')),
+                ('recipes', models.BinaryField(default=bytes, verbose_name='рецепты с ингредиентом')),
+                ('ingredient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='postings', to='ingredients.ingredient', verbose_name='ингредиент')),
+            ],
+            options={
+                'verbose_name': 'рецепты ингредиента',
+                'verbose_name_plural': 'индекс рецептов по ингредиентам',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='ingredientpostings',
+            constraint=models.UniqueConstraint(fields=('ingredient', 'chunk'), name='unique_ingredient_postings_chunk'),
+        ),
+        migrations.RunPython(fill_postings, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,66 @@
+# Generated by Django 3.2.25 on 2026-10-18 20:30
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+def start_checkpoints(apps, schema_editor):
+    """У существующих связей нет настоящего времени добавления:
+    update_trending учитывает только события после миграции.
+    """
+    TrendingCheckpoint = apps.get_model('recipes', 'TrendingCheckpoint')
+    now = django.utils.timezone.now()
+    TrendingCheckpoint.objects.bulk_create([
+        TrendingCheckpoint(source=source, processed_until=now)
+        for source in ('favorites', 'carts')
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0037_recipe_popularity_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrendingCheckpoint',
+            fields=[
+                ('source', models.CharField(max_length=50, primary_key=True, serialize=False, verbose_name='источник')),
+                ('processed_until', models.DateTimeField(verbose_name='учтено до')),
+            ],
+            options={
+                'verbose_name': 'контрольная точка популярности',
+                'verbose_name_plural': 'контрольные точки популярности',
+            },
+        ),
+        migrations.CreateModel(
+            name='TrendingScore',
+            fields=[
+                ('recipe', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='trending', serialize=False, to='recipes.recipe', verbose_name='рецепт')),
+                ('score', models.FloatField(verbose_name='популярность (логарифм)')),
+            ],
+            options={
+                'verbose_name': 'популярность рецепта',
+                'verbose_name_plural': 'популярность рецептов',
+            },
+        ),
+        migrations.AddField(
+            model_name='favorite',
+            name='created',
+            field=models.DateTimeField(auto_now_add=True, db_index=True, default=django.utils.timezone.now, verbose_name='дата добавления'),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='shoppingbasket',
+            name='created',
+            field=models.DateTimeField(auto_now_add=True, db_index=True, default=django.utils.timezone.now, verbose_name='дата добавления'),
+            preserve_default=False,
+        ),
+        migrations.AddIndex(
+            model_name='trendingscore',
+            index=models.Index(fields=['-score', '-recipe'], name='trending_score_idx'),
+        ),
+        migrations.RunPython(start_checkpoints, migrations.RunPython.noop),
+    ]
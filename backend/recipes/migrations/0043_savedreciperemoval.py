@@ -0,0 +1,26 @@
+# Generated by Django 3.2.25 on 2026-10-18 21:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0041_feed'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SavedRecipeRemoval',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('user_id', models.BigIntegerField(verbose_name='id пользователя')),
+                ('recipe_id', models.BigIntegerField(verbose_name='id рецепта')),
+                ('created', models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='дата удаления')),
+            ],
+            options={
+                'verbose_name': 'удаление из избранного или корзины',
+                'verbose_name_plural': 'удаления из избранного и корзины',
+            },
+        ),
+    ]
@@ -0,0 +1,84 @@
+# Generated by Django 3.2.25 on 2026-10-18 21:31
+
+from collections import defaultdict
+from hashlib import blake2b
+
+import numpy as np
+from django.db import migrations
+
+# Параметры и хэши MinHash из recipes.minhash на момент миграции
+NUM_PERM = 64
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+PRIME = (1 << 31) - 1
+BATCH_SIZE = 1000
+
+_random = np.random.RandomState(20220801)
+HASH_A = _random.randint(1, PRIME, NUM_PERM).astype(np.int64)
+HASH_B = _random.randint(0, PRIME, NUM_PERM).astype(np.int64)
+
+
+def signature(features):
+    hashes = (
+        HASH_A[:, None] * (features[None, :] % PRIME) + HASH_B[:, None]
+    ) % PRIME
+    return hashes.min(axis=1).astype('<u4')
+
+
+def band_hashes(values):
+    return [
+        int.from_bytes(
+            blake2b(
+                values[band * ROWS:(band + 1) * ROWS].tobytes(),
+                digest_size=7,
+            ).digest(),
+            'little',
+        )
+        for band in range(BANDS)
+    ]
+
+
+def fill_signatures(apps, schema_editor):
+    """MinHash-подписи и корзины LSH рецептов, созданных до 0040."""
+    Recipe = apps.get_model('recipes', 'Recipe')
+    RecipeBucket = apps.get_model('recipes', 'RecipeBucket')
+    RecipeIngredient = apps.get_model('recipes', 'RecipeIngredient')
+    RecipeSignature = apps.get_model('recipes', 'RecipeSignature')
+    RecipeTag = apps.get_model('recipes', 'RecipeTag')
+    recipe_ids = list(Recipe.objects.exclude(
+        pk__in=RecipeSignature.objects.values('recipe_id')
+    ).values_list('pk', flat=True).order_by('pk'))
+    for start in range(0, len(recipe_ids), BATCH_SIZE):
+        batch = recipe_ids[start:start + BATCH_SIZE]
+        features = defaultdict(list)
+        for model, field, kind in (
+            (RecipeIngredient, 'ingredient_id', 0),
+            (RecipeTag, 'tag_id', 1),
+        ):
+            for recipe_id, value in model.objects.filter(
+                recipe_id__in=batch
+            ).values_list('recipe_id', field).order_by():
+                features[recipe_id].append(2 * value + kind)
+        signatures, buckets = [], []
+        for recipe_id, values in features.items():
+            values = signature(np.array(values, dtype=np.int64))
+            signatures.append(RecipeSignature(
+                recipe_id=recipe_id, signature=values.tobytes()
+            ))
+            buckets.extend(
+                RecipeBucket(recipe_id=recipe_id, band=band, bucket=bucket)
+                for band, bucket in enumerate(band_hashes(values))
+            )
+        RecipeSignature.objects.bulk_create(signatures, batch_size=BATCH_SIZE)
+        RecipeBucket.objects.bulk_create(buckets, batch_size=BATCH_SIZE)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0043_savedreciperemoval'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_signatures, migrations.RunPython.noop),
+    ]
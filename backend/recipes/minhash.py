@@ -0,0 +1,186 @@
+"""Похожие по составу рецепты: MinHash-подписи и LSH.
+
+Рецепт - множество признаков: ингредиенты (2 * id) и теги (2 * id + 1).
+Подпись - минимумы NUM_PERM универсальных хэшей (a * x + b) mod PRIME
+по признакам; доля совпавших позиций двух подписей оценивает коэффициент
+Жаккара множеств. Подпись делится на BANDS полос по ROWS значений, хэш
+каждой полосы хранится в RecipeBucket: кандидаты в похожие - рецепты
+с общей корзиной хоть в одной полосе, так что поиск не сравнивает рецепт
+со всем каталогом. Для 16 полос по 4 значения пара со сходством 0.8
+становится кандидатом с вероятностью больше 0.999, со сходством 0.3 -
+около 0.12.
+"""
+from collections import defaultdict
+from hashlib import blake2b
+
+import numpy as np
+from django.db import transaction
+from django.db.models import Count, Exists, OuterRef
+
+from .models import (Recipe, RecipeBucket, RecipeIngredient, RecipeSignature,
+                     RecipeTag)
+
+NUM_PERM = 64
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+PRIME = (1 << 31) - 1
+BATCH_SIZE = 1000
+
+_random = np.random.RandomState(20220801)
+HASH_A = _random.randint(1, PRIME, NUM_PERM).astype(np.int64)
+HASH_B = _random.randint(0, PRIME, NUM_PERM).astype(np.int64)
+
+
+def load_features(recipe_ids=None):
+    """{recipe_id: массив признаков} для рецептов recipe_ids (или всех)."""
+    features = defaultdict(list)
+    sources = (
+        (RecipeIngredient, 'ingredient_id', 0),
+        (RecipeTag, 'tag_id', 1),
+    )
+    for model, field, kind in sources:
+        rows = model.objects.order_by()
+        if recipe_ids is not None:
+            rows = rows.filter(recipe_id__in=recipe_ids)
+        for recipe_id, value in rows.values_list(
+            'recipe_id', field
+        ).iterator():
+            features[recipe_id].append(2 * value + kind)
+    return {
+        recipe_id: np.array(values, dtype=np.int64)
+        for recipe_id, values in features.items()
+    }
+
+
+def signature(features):
+    """MinHash-подпись: NUM_PERM значений uint32."""
+    hashes = (
+        HASH_A[:, None] * (features[None, :] % PRIME) + HASH_B[:, None]
+    ) % PRIME
+    return hashes.min(axis=1).astype('<u4')
+
+
+def band_hashes(values):
+    """Хэши полос подписи (56 бит, помещаются в BigIntegerField)."""
+    return [
+        int.from_bytes(
+            blake2b(
+                values[band * ROWS:(band + 1) * ROWS].tobytes(),
+                digest_size=7,
+            ).digest(),
+            'little',
+        )
+        for band in range(BANDS)
+    ]
+
+
+def load_signatures(recipe_ids):
+    return {
+        recipe_id: np.frombuffer(bytes(data), dtype='<u4')
+        for recipe_id, data in RecipeSignature.objects.filter(
+            recipe_id__in=recipe_ids
+        ).values_list('recipe_id', 'signature')
+    }
+
+
+def estimate(first, second):
+    """Оценка коэффициента Жаккара по двум подписям."""
+    return float(np.count_nonzero(first == second)) / NUM_PERM
+
+
+def save_signatures(recipe_ids):
+    """Пересчитывает подписи и корзины рецептов recipe_ids."""
+    recipe_ids = list(recipe_ids)
+    features = load_features(recipe_ids)
+    signatures, buckets = [], []
+    for recipe_id, values in features.items():
+        values = signature(values)
+        signatures.append(
+            RecipeSignature(recipe_id=recipe_id, signature=values.tobytes())
+        )
+        buckets.extend(
+            RecipeBucket(recipe_id=recipe_id, band=band, bucket=bucket)
+            for band, bucket in enumerate(band_hashes(values))
+        )
+    with transaction.atomic():
+        RecipeSignature.objects.filter(recipe_id__in=recipe_ids).delete()
+        RecipeBucket.objects.filter(recipe_id__in=recipe_ids).delete()
+        RecipeSignature.objects.bulk_create(signatures, batch_size=BATCH_SIZE)
+        RecipeBucket.objects.bulk_create(buckets, batch_size=BATCH_SIZE)
+    return len(signatures)
+
+
+def rebuild():
+    """Пересчитывает подписи всех рецептов. Возвращает их число."""
+    recipe_ids = list(Recipe.objects.values_list('pk', flat=True))
+    with transaction.atomic():
+        RecipeSignature.objects.all().delete()
+        RecipeBucket.objects.all().delete()
+        return sum(
+            save_signatures(recipe_ids[start:start + BATCH_SIZE])
+            for start in range(0, len(recipe_ids), BATCH_SIZE)
+        )
+
+
+def verify(buckets, recipe_ids, threshold):
+    """Проверяет по подписям пары из общих корзин buckets - строк
+    (band, bucket, recipe_id); recipe_ids=None - все рецепты корзин.
+    """
+    members = defaultdict(set)
+    for band, bucket, recipe_id in buckets:
+        members[band, bucket].add(recipe_id)
+    candidates = defaultdict(set)
+    for recipes in members.values():
+        if recipe_ids is not None:
+            targets = recipes.intersection(recipe_ids)
+        else:
+            targets = recipes
+        for recipe_id in targets:
+            candidates[recipe_id].update(recipes)
+    signatures = load_signatures(set().union(*candidates.values()))
+    result = {}
+    for recipe_id, others in candidates.items():
+        similar = [
+            (other, estimate(signatures[recipe_id], signatures[other]))
+            for other in others - {recipe_id}
+        ]
+        similar = [pair for pair in similar if pair[1] >= threshold]
+        if similar:
+            result[recipe_id] = sorted(similar, key=lambda pair: -pair[1])
+    return result
+
+
+def find_similar(recipe_ids, threshold):
+    """{recipe_id: [(id похожего рецепта, оценка сходства)]} для рецептов
+    recipe_ids с оценкой не ниже threshold, по убыванию оценки.
+    """
+    recipe_ids = set(recipe_ids)
+    buckets = RecipeBucket.objects.filter(Exists(
+        RecipeBucket.objects.filter(
+            recipe_id__in=recipe_ids,
+            band=OuterRef('band'),
+            bucket=OuterRef('bucket'),
+        )
+    ))
+    return verify(
+        buckets.values_list('band', 'bucket', 'recipe_id').order_by(),
+        recipe_ids,
+        threshold,
+    )
+
+
+def find_duplicates(threshold):
+    """Как find_similar, но для всех рецептов, у которых есть вероятный
+    дубликат: проверяются только корзины больше чем с одним рецептом.
+    """
+    collisions = RecipeBucket.objects.values('band', 'bucket').annotate(
+        recipes=Count('recipe_id')
+    ).filter(recipes__gt=1).order_by()
+    buckets = RecipeBucket.objects.filter(Exists(
+        collisions.filter(band=OuterRef('band'), bucket=OuterRef('bucket'))
+    ))
+    return verify(
+        buckets.values_list('band', 'bucket', 'recipe_id').order_by(),
+        None,
+        threshold,
+    )
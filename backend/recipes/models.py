@@ -1,8 +1,94 @@
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
+from django.db.models import Count, Exists, OuterRef, Prefetch, Subquery, Value
+from django.db.models.functions import Coalesce
 
 from ingredients.models import Ingredient, Tag
 from users.models import User
 
+from .search import search_recipes
+
+
+def count_subquery(model):
+    """Число строк model для рецепта из внешнего запроса."""
+    return Coalesce(
+        Subquery(
+            model.objects.filter(recipe=OuterRef('pk')).order_by().values(
+                'recipe'
+            ).annotate(count=Count('pk')).values('count')
+        ),
+        0,
+    )
+
+
+class RecipeQuerySet(models.QuerySet):
+    """Кверисет рецептов с флагами, зависящими от пользователя."""
+
+    def with_user_flags(self, user):
+        """Добавляет is_favorited и is_in_shopping_cart в основной SELECT.
+        Для анонимного пользователя оба флага - константа False.
+        """
+        if not user.is_authenticated:
+            return self.annotate(
+                is_favorited=Value(False, output_field=models.BooleanField()),
+                is_in_shopping_cart=Value(
+                    False, output_field=models.BooleanField()
+                ),
+            )
+        return self.annotate(
+            is_favorited=Exists(Favorite.objects.filter(
+                user=user, recipe=OuterRef('pk')
+            )),
+            is_in_shopping_cart=Exists(ShoppingBasket.objects.filter(
+                user=user, recipe=OuterRef('pk')
+            )),
+        )
+
+    @staticmethod
+    def serialization_lookups(fields=None):
+        """Связанные данные, которые читает RecipeSerializer: автор, теги и
+        ингредиенты с количеством. Подходит и для prefetch_related_objects.
+        fields ограничивает выборку только нужными полями ответа.
+        """
+        lookups = {
+            'author': 'author',
+            'tags': 'tags',
+            'ingredients': Prefetch(
+                'amounts',
+                queryset=RecipeIngredient.objects.select_related('ingredient'),
+            ),
+        }
+        return tuple(
+            lookup for field, lookup in lookups.items()
+            if fields is None or field in fields
+        )
+
+    def search(self, text):
+        """Полнотекстовый поиск с ранжированием (recipes.search)."""
+        return search_recipes(self, text)
+
+    def with_actual_counters(self):
+        """Аннотирует фактическое число добавлений в избранное и корзину."""
+        return self.annotate(
+            actual_favorites_count=count_subquery(Favorite),
+            actual_in_carts_count=count_subquery(ShoppingBasket),
+        )
+
+    def for_serialization(self, user):
+        """Загружает всё, что нужно RecipeSerializer, фиксированным
+        числом запросов.
+        """
+        return self.with_user_flags(user).prefetch_related(
+            *self.serialization_lookups()
+        )
+
+
+class RecipeManager(models.Manager.from_queryset(RecipeQuerySet)):
+
+    def get_queryset(self):
+        # Поисковый вектор читает только база
+        return super().get_queryset().defer('search_vector')
+
 
 class Recipe(models.Model):
     """Модель для управления рецептами."""
@@ -47,6 +133,30 @@ class Recipe(models.Model):
         db_index=True,
         verbose_name='дата публикации рецепта',
     )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        verbose_name='дата изменения рецепта',
+    )
+    # Счетчики обновляются сигналами api.signals,
+    # сверка - команда reconcile_recipe_counters
+    favorites_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='в избранном',
+    )
+    in_carts_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='в списках покупок',
+    )
+    # Заполняется триггером PostgreSQL (recipes.search)
+    search_vector = SearchVectorField(
+        null=True,
+        editable=False,
+        verbose_name='поисковый вектор',
+    )
+
+    objects = RecipeManager()
 
     def __str__(self):
         return self.name
@@ -55,6 +165,44 @@ class Recipe(models.Model):
         verbose_name = 'рецепт'
         verbose_name_plural = 'рецепты'
         ordering = ['-pub_date']
+        indexes = [
+            # Ключ keyset-пагинации ленты рецептов
+            models.Index(
+                fields=['-pub_date', '-id'], name='recipe_pub_date_id_idx'
+            ),
+            # Сортировка ?ordering=popular
+            models.Index(
+                fields=['-favorites_count', '-pub_date', '-id'],
+                name='recipe_popular_idx',
+            ),
+        ]
+
+
+class RecipeCard(models.Model):
+    """Готовое публичное представление рецепта для ленты и страницы
+    рецепта (поля RecipeSerializer без полей пользователя).
+    Хранится текстом JSON, а не JSONField: jsonb в Postgres не сохраняет
+    порядок ключей. recipe_updated_at - Recipe.updated_at на момент сборки,
+    по нему отличаются устаревшие карточки.
+    """
+    recipe = models.OneToOneField(
+        Recipe,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='card',
+        verbose_name='рецепт',
+    )
+    data = models.TextField(verbose_name='карточка рецепта (JSON)')
+    recipe_updated_at = models.DateTimeField(
+        verbose_name='версия рецепта в карточке',
+    )
+
+    class Meta:
+        verbose_name = 'карточка рецепта'
+        verbose_name_plural = 'карточки рецептов'
+
+    def __str__(self):
+        return f'{self.recipe_id}'
 
 
 class RecipeTag(models.Model):
@@ -76,6 +224,12 @@ class RecipeTag(models.Model):
                 fields=['tag', 'recipe'], name='unique_tags'
             ),
         ]
+        indexes = [
+            # Проверка тегов рецепта в RecipeFilter (EXISTS по recipe_id)
+            models.Index(
+                fields=['recipe', 'tag'], name='recipetag_recipe_tag_idx'
+            ),
+        ]
 
 
 class RecipeIngredient(models.Model):
@@ -109,6 +263,37 @@ class RecipeIngredient(models.Model):
         return f'{self.recipe}: {self.ingredient} - {self.amount}'
 
 
+class IngredientPostings(models.Model):
+    """Часть списка рецептов с ингредиентом для подбора рецептов
+    по продуктам. Формат массива и деление на части описаны
+    в recipes.ingredient_index.
+    """
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        related_name='postings',
+        verbose_name='ингредиент',
+    )
+    chunk = models.PositiveIntegerField(verbose_name='часть индекса')
+    recipes = models.BinaryField(
+        default=bytes,
+        verbose_name='рецепты с ингредиентом',
+    )
+
+    class Meta:
+        verbose_name = 'рецепты ингредиента'
+        verbose_name_plural = 'индекс рецептов по ингредиентам'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['ingredient', 'chunk'],
+                name='unique_ingredient_postings_chunk',
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.ingredient_id}:{self.chunk}'
+
+
 class Favorite(models.Model):
     """Модель для реализации добавления рецептов в "Избранное"."""
     user = models.ForeignKey(
@@ -117,6 +302,11 @@ class Favorite(models.Model):
     recipe = models.ForeignKey(
         Recipe, on_delete=models.CASCADE, related_name='selected'
     )
+    created = models.DateTimeField(
+        auto_now_add=True,
+        db_index=True,
+        verbose_name='дата добавления',
+    )
 
     class Meta:
         verbose_name = 'избранное'
@@ -137,6 +327,11 @@ class ShoppingBasket(models.Model):
     recipe = models.ForeignKey(
         Recipe, on_delete=models.CASCADE, related_name='shopping_basket'
     )
+    created = models.DateTimeField(
+        auto_now_add=True,
+        db_index=True,
+        verbose_name='дата добавления',
+    )
 
     class Meta:
         verbose_name = 'корзина'
@@ -147,3 +342,193 @@ class ShoppingBasket(models.Model):
                 fields=['user', 'recipe'], name='unique_shopping_basket'
             ),
         ]
+
+
+class TrendingScore(models.Model):
+    """Популярность рецепта с экспоненциальным затуханием по времени.
+    score - натуральный логарифм суммы весов событий, умноженных на
+    exp((t - TRENDING_EPOCH) / tau), поэтому старые значения не нужно
+    пересчитывать: порядок по score совпадает с порядком по затухшей
+    популярности на любой момент. Обновляется командой update_trending.
+    """
+    recipe = models.OneToOneField(
+        Recipe,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='trending',
+        verbose_name='рецепт',
+    )
+    score = models.FloatField(verbose_name='популярность (логарифм)')
+
+    class Meta:
+        verbose_name = 'популярность рецепта'
+        verbose_name_plural = 'популярность рецептов'
+        indexes = [
+            models.Index(
+                fields=['-score', '-recipe'], name='trending_score_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.recipe_id}: {self.score}'
+
+
+class RecipeSimilarity(models.Model):
+    """Похожий рецепт: косинусная близость по пользователям, добавившим
+    оба рецепта в избранное или корзину. Для рецепта хранятся только
+    SIMILAR_RECIPES_TOP_K ближайших (recipes.similarity).
+    """
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='similarities',
+        verbose_name='рецепт',
+    )
+    similar = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='similar_to',
+        verbose_name='похожий рецепт',
+    )
+    score = models.FloatField(verbose_name='близость')
+
+    class Meta:
+        verbose_name = 'похожий рецепт'
+        verbose_name_plural = 'похожие рецепты'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['recipe', 'similar'], name='unique_similarity'
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=['recipe', '-score'], name='similarity_recipe_score_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.recipe_id} ~ {self.similar_id}: {self.score}'
+
+
+class FeedEntry(models.Model):
+    """Рецепт в ленте подписчика (recipes.feed). pub_date копируется
+    из рецепта, чтобы страница ленты читалась по индексу без соединения
+    с рецептами.
+    """
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='feed',
+        verbose_name='подписчик',
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+        verbose_name='рецепт',
+    )
+    pub_date = models.DateTimeField(verbose_name='дата публикации рецепта')
+
+    class Meta:
+        verbose_name = 'запись ленты'
+        verbose_name_plural = 'записи ленты'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'recipe'], name='unique_feed_entry'
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', '-pub_date', '-recipe'],
+                name='feedentry_user_pub_date_idx',
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.user_id}: {self.recipe_id}'
+
+
+class RecipeSignature(models.Model):
+    """MinHash-подпись множества ингредиентов и тегов рецепта
+    (recipes.minhash).
+    """
+    recipe = models.OneToOneField(
+        Recipe,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='signature',
+        verbose_name='рецепт',
+    )
+    signature = models.BinaryField(verbose_name='MinHash-подпись')
+
+    class Meta:
+        verbose_name = 'подпись рецепта'
+        verbose_name_plural = 'подписи рецептов'
+
+    def __str__(self):
+        return f'{self.recipe_id}'
+
+
+class RecipeBucket(models.Model):
+    """Корзина LSH: рецепты с одинаковой полосой подписи - кандидаты
+    в похожие.
+    """
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='buckets',
+        verbose_name='рецепт',
+    )
+    band = models.PositiveSmallIntegerField(verbose_name='полоса')
+    bucket = models.BigIntegerField(verbose_name='хэш полосы')
+
+    class Meta:
+        verbose_name = 'корзина LSH'
+        verbose_name_plural = 'корзины LSH'
+        indexes = [
+            models.Index(
+                fields=['band', 'bucket'], name='recipebucket_band_bucket_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.recipe_id}: {self.band}/{self.bucket}'
+
+
+class EventCheckpoint(models.Model):
+    """До какого момента события источника (избранное, корзина) учтены
+    периодической задачей: популярным или похожими рецептами.
+    """
+    source = models.CharField(
+        max_length=50, primary_key=True, verbose_name='источник'
+    )
+    processed_until = models.DateTimeField(verbose_name='учтено до')
+
+    class Meta:
+        verbose_name = 'контрольная точка событий'
+        verbose_name_plural = 'контрольные точки событий'
+
+    def __str__(self):
+        return f'{self.source}: {self.processed_until}'
+
+
+class SavedRecipeRemoval(models.Model):
+    """Удаление рецепта из избранного или корзины: событие для
+    инкрементального пересчета похожих рецептов (recipes.similarity).
+    Хранит id без внешних ключей, чтобы пережить удаление рецепта
+    или пользователя.
+    """
+    user_id = models.BigIntegerField(verbose_name='id пользователя')
+    recipe_id = models.BigIntegerField(verbose_name='id рецепта')
+    created = models.DateTimeField(
+        auto_now_add=True,
+        db_index=True,
+        verbose_name='дата удаления',
+    )
+
+    class Meta:
+        verbose_name = 'удаление из избранного или корзины'
+        verbose_name_plural = 'удаления из избранного и корзины'
+
+    def __str__(self):
+        return f'{self.user_id} - {self.recipe_id}'
@@ -0,0 +1,160 @@
+"""Полнотекстовый поиск рецептов по названию и описанию.
+
+PostgreSQL: колонка search_vector (tsvector со словарем russian, название
+с весом A, описание с весом B) заполняется триггером и индексируется GIN,
+результаты ранжируются ts_rank. SQLite: внешняя таблица FTS5 над
+recipes_recipe, синхронизируемая триггерами, ранжирование bm25.
+"""
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db import connections
+from django.db.models import F
+from django.db.models.expressions import RawSQL
+
+SEARCH_CONFIG = 'russian'
+
+POSTGRESQL_INSTALL = [
+    """
+    CREATE OR REPLACE FUNCTION recipes_recipe_search_vector() RETURNS trigger
+    AS $$
+    BEGIN
+        NEW.search_vector :=
+            setweight(to_tsvector('russian', coalesce(NEW.name, '')), 'A')
+            || setweight(to_tsvector('russian', coalesce(NEW.text, '')), 'B');
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    'DROP TRIGGER IF EXISTS recipes_recipe_search_vector ON recipes_recipe',
+    """
+    CREATE TRIGGER recipes_recipe_search_vector
+    BEFORE INSERT OR UPDATE OF name, text ON recipes_recipe
+    FOR EACH ROW EXECUTE PROCEDURE recipes_recipe_search_vector()
+    """,
+    # Триггер на UPDATE OF name заполняет вектор существующих рецептов
+    'UPDATE recipes_recipe SET name = name',
+    """
+    CREATE INDEX IF NOT EXISTS recipe_search_vector_idx
+    ON recipes_recipe USING gin (search_vector)
+    """,
+]
+
+POSTGRESQL_UNINSTALL = [
+    'DROP INDEX IF EXISTS recipe_search_vector_idx',
+    'DROP TRIGGER IF EXISTS recipes_recipe_search_vector ON recipes_recipe',
+    'DROP FUNCTION IF EXISTS recipes_recipe_search_vector()',
+]
+
+SQLITE_TABLE = """
+    CREATE VIRTUAL TABLE recipes_recipe_fts USING fts5(
+        name, text, content='recipes_recipe', content_rowid='id'
+    )
+"""
+
+# Пересоздание таблицы при миграциях SQLite удаляет триггеры,
+# поэтому они восстанавливаются после каждой миграции
+SQLITE_TRIGGERS = [
+    """
+    CREATE TRIGGER IF NOT EXISTS recipes_recipe_fts_insert
+    AFTER INSERT ON recipes_recipe BEGIN
+        INSERT INTO recipes_recipe_fts (rowid, name, text)
+        VALUES (new.id, new.name, new.text);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS recipes_recipe_fts_delete
+    AFTER DELETE ON recipes_recipe BEGIN
+        INSERT INTO recipes_recipe_fts (recipes_recipe_fts, rowid, name, text)
+        VALUES ('delete', old.id, old.name, old.text);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS recipes_recipe_fts_update
+    AFTER UPDATE OF name, text ON recipes_recipe BEGIN
+        INSERT INTO recipes_recipe_fts (recipes_recipe_fts, rowid, name, text)
+        VALUES ('delete', old.id, old.name, old.text);
+        INSERT INTO recipes_recipe_fts (rowid, name, text)
+        VALUES (new.id, new.name, new.text);
+    END
+    """,
+]
+
+SQLITE_UNINSTALL = [
+    'DROP TRIGGER IF EXISTS recipes_recipe_fts_insert',
+    'DROP TRIGGER IF EXISTS recipes_recipe_fts_delete',
+    'DROP TRIGGER IF EXISTS recipes_recipe_fts_update',
+    'DROP TABLE IF EXISTS recipes_recipe_fts',
+]
+
+
+def execute(connection, statements):
+    with connection.cursor() as cursor:
+        for statement in statements:
+            cursor.execute(statement)
+
+
+def install_sqlite(connection):
+    if 'recipes_recipe' not in connection.introspection.table_names():
+        return
+    if 'recipes_recipe_fts' not in connection.introspection.table_names():
+        execute(connection, [
+            SQLITE_TABLE,
+            "INSERT INTO recipes_recipe_fts (recipes_recipe_fts) "
+            "VALUES ('rebuild')",
+        ])
+    execute(connection, SQLITE_TRIGGERS)
+
+
+def install_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor == 'postgresql':
+        execute(connection, POSTGRESQL_INSTALL)
+    elif connection.vendor == 'sqlite':
+        install_sqlite(connection)
+
+
+def uninstall_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor == 'postgresql':
+        execute(connection, POSTGRESQL_UNINSTALL)
+    elif connection.vendor == 'sqlite':
+        execute(connection, SQLITE_UNINSTALL)
+
+
+def ensure_sqlite_search(sender, using, **kwargs):
+    """post_migrate: таблица FTS5 и триггеры для SQLite, в том числе
+    для баз, созданных без миграций (syncdb в тестах).
+    """
+    connection = connections[using]
+    if connection.vendor == 'sqlite':
+        install_sqlite(connection)
+
+
+def sqlite_match(text):
+    """Запрос FTS5 из слов пользователя: все слова, каждое как префикс."""
+    words = text.split()
+    return ' '.join('"{}"*'.format(word.replace('"', '""')) for word in words)
+
+
+def search_recipes(queryset, text):
+    """Рецепты, подходящие под запрос, с релевантностью search_rank
+    (больше - лучше), отсортированные по ней.
+    """
+    ordering = ('-search_rank', '-pub_date', '-id')
+    if connections[queryset.db].vendor == 'postgresql':
+        query = SearchQuery(
+            text, config=SEARCH_CONFIG, search_type='websearch'
+        )
+        return queryset.filter(search_vector=query).annotate(
+            search_rank=SearchRank(F('search_vector'), query),
+        ).order_by(*ordering)
+    match = sqlite_match(text)
+    if not match:
+        return queryset.none()
+    return queryset.filter(pk__in=RawSQL(
+        'SELECT rowid FROM recipes_recipe_fts '
+        'WHERE recipes_recipe_fts MATCH %s', (match, )
+    )).annotate(search_rank=RawSQL(
+        'SELECT -bm25(recipes_recipe_fts) FROM recipes_recipe_fts '
+        'WHERE recipes_recipe_fts MATCH %s '
+        'AND rowid = recipes_recipe.id', (match, )
+    )).order_by(*ordering)
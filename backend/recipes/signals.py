@@ -0,0 +1,6 @@
+from django.dispatch import Signal
+
+# Рецепт сохранен вместе с тегами и ингредиентами (через API или админку).
+# Аргументы: instance, previous_ingredients - id ингредиентов рецепта
+# до изменения (пустое множество для нового рецепта).
+recipe_written = Signal()
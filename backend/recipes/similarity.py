@@ -0,0 +1,213 @@
+"""Похожие рецепты по совместным добавлениям в избранное и корзину.
+
+Матрица X пользователи x рецепты (1, если рецепт в избранном или корзине
+пользователя) нормируется по столбцам, и близость рецептов i и j - это
+косинус (X^T X)[i, j] / (|X_i| |X_j|). Строки X^T X считаются блоками
+по SIMILAR_RECIPES_CHUNK_SIZE рецептов, от каждой строки остаются только
+SIMILAR_RECIPES_TOP_K лучших соседей, поэтому плотная матрица рецептов
+в памяти не строится.
+
+При инкрементальном пересчете обновляются строки рецептов с новыми
+событиями (добавлениями и удалениями, SavedRecipeRemoval) и остальных
+рецептов пользователей, от которых пришли события: только у этих пар
+изменилось скалярное произведение. У рецептов событий изменилась и
+норма, поэтому пересчитываются и строки, где они уже есть среди соседей.
+Для блока таких рецептов строится подматрица X по пользователям,
+сохранившим рецепты блока, а нормы столбцов считаются по всем
+пользователям. Строки рецептов, которые больше никто не сохранил,
+удаляются. Рецепты, которые из-за новой нормы могли бы попасть
+в соседи других строк, учитывает полный пересчет (full=True).
+"""
+from collections import Counter
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Exists, OuterRef, Q
+from django.utils import timezone
+from scipy import sparse
+
+from .events import events_until, get_checkpoints, save_checkpoints
+from .models import (Favorite, RecipeSimilarity, SavedRecipeRemoval,
+                     ShoppingBasket)
+
+SOURCE = 'similarity'
+MODELS = (Favorite, ShoppingBasket)
+# Размер списков id в условиях IN
+BATCH_SIZE = 1000
+
+
+def load_pairs(models, *conditions, **filters):
+    """Массивы (user_id, recipe_id) по всем моделям."""
+    users, recipes = [], []
+    for model in models:
+        pairs = model.objects.filter(*conditions, **filters).values_list(
+            'user_id', 'recipe_id'
+        ).order_by()
+        rows = np.fromiter(
+            (value for pair in pairs.iterator() for value in pair),
+            dtype=np.int64,
+        ).reshape(-1, 2)
+        users.append(rows[:, 0])
+        recipes.append(rows[:, 1])
+    return np.concatenate(users), np.concatenate(recipes)
+
+
+def users_of(models, **filters):
+    """Условие на пользователей, у которых есть строки models с filters."""
+    condition = Q()
+    for model in models:
+        condition |= Q(user_id__in=model.objects.filter(
+            **filters
+        ).values('user_id'))
+    return condition
+
+
+def column_norms(recipe_ids):
+    """Нормы столбцов X: корень из числа пользователей, у которых рецепт
+    в избранном или корзине.
+    """
+    in_favorites = Favorite.objects.filter(
+        user_id=OuterRef('user_id'), recipe_id=OuterRef('recipe_id')
+    )
+    counts = Counter()
+    for start in range(0, len(recipe_ids), BATCH_SIZE):
+        batch = recipe_ids[start:start + BATCH_SIZE]
+        for rows in (
+            Favorite.objects.filter(recipe_id__in=batch),
+            ShoppingBasket.objects.filter(recipe_id__in=batch).exclude(
+                Exists(in_favorites)
+            ),
+        ):
+            counts.update(dict(rows.values_list('recipe_id').annotate(
+                count=Count('pk')
+            ).order_by()))
+    return np.sqrt(
+        np.array([counts[recipe_id] for recipe_id in recipe_ids],
+                 dtype=np.float32)
+    )
+
+
+def build_matrix(*conditions):
+    """Нормированная по столбцам матрица X (CSC) и id рецептов столбцов.
+    conditions ограничивают строки X (пользователей), нормы столбцов
+    при этом считаются по всем пользователям.
+    """
+    users, recipes = load_pairs(MODELS, *conditions)
+    _, user_codes = np.unique(users, return_inverse=True)
+    recipe_ids, recipe_codes = np.unique(recipes, return_inverse=True)
+    matrix = sparse.csr_matrix(
+        (np.ones(len(users), dtype=np.float32), (user_codes, recipe_codes)),
+        shape=(user_codes.max(initial=-1) + 1, len(recipe_ids)),
+    )
+    # Рецепт и в избранном, и в корзине - одно совпадение
+    matrix.data[:] = 1
+    if conditions:
+        norms = column_norms(recipe_ids.tolist())
+    else:
+        norms = np.sqrt(np.asarray(matrix.sum(axis=0)).ravel())
+    matrix = matrix @ sparse.diags(1 / norms)
+    return recipe_ids, matrix.tocsc()
+
+
+def top_neighbors(matrix, rows, top_k):
+    """Для столбцов rows: [(row, столбцы соседей, близости)], по убыванию."""
+    block = (matrix[:, rows].T @ matrix).tocsr()
+    for position, row in enumerate(rows):
+        start, end = block.indptr[position], block.indptr[position + 1]
+        columns = block.indices[start:end]
+        scores = block.data[start:end]
+        keep = columns != row
+        columns, scores = columns[keep], scores[keep]
+        if len(scores) > top_k:
+            best = np.argpartition(-scores, top_k)[:top_k]
+            columns, scores = columns[best], scores[best]
+        order = np.argsort(-scores, kind='stable')
+        yield row, columns[order], scores[order]
+
+
+def save_rows(recipe_ids, matrix, rows, top_k, targets=None):
+    """Заменяет строки рецептов targets (по умолчанию - рецептов rows)
+    соседями из matrix.
+    """
+    similarities = [
+        RecipeSimilarity(
+            recipe_id=int(recipe_ids[row]),
+            similar_id=int(recipe_ids[column]),
+            score=float(score),
+        )
+        for row, columns, scores in top_neighbors(matrix, rows, top_k)
+        for column, score in zip(columns, scores)
+    ]
+    if targets is None:
+        targets = recipe_ids[rows].tolist()
+    RecipeSimilarity.objects.filter(recipe_id__in=targets).delete()
+    RecipeSimilarity.objects.bulk_create(similarities, batch_size=1000)
+
+
+def update_rows(targets, top_k):
+    """Пересчитывает строки рецептов targets по подматрице X."""
+    recipe_ids, matrix = build_matrix(
+        users_of(MODELS, recipe_id__in=targets)
+    )
+    rows = np.flatnonzero(np.isin(recipe_ids, targets))
+    save_rows(recipe_ids, matrix, rows, top_k, targets)
+
+
+def changed_recipes(since, until):
+    """Рецепты, строки которых изменились из-за событий за (since, until]."""
+    events = {'created__gt': since, 'created__lte': until}
+    _, added = load_pairs(MODELS, **events)
+    _, removed = load_pairs((SavedRecipeRemoval, ), **events)
+    if not len(added) and not len(removed):
+        return np.array([], dtype=np.int64)
+    changed = np.union1d(added, removed)
+    _, related = load_pairs(
+        MODELS, users_of((*MODELS, SavedRecipeRemoval), **events)
+    )
+    neighbors = set()
+    for start in range(0, len(changed), BATCH_SIZE):
+        neighbors.update(RecipeSimilarity.objects.filter(
+            similar_id__in=changed[start:start + BATCH_SIZE].tolist()
+        ).values_list('recipe_id', flat=True).order_by())
+    return np.union1d(
+        np.union1d(changed, related),
+        np.array(sorted(neighbors), dtype=np.int64),
+    )
+
+
+def finish(until):
+    """Отмечает события до until учтенными."""
+    SavedRecipeRemoval.objects.filter(created__lte=until).delete()
+    save_checkpoints([SOURCE], until)
+
+
+def update_all(until, top_k, chunk_size):
+    recipe_ids, matrix = build_matrix()
+    RecipeSimilarity.objects.all().delete()
+    rows = np.arange(len(recipe_ids))
+    for start in range(0, len(rows), chunk_size):
+        save_rows(recipe_ids, matrix, rows[start:start + chunk_size], top_k)
+    finish(until)
+    return len(rows)
+
+
+def update_changed(since, until, top_k, chunk_size):
+    targets = changed_recipes(since, until).tolist()
+    for start in range(0, len(targets), chunk_size):
+        update_rows(targets[start:start + chunk_size], top_k)
+    finish(until)
+    return len(targets)
+
+
+def update_similar_recipes(full=False, now=None):
+    """Пересчитывает похожие рецепты. Возвращает число обновленных рецептов.
+    """
+    until = events_until(now or timezone.now())
+    top_k = settings.SIMILAR_RECIPES_TOP_K
+    chunk_size = settings.SIMILAR_RECIPES_CHUNK_SIZE
+    with transaction.atomic():
+        since = get_checkpoints([SOURCE]).get(SOURCE)
+        if full or since is None:
+            return update_all(until, top_k, chunk_size)
+        return update_changed(since, until, top_k, chunk_size)
@@ -0,0 +1,83 @@
+from importlib import import_module
+from io import StringIO
+
+from django.apps import apps
+from django.core.management import call_command
+
+from api.tests.utils import APICacheTestCase, create_recipe, create_user
+from recipes.models import Favorite, Recipe, ShoppingBasket
+
+fill_counters = import_module(
+    'recipes.migrations.0037_recipe_popularity_counters'
+).fill_counters
+
+
+def counters():
+    return {
+        pk: (favorites, carts)
+        for pk, favorites, carts in Recipe.objects.values_list(
+            'pk', 'favorites_count', 'in_carts_count'
+        )
+    }
+
+
+class PopularityCounterTests(APICacheTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        author = create_user('author')
+        cls.users = [create_user(f'user{number}') for number in range(3)]
+        cls.recipes = [
+            create_recipe(author, f'Рецепт {number}') for number in range(3)
+        ]
+
+    def test_signals(self):
+        first, second, _ = self.recipes
+        for user in self.users:
+            Favorite.objects.create(user=user, recipe=first)
+        ShoppingBasket.objects.create(user=self.users[0], recipe=first)
+        favorite = Favorite.objects.create(user=self.users[0], recipe=second)
+        self.assertEqual(counters()[first.pk], (3, 1))
+        favorite.delete()
+        self.assertEqual(counters()[second.pk], (0, 0))
+        # Удаление пользователя каскадом уменьшает счетчики
+        self.users[0].delete()
+        self.assertEqual(counters()[first.pk], (2, 0))
+
+    def test_counters_do_not_go_negative(self):
+        favorite = Favorite.objects.create(
+            user=self.users[0], recipe=self.recipes[0]
+        )
+        Recipe.objects.update(favorites_count=0)
+        favorite.delete()
+        self.assertEqual(counters()[self.recipes[0].pk], (0, 0))
+
+    def test_reconcile(self):
+        Favorite.objects.create(user=self.users[0], recipe=self.recipes[1])
+        ShoppingBasket.objects.create(
+            user=self.users[1], recipe=self.recipes[1]
+        )
+        expected = counters()
+        Recipe.objects.update(favorites_count=5, in_carts_count=0)
+        output = StringIO()
+        call_command('reconcile_recipe_counters', stdout=output)
+        self.assertEqual(counters(), expected)
+        self.assertIn('for 3 recipes', output.getvalue())
+
+    def test_migration_fill(self):
+        Favorite.objects.create(user=self.users[0], recipe=self.recipes[2])
+        Favorite.objects.create(user=self.users[1], recipe=self.recipes[2])
+        expected = counters()
+        Recipe.objects.update(favorites_count=0, in_carts_count=0)
+        fill_counters(apps, None)
+        self.assertEqual(counters(), expected)
+
+    def test_popular_ordering(self):
+        first, second, third = self.recipes
+        for user in self.users[:2]:
+            Favorite.objects.create(user=user, recipe=second)
+        Favorite.objects.create(user=self.users[0], recipe=third)
+        response = self.client.get('/api/recipes/', {'ordering': 'popular'})
+        self.assertEqual(
+            [row['id'] for row in response.json()['results']],
+            [second.pk, third.pk, first.pk],
+        )
@@ -0,0 +1,101 @@
+from datetime import timedelta
+
+from django.test import override_settings
+from django.utils import timezone
+
+from api.tests.utils import APICacheTestCase, create_recipe, create_user
+from recipes.models import FeedEntry, Recipe
+from users.models import Subscription
+
+
+def inbox(user):
+    return set(FeedEntry.objects.filter(user=user).values_list(
+        'recipe_id', flat=True
+    ))
+
+
+@override_settings(FEED_FANOUT_LIMIT=2, FEED_BATCH_SIZE=2)
+class FeedTests(APICacheTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader = create_user('reader')
+        cls.others = [create_user(f'reader{number}') for number in range(2)]
+        cls.author = create_user('author')
+        # У популярного автора подписчиков больше FEED_FANOUT_LIMIT
+        cls.star = create_user('star')
+        for user in (cls.reader, *cls.others):
+            Subscription.objects.create(user=user, following=cls.star)
+        Subscription.objects.create(user=cls.reader, following=cls.author)
+
+    def publish(self, author, name, age):
+        recipe = create_recipe(author, name)
+        pub_date = timezone.now() - age
+        Recipe.objects.filter(pk=recipe.pk).update(pub_date=pub_date)
+        FeedEntry.objects.filter(recipe=recipe).update(pub_date=pub_date)
+        return recipe
+
+    def walk(self, limit=2):
+        client = self.client_for(self.reader)
+        response = client.get('/api/recipes/feed/', {'limit': limit})
+        ids = []
+        while True:
+            self.assertEqual(response.status_code, 200)
+            ids.extend(row['id'] for row in response.data['results'])
+            if response.data['next'] is None:
+                return ids
+            response = client.get(response.data['next'])
+
+    def test_fan_out(self):
+        recipe = self.publish(self.author, 'Суп', timedelta(0))
+        popular = self.publish(self.star, 'Торт', timedelta(0))
+        self.assertEqual(inbox(self.reader), {recipe.pk})
+        self.assertFalse(FeedEntry.objects.filter(recipe=popular).exists())
+
+    def test_merged_pages(self):
+        recipes = [
+            self.publish(author, f'Рецепт {number}', timedelta(hours=number))
+            for number, author in enumerate(
+                [self.author, self.star] * 3 + [self.star]
+            )
+        ]
+        # Чужой рецепт не попадает в ленту
+        self.publish(create_user('stranger'), 'Чужой', timedelta(0))
+        expected = [recipe.pk for recipe in recipes]
+        self.assertEqual(self.walk(), expected)
+        self.assertEqual(self.walk(limit=3), expected)
+
+    def test_previous_page(self):
+        for number in range(5):
+            self.publish(
+                (self.author, self.star)[number % 2], f'Рецепт {number}',
+                timedelta(hours=number),
+            )
+        client = self.client_for(self.reader)
+        first = client.get('/api/recipes/feed/', {'limit': 2})
+        second = client.get(first.data['next'])
+        back = client.get(second.data['previous'])
+        self.assertEqual(back.data['results'], first.data['results'])
+
+    def test_subscriptions_change_inbox(self):
+        recipe = self.publish(self.author, 'Суп', timedelta(0))
+        reader = self.others[0]
+        Subscription.objects.create(user=reader, following=self.author)
+        self.assertEqual(inbox(reader), {recipe.pk})
+        Subscription.objects.filter(
+            user=reader, following=self.author
+        ).delete()
+        self.assertEqual(inbox(reader), set())
+
+    def test_author_below_limit_is_fanned_out(self):
+        popular = self.publish(self.star, 'Торт', timedelta(0))
+        Subscription.objects.filter(
+            user=self.others[0], following=self.star
+        ).delete()
+        self.assertEqual(inbox(self.reader), {popular.pk})
+        self.assertEqual(inbox(self.others[1]), {popular.pk})
+        self.assertEqual(self.walk(), [popular.pk])
+
+    def test_anonymous(self):
+        self.assertEqual(
+            self.client_for().get('/api/recipes/feed/').status_code, 401
+        )
@@ -0,0 +1,153 @@
+from importlib import import_module
+
+from django.apps import apps
+from django.test import TestCase
+
+from api.tests.utils import APICacheTestCase, create_recipe, create_user
+from ingredients.models import Ingredient
+from recipes import ingredient_index
+from recipes.models import IngredientPostings, RecipeIngredient
+
+fill_postings = import_module(
+    'recipes.migrations.0036_ingredientpostings'
+).fill_postings
+
+# id рецептов из разных частей индекса
+RECIPE_IDS = (1, 2, 9, 4097, 9000)
+
+
+def index_state():
+    """{ингредиент: отсортированные записи} по всем частям индекса."""
+    state = {}
+    for posting in IngredientPostings.objects.all():
+        state.setdefault(posting.ingredient_id, []).extend(
+            ingredient_index.unpack(posting.recipes)
+        )
+    return {key: sorted(entries) for key, entries in state.items()}
+
+
+class IngredientIndexTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = create_user('cook')
+        cls.ingredients = [
+            Ingredient.objects.create(name=f'продукт {number}',
+                                      measurement_unit='г')
+            for number in range(4)
+        ]
+        cls.recipes = [
+            create_recipe(
+                cls.author, f'Рецепт {pk}', pk=pk,
+                ingredients=[
+                    (ingredient, 1)
+                    for ingredient in cls.ingredients[:2 + number % 3]
+                ],
+            )
+            for number, pk in enumerate(RECIPE_IDS)
+        ]
+
+    def index_incrementally(self):
+        for recipe in self.recipes:
+            ingredient_index.update_recipe(recipe.pk)
+
+    def test_chunks(self):
+        self.assertEqual(ingredient_index.chunk_of(1), 1)
+        self.assertEqual(ingredient_index.chunk_of(9), 1)
+        self.assertNotEqual(
+            ingredient_index.chunk_of(1), ingredient_index.chunk_of(2)
+        )
+        self.assertNotEqual(
+            ingredient_index.chunk_of(1), ingredient_index.chunk_of(4097)
+        )
+
+    def test_incremental_matches_rebuild(self):
+        self.index_incrementally()
+        incremental = index_state()
+        self.assertEqual(ingredient_index.rebuild(), len(self.ingredients))
+        self.assertEqual(index_state(), incremental)
+        chunks = IngredientPostings.objects.filter(
+            ingredient=self.ingredients[0]
+        ).count()
+        self.assertEqual(
+            chunks, len({ingredient_index.chunk_of(pk) for pk in RECIPE_IDS})
+        )
+
+    def test_migration_fill_matches_rebuild(self):
+        ingredient_index.rebuild()
+        expected = index_state()
+        IngredientPostings.objects.all().delete()
+        fill_postings(apps, None)
+        self.assertEqual(index_state(), expected)
+
+    def test_update_moves_recipe(self):
+        self.index_incrementally()
+        recipe = self.recipes[0]
+        previous = set(recipe.amounts.values_list('ingredient_id', flat=True))
+        recipe.amounts.all().delete()
+        RecipeIngredient.objects.create(
+            recipe=recipe, ingredient=self.ingredients[3], amount=1
+        )
+        ingredient_index.update_recipe(recipe.pk, previous)
+        incremental = index_state()
+        ingredient_index.rebuild()
+        self.assertEqual(incremental, index_state())
+
+    def test_remove_recipe(self):
+        self.index_incrementally()
+        recipe = self.recipes[1]
+        ingredient_index.remove_recipe(
+            recipe.pk, recipe.amounts.values_list('ingredient_id', flat=True)
+        )
+        found = {
+            recipe_id
+            for recipe_id, _, _ in ingredient_index.find_recipes(
+                [ingredient.pk for ingredient in self.ingredients]
+            )
+        }
+        self.assertEqual(found, set(RECIPE_IDS) - {recipe.pk})
+
+    def test_existing_chunk_row_is_reused(self):
+        """Строку части уже создал параллельный запрос."""
+        recipe = self.recipes[0]
+        for ingredient in self.ingredients[:2]:
+            IngredientPostings.objects.create(
+                ingredient=ingredient,
+                chunk=ingredient_index.chunk_of(recipe.pk),
+            )
+        ingredient_index.update_recipe(recipe.pk)
+        self.assertEqual(
+            ingredient_index.find_recipes([self.ingredients[0].pk]),
+            [(recipe.pk, 1, 2)],
+        )
+
+    def test_find_recipes_ranking(self):
+        self.index_incrementally()
+        matches = ingredient_index.find_recipes(
+            [ingredient.pk for ingredient in self.ingredients[:2]],
+            max_missing=1,
+        )
+        # Полное совпадение (2 из 2) раньше, затем 2 из 3, новые раньше
+        self.assertEqual(matches, [
+            (4097, 2, 2), (1, 2, 2), (9000, 2, 3), (2, 2, 3),
+        ])
+
+
+class CookEndpointTests(APICacheTestCase):
+    def test_cook(self):
+        author = create_user('cook')
+        salt, flour = (
+            Ingredient.objects.create(name=name, measurement_unit='г')
+            for name in ('соль', 'мука')
+        )
+        bread = create_recipe(author, 'Хлеб', [(salt, 5), (flour, 500)])
+        brine = create_recipe(author, 'Рассол', [(salt, 50)])
+        ingredient_index.rebuild()
+        response = self.client_for().get(
+            '/api/recipes/cook/', {'ingredients': [salt.pk]}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [(row['id'], row['coverage'], row['missing'])
+             for row in response.data['results']],
+            [(brine.pk, 1.0, 0), (bread.pk, 0.5, 1)],
+        )
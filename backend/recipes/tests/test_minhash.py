@@ -0,0 +1,67 @@
+from importlib import import_module
+
+from django.apps import apps
+from django.test import TestCase
+
+from api.tests.utils import create_recipe, create_user
+from ingredients.models import Ingredient, Tag
+from recipes import minhash
+from recipes.models import RecipeBucket, RecipeSignature
+
+fill_signatures = import_module(
+    'recipes.migrations.0044_fill_recipe_signatures'
+).fill_signatures
+
+
+def stored():
+    return (
+        dict(RecipeSignature.objects.values_list('recipe_id', 'signature')),
+        sorted(RecipeBucket.objects.values_list(
+            'recipe_id', 'band', 'bucket'
+        )),
+    )
+
+
+class MinHashTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        author = create_user('author')
+        cls.ingredients = [
+            Ingredient.objects.create(name=f'продукт {number}',
+                                      measurement_unit='г')
+            for number in range(12)
+        ]
+        tag = Tag.objects.create(name='Обед', color='#49B64E', slug='lunch')
+        cls.original = create_recipe(
+            author, 'Борщ',
+            [(ingredient, 1) for ingredient in cls.ingredients[:10]],
+            tags=[tag],
+        )
+        cls.copy = create_recipe(
+            author, 'Борщ (копия)',
+            [(ingredient, 2) for ingredient in cls.ingredients[:10]],
+            tags=[tag],
+        )
+        cls.other = create_recipe(
+            author, 'Салат',
+            [(ingredient, 1) for ingredient in cls.ingredients[10:]],
+        )
+
+    def test_duplicates(self):
+        self.assertEqual(minhash.rebuild(), 3)
+        duplicates = minhash.find_duplicates(0.8)
+        self.assertEqual(
+            duplicates[self.original.pk], [(self.copy.pk, 1.0)]
+        )
+        self.assertNotIn(self.other.pk, duplicates)
+        self.assertEqual(
+            minhash.find_similar([self.other.pk], 0.1), {}
+        )
+
+    def test_migration_fills_missing_signatures(self):
+        minhash.rebuild()
+        expected = stored()
+        RecipeSignature.objects.exclude(recipe=self.other).delete()
+        RecipeBucket.objects.exclude(recipe=self.other).delete()
+        fill_signatures(apps, None)
+        self.assertEqual(stored(), expected)
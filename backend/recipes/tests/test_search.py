@@ -0,0 +1,73 @@
+from django.test import TestCase
+
+from api.tests.utils import APICacheTestCase, create_recipe, create_user
+from recipes.models import Recipe
+
+
+def found(text, queryset=None):
+    queryset = Recipe.objects.all() if queryset is None else queryset
+    return list(queryset.search(text).values_list('name', flat=True))
+
+
+class RecipeSearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = create_user('author')
+        cls.other = create_user('other')
+        create_recipe(
+            cls.author, 'Борщ украинский',
+            text='Борщ со сметаной: свекла, капуста, борщ готов',
+        )
+        create_recipe(
+            cls.other, 'Суп с фрикадельками',
+            text='Подается как борщом принято, со сметаной и зеленью, '
+                 'а еще с хлебом, чесноком и долгими разговорами',
+        )
+        create_recipe(cls.author, 'Сырники', text='Творог, мука, яйцо')
+
+    def test_ranking(self):
+        # Слова ищутся как префиксы, чаще встречающееся - выше
+        self.assertEqual(
+            found('борщ'), ['Борщ украинский', 'Суп с фрикадельками']
+        )
+
+    def test_all_words_are_required(self):
+        self.assertEqual(found('сметаной капуста'), ['Борщ украинский'])
+        self.assertEqual(found('творог капуста'), [])
+
+    def test_query_syntax_is_not_interpreted(self):
+        # Кавычки и операторы - просто символы запроса
+        self.assertEqual(found('"сырн'), ['Сырники'])
+        self.assertEqual(found('сырники OR борщ'), [])
+        self.assertEqual(found('СЫРН*'), ['Сырники'])
+        self.assertEqual(found('   '), [])
+
+    def test_index_follows_writes(self):
+        recipe = Recipe.objects.get(name='Сырники')
+        recipe.name = 'Оладьи'
+        recipe.save()
+        self.assertEqual(found('сырники'), [])
+        self.assertEqual(found('оладьи'), ['Оладьи'])
+        recipe.delete()
+        self.assertEqual(found('творог'), [])
+
+    def test_combines_with_filters(self):
+        self.assertEqual(
+            found('сметаной', Recipe.objects.filter(author=self.other)),
+            ['Суп с фрикадельками'],
+        )
+
+
+class RecipeSearchEndpointTests(APICacheTestCase):
+    def test_search_param(self):
+        author = create_user('author')
+        for name in ('Паста карбонара', 'Паста с песто', 'Пицца'):
+            create_recipe(author, name)
+        response = self.client_for().get('/api/recipes/', {'search': 'паст'})
+        self.assertEqual(response.data['count'], 2)
+        self.assertCountEqual(
+            [row['name'] for row in response.data['results']],
+            ['Паста карбонара', 'Паста с песто'],
+        )
+        response = self.client_for().get('/api/recipes/', {'search': ' '})
+        self.assertEqual(response.data['count'], 3)
@@ -0,0 +1,155 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.conf import settings
+from django.utils import timezone
+
+from api.tests.utils import APICacheTestCase, create_recipe, create_user
+from recipes import similarity
+from recipes.models import (Favorite, RecipeSimilarity, SavedRecipeRemoval,
+                            ShoppingBasket)
+
+
+def later():
+    """Момент, для которого все текущие события старше EVENTS_LAG."""
+    return timezone.now() + timedelta(seconds=settings.EVENTS_LAG + 1)
+
+
+def neighbors(recipe_ids=None):
+    rows = RecipeSimilarity.objects.order_by('recipe_id', '-score',
+                                             'similar_id')
+    if recipe_ids is not None:
+        rows = rows.filter(recipe_id__in=recipe_ids)
+    return [
+        (recipe_id, similar_id, round(score, 5))
+        for recipe_id, similar_id, score in rows.values_list(
+            'recipe_id', 'similar_id', 'score'
+        )
+    ]
+
+
+class SimilarRecipesTests(APICacheTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        author = create_user('author')
+        cls.users = [create_user(f'reader{number}') for number in range(5)]
+        cls.recipes = [
+            create_recipe(author, f'Рецепт {number}') for number in range(6)
+        ]
+        saved = {
+            0: (0, 1, 2),
+            1: (0, 1),
+            2: (1, 2, 3),
+            3: (3, 4),
+            4: (4, 5),
+        }
+        for user, recipes in saved.items():
+            for number in recipes:
+                Favorite.objects.create(
+                    user=cls.users[user], recipe=cls.recipes[number]
+                )
+        # В корзине и в избранном - одно совпадение
+        ShoppingBasket.objects.create(
+            user=cls.users[1], recipe=cls.recipes[0]
+        )
+        ShoppingBasket.objects.create(
+            user=cls.users[3], recipe=cls.recipes[2]
+        )
+        # Эти события учтены задолго до тестов
+        yesterday = timezone.now() - timedelta(days=1)
+        for model in (Favorite, ShoppingBasket):
+            model.objects.update(created=yesterday)
+
+    def full(self):
+        similarity.update_similar_recipes(full=True, now=later())
+        return neighbors()
+
+    def test_full_scores(self):
+        similarity.update_similar_recipes(full=True, now=later())
+        first, second = self.recipes[0], self.recipes[1]
+        # Рецепт 0 у читателей 0 и 1, рецепт 1 у читателей 0, 1 и 2
+        score = RecipeSimilarity.objects.get(
+            recipe=first, similar=second
+        ).score
+        self.assertAlmostEqual(score, 2 / (2 ** 0.5 * 3 ** 0.5), places=5)
+        self.assertFalse(RecipeSimilarity.objects.filter(
+            recipe=first, similar=self.recipes[5]
+        ).exists())
+
+    def test_incremental_additions(self):
+        similarity.update_similar_recipes(full=True)
+        Favorite.objects.create(user=self.users[4], recipe=self.recipes[0])
+        ShoppingBasket.objects.create(
+            user=self.users[0], recipe=self.recipes[5]
+        )
+        with mock.patch.object(
+            similarity, 'build_matrix', wraps=similarity.build_matrix
+        ) as build_matrix:
+            count = similarity.update_similar_recipes(now=later())
+        # Только подматрицы пользователей рецептов из событий
+        self.assertTrue(all(call.args for call in build_matrix.mock_calls))
+        # Рецепты читателей 0 и 4, кроме рецепта 3
+        self.assertEqual(count, 5)
+        incremental = neighbors()
+        self.assertEqual(incremental, self.full())
+
+    def test_incremental_removal(self):
+        similarity.update_similar_recipes(full=True)
+        Favorite.objects.filter(
+            user=self.users[0], recipe=self.recipes[2]
+        ).delete()
+        self.assertEqual(SavedRecipeRemoval.objects.count(), 1)
+        similarity.update_similar_recipes(now=later())
+        self.assertEqual(neighbors(), self.full())
+        self.assertFalse(SavedRecipeRemoval.objects.exists())
+
+    def test_removals_that_keep_pairs_are_not_recorded(self):
+        # Рецепт 0 у читателя 1 остается в избранном
+        ShoppingBasket.objects.filter(
+            user=self.users[1], recipe=self.recipes[0]
+        ).delete()
+        # Связи удаленного рецепта удаляются вместе с ним
+        self.recipes[5].delete()
+        self.assertFalse(SavedRecipeRemoval.objects.exists())
+        Favorite.objects.filter(
+            user=self.users[1], recipe=self.recipes[0]
+        ).delete()
+        self.assertEqual(SavedRecipeRemoval.objects.count(), 1)
+
+    def test_recipe_without_savers_loses_row(self):
+        similarity.update_similar_recipes(full=True)
+        last = self.recipes[5]
+        self.assertTrue(RecipeSimilarity.objects.filter(recipe=last).exists())
+        Favorite.objects.filter(recipe=last).delete()
+        similarity.update_similar_recipes(now=later())
+        self.assertFalse(RecipeSimilarity.objects.filter(recipe=last).exists())
+        self.assertFalse(
+            RecipeSimilarity.objects.filter(similar=last).exists()
+        )
+
+    def test_no_events(self):
+        similarity.update_similar_recipes(full=True)
+        before = neighbors()
+        self.assertEqual(similarity.update_similar_recipes(now=later()), 0)
+        self.assertEqual(neighbors(), before)
+
+    def test_endpoints(self):
+        similarity.update_similar_recipes(full=True, now=later())
+        first = self.recipes[0]
+        response = self.client_for().get(f'/api/recipes/{first.pk}/similar/')
+        expected = [
+            similar_id for _, similar_id, _ in sorted(
+                neighbors([first.pk]), key=lambda row: (-row[2], -row[1])
+            )
+        ]
+        self.assertEqual(
+            [row['id'] for row in response.data['results']], expected
+        )
+        # Читатель 4 сохранил рецепты 4 и 5. Их соседи через читателя 3 -
+        # рецепты 3 (избранное) и 2 (корзина), у рецепта 3 сходство больше
+        reader = self.users[4]
+        response = self.client_for(reader).get('/api/users/me/recommended/')
+        self.assertEqual(
+            [row['id'] for row in response.data['results']],
+            [self.recipes[3].pk, self.recipes[2].pk],
+        )
@@ -0,0 +1,114 @@
+import math
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from api.tests.utils import APICacheTestCase, create_recipe, create_user
+from ingredients.models import Tag
+from recipes import trending
+from recipes.models import (EventCheckpoint, Favorite, ShoppingBasket,
+                            TrendingScore)
+
+HALF_LIFE = timedelta(seconds=settings.TRENDING_HALF_LIFE)
+
+
+def weights(now):
+    """{recipe_id: вес на момент now} по сохраненным рейтингам."""
+    return {
+        recipe_id: math.exp(score - trending.log_weight(now))
+        for recipe_id, score in TrendingScore.objects.values_list(
+            'recipe_id', 'score'
+        )
+    }
+
+
+class TrendingTests(APICacheTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        author = create_user('author')
+        cls.users = [create_user(f'reader{number}') for number in range(3)]
+        cls.tag = Tag.objects.create(
+            name='Обед', color='#49B64E', slug='lunch'
+        )
+        cls.recipes = [
+            create_recipe(author, f'Рецепт {number}') for number in range(4)
+        ]
+        cls.recipes[1].tags.set([cls.tag])
+
+    def setUp(self):
+        super().setUp()
+        self.now = timezone.now()
+
+    def save(self, model, user, recipe, age):
+        row = model.objects.create(user=user, recipe=recipe)
+        model.objects.filter(pk=row.pk).update(created=self.now - age)
+
+    def update(self, now=None):
+        # События моложе EVENTS_LAG ждут следующего запуска
+        now = now or self.now
+        return trending.update_trending(
+            now + timedelta(seconds=settings.EVENTS_LAG)
+        )
+
+    def test_decayed_weights(self):
+        first, second, third, _ = self.recipes
+        self.save(Favorite, self.users[0], first, timedelta(0))
+        self.save(Favorite, self.users[0], second, HALF_LIFE)
+        self.save(ShoppingBasket, self.users[1], second, HALF_LIFE)
+        self.save(Favorite, self.users[0], third, 2 * HALF_LIFE)
+        self.assertEqual(self.update(), 3)
+        result = weights(self.now)
+        self.assertEqual(set(result), {first.pk, second.pk, third.pk})
+        self.assertAlmostEqual(result[first.pk], 1.0)
+        self.assertAlmostEqual(result[second.pk], 1.0)
+        self.assertAlmostEqual(result[third.pk], 0.25)
+
+    def test_incremental_matches_full(self):
+        first, second = self.recipes[:2]
+        self.save(Favorite, self.users[0], first, 3 * HALF_LIFE)
+        self.save(Favorite, self.users[1], second, HALF_LIFE)
+        self.update(self.now - HALF_LIFE / 2)
+        self.save(Favorite, self.users[2], first, timedelta(0))
+        self.save(ShoppingBasket, self.users[2], second, HALF_LIFE / 4)
+        self.update()
+        incremental = weights(self.now)
+        TrendingScore.objects.all().delete()
+        EventCheckpoint.objects.all().delete()
+        self.update()
+        full = weights(self.now)
+        self.assertEqual(set(incremental), set(full))
+        for recipe_id, weight in full.items():
+            self.assertAlmostEqual(incremental[recipe_id], weight)
+
+    def test_events_are_counted_once(self):
+        self.save(Favorite, self.users[0], self.recipes[0], timedelta(0))
+        self.update()
+        self.assertEqual(self.update(), 0)
+        self.assertAlmostEqual(weights(self.now)[self.recipes[0].pk], 1.0)
+
+    def test_faded_recipes_are_dropped(self):
+        self.save(Favorite, self.users[0], self.recipes[0], timedelta(0))
+        self.update()
+        faded = HALF_LIFE * (
+            math.log2(1 / settings.TRENDING_MIN_WEIGHT) + 1
+        )
+        self.update(self.now + faded)
+        self.assertFalse(TrendingScore.objects.exists())
+
+    def test_endpoint(self):
+        first, second, third, _ = self.recipes
+        self.save(Favorite, self.users[0], first, 2 * HALF_LIFE)
+        self.save(Favorite, self.users[0], second, timedelta(0))
+        self.save(Favorite, self.users[1], third, HALF_LIFE)
+        self.update()
+        client = self.client_for()
+        response = client.get('/api/recipes/trending/')
+        self.assertEqual(
+            [row['id'] for row in response.data['results']],
+            [second.pk, third.pk, first.pk],
+        )
+        response = client.get('/api/recipes/trending/', {'tags': 'lunch'})
+        self.assertEqual(
+            [row['id'] for row in response.data['results']], [second.pk]
+        )
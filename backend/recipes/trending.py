@@ -0,0 +1,96 @@
+"""Популярное: рейтинг рецептов по недавним добавлениям в избранное и
+корзину с экспоненциальным затуханием.
+
+Вес события w в момент t через время dt равен w * exp(-dt / tau),
+tau = TRENDING_HALF_LIFE / ln 2. Вместо пересчета всех весов при каждом
+запуске храним log(sum(w * exp((t - EPOCH) / tau))): добавление события
+только увеличивает сумму, а порядок рецептов от общего множителя
+exp(-(now - EPOCH) / tau) не зависит. Логарифм не переполняется.
+"""
+import math
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .events import events_until, get_checkpoints, save_checkpoints
+from .models import Favorite, ShoppingBasket, TrendingScore
+
+EPOCH = datetime(2022, 1, 1, tzinfo=timezone.utc)
+
+# Источник событий: (модель, вес события)
+SOURCES = {
+    'favorites': (Favorite, 1.0),
+    'carts': (ShoppingBasket, 1.0),
+}
+
+BATCH_SIZE = 1000
+
+
+def get_tau():
+    return settings.TRENDING_HALF_LIFE / math.log(2)
+
+
+def log_weight(moment, weight=1.0):
+    """log(weight * exp((moment - EPOCH) / tau))."""
+    return math.log(weight) + (moment - EPOCH).total_seconds() / get_tau()
+
+
+def log_add(a, b):
+    if a is None:
+        return b
+    high, low = max(a, b), min(a, b)
+    return high + math.log1p(math.exp(low - high))
+
+
+def collect_events(until):
+    """Суммы весов событий после контрольных точек по рецептам."""
+    checkpoints = get_checkpoints(SOURCES)
+    # Без контрольной точки учитываем события, вес которых еще заметен
+    horizon = until - timedelta(
+        seconds=settings.TRENDING_HALF_LIFE
+        * math.log2(1 / settings.TRENDING_MIN_WEIGHT)
+    )
+    scores = defaultdict(lambda: None)
+    for source, (model, weight) in SOURCES.items():
+        since = checkpoints.get(source, horizon)
+        events = model.objects.filter(
+            created__gt=since, created__lte=until
+        ).values_list('recipe_id', 'created').order_by().iterator()
+        for recipe_id, created in events:
+            scores[recipe_id] = log_add(
+                scores[recipe_id], log_weight(created, weight)
+            )
+    return scores
+
+
+def save_scores(scores):
+    recipe_ids = list(scores)
+    for start in range(0, len(recipe_ids), BATCH_SIZE):
+        batch = recipe_ids[start:start + BATCH_SIZE]
+        existing = TrendingScore.objects.select_for_update().in_bulk(batch)
+        for item in existing.values():
+            item.score = log_add(item.score, scores[item.recipe_id])
+        TrendingScore.objects.bulk_update(existing.values(), ['score'])
+        TrendingScore.objects.bulk_create([
+            TrendingScore(recipe_id=recipe_id, score=scores[recipe_id])
+            for recipe_id in batch if recipe_id not in existing
+        ])
+
+
+def update_trending(now=None):
+    """Учитывает события с прошлого запуска и удаляет рецепты, чей вес
+    упал ниже TRENDING_MIN_WEIGHT. Возвращает число учтенных рецептов.
+    """
+    now = now or timezone.now()
+    until = events_until(now)
+    with transaction.atomic():
+        scores = collect_events(until)
+        save_scores(scores)
+        save_checkpoints(SOURCES, until)
+        TrendingScore.objects.filter(
+            score__lt=log_weight(now, settings.TRENDING_MIN_WEIGHT)
+        ).delete()
+    return len(scores)